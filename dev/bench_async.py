@@ -0,0 +1,72 @@
+"""
+Compare sync and async resolver throughput at high concurrency.
+
+Requests are served in-process by the ASGI handler. The sync baseline runs the same resolution
+code as a sync view (dispatched through the thread pool like any sync view under ASGI).
+Requires a migrated database with registrations (e.g. `poe demo` and `poe load`).
+
+    python -m dev.bench_async --concurrency 200 --requests 5000 [--cold]
+"""
+import argparse
+import asyncio
+import time
+from iscc_registry import init
+
+init.init()
+from django.conf import settings
+from django.http import JsonResponse
+from django.test import AsyncClient
+from django.urls import clear_url_caches, path
+from loguru import logger as log
+from iscc_registry import urls
+from iscc_registry.cache import resolve_url, resolver_cache
+from iscc_registry.models import IsccId
+
+
+def sync_resolve(request, iscc_id):
+    """Sync baseline for `/api/v1/resolve/{iscc_id}`"""
+    return JsonResponse({"url": resolve_url(iscc_id)})
+
+
+async def bench(paths, concurrency, n):
+    client = AsyncClient()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(p):
+        async with semaphore:
+            response = await client.get(p)
+            assert response.status_code == 200, response.status_code
+
+    start = time.perf_counter()
+    await asyncio.gather(*(fetch(paths[i % len(paths)]) for i in range(n)))
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--cold", action="store_true", help="Disable in-process resolver cache")
+    args = parser.parse_args()
+
+    settings.ALLOWED_HOSTS.append("testserver")
+    urls.urlpatterns.insert(0, path("bench/sync/<str:iscc_id>", sync_resolve))
+    clear_url_caches()
+    if args.cold:
+        resolver_cache.local.maxsize = 0
+
+    qs = IsccId.objects.filter(active=True, deleted=False, redacted=False)
+    iscc_ids = list(qs.values_list("iscc_id", flat=True)[:1000])
+    if not iscc_ids:
+        log.error("no registrations found - load some data first")
+        return
+
+    for label, template in (("sync", "/bench/sync/{}"), ("async", "/api/v1/resolve/{}")):
+        paths = [template.format(iscc_id) for iscc_id in iscc_ids]
+        resolver_cache.clear()
+        rps = asyncio.run(bench(paths, args.concurrency, args.requests))
+        log.info(f"{label:>5}: {rps:,.0f} requests/s (concurrency {args.concurrency})")
+
+
+if __name__ == "__main__":
+    main()
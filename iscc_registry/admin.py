@@ -5,6 +5,8 @@ from django_json_widget.widgets import JSONEditorWidget
 from django_object_actions import DjangoObjectActions
 from iscc_registry import models
 from iscc_registry import tasks
+from iscc_registry.cache import invalidate
+from iscc_registry.transactions import sync_live
 
 
 @admin.register(models.User)
@@ -46,6 +48,7 @@ class IsccIDAdmin(DjangoObjectActions, admin.ModelAdmin):
         "revision",
         "active",
     ]
+    raw_id_fields = ["meta_blob"]
 
     formfield_overrides = {
         JSONField: {
@@ -62,6 +65,11 @@ class IsccIDAdmin(DjangoObjectActions, admin.ModelAdmin):
 
     change_actions = ("fetch_metdata",)
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        sync_live([obj.iscc_id])
+        invalidate([obj.iscc_id])
+
     @admin.display(ordering="timestamp", description="timestamp")
     def admin_time(self, obj):
         return obj.timestamp.strftime("%Y-%m-%d %H:%M:%S")
@@ -75,6 +83,18 @@ class IsccIDAdmin(DjangoObjectActions, admin.ModelAdmin):
         return f"ISCC:{obj.iscc_code}"
 
 
+@admin.register(models.MetadataBlob)
+class MetadataBlobAdmin(admin.ModelAdmin):
+    list_per_page = 20
+    list_display = ["key", "fetched"]
+    search_fields = ["=key"]
+    readonly_fields = ["fetched"]
+
+    formfield_overrides = {
+        JSONField: {"widget": JSONEditorWidget(options={"mode": "view", "modes": ["view"]})},
+    }
+
+
 @admin.register(models.Redact)
 class RedactAdmin(admin.ModelAdmin):
     list_per_page = 15
@@ -89,12 +109,9 @@ class RedactAdmin(admin.ModelAdmin):
     ]
     list_editable = ["redacted"]
     list_filter = ["redacted"]
+    list_select_related = ["meta_blob"]
 
-    search_fields = ["iscc_id", "iscc_code", "metadata"]
-
-    formfield_overrides = {
-        JSONField: {"widget": JSONEditorWidget(options={"mode": "view", "modes": ["view"]})},
-    }
+    search_fields = ["iscc_id", "iscc_code", "meta_blob__data"]
 
     readonly_fields = [
         "display_thumbnail_large",
@@ -104,9 +121,15 @@ class RedactAdmin(admin.ModelAdmin):
         "declarer",
         "registrar",
         "display_meta_url",
+        "display_metadata",
     ]
 
-    fields = ["redacted"] + readonly_fields + ["metadata"]
+    fields = ["redacted"] + readonly_fields
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        sync_live([obj.iscc_id])
+        invalidate([obj.iscc_id])
 
     def get_queryset(self, request):
         """Only list active and non-deleted ISCC-IDs"""
@@ -8,21 +8,30 @@
 ## Administrative features:
 - Allow chain observers to sync ISCC declarations to the registry.
 """
-from typing import Optional, Any
-from django.http import HttpRequest
+from datetime import datetime
+from hashlib import sha256
+from typing import Optional, Any, Dict, List
+from django.http import FileResponse, HttpRequest, HttpResponse
+from django.urls import reverse
 from django.conf import settings
-from ninja import NinjaAPI
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from asgiref.sync import sync_to_async
+from ninja import NinjaAPI, Query
 from ninja.errors import HttpError
-from iscc_registry import settings
-from iscc_registry.exceptions import RegistrationError
+from iscc_registry.exceptions import ForkError, RegistrationError
 from iscc_registry import schema as s
-from iscc_registry.models import IsccId
+from iscc_registry import export, ingest, simhash, staging, units
+from iscc_registry.cache import aresolve_url
+from iscc_registry.models import Block, ChainHead, ChainModel, IsccId, StagedDeclaration
 from iscc_registry.schema import Head, Message, RegistrationResponse, Declaration
-from iscc_registry.transactions import rollback, register, mint
-from iscc_registry.tasks import fetch_metadata
+from iscc_registry.utils import decode_cursor, encode_cursor, time_to_did
+from iscc_registry.transactions import rollback, mint, mint_many
+from iscc_registry.tasks import apply_ingest, build_export, fetch_metadata, fetch_metadata_batch
 from ninja.security import HttpBearer
 import iscc_core as ic
 import iscc_schema as ics
+from eth_utils.address import to_checksum_address
 
 
 class ObserverAuth(HttpBearer):
@@ -36,6 +45,41 @@ api = NinjaAPI(
 )
 
 
+def cached_response(
+    request, data: Any, version: str, keys: List[str], last_modified: Optional[int] = None
+) -> HttpResponse:
+    """
+    Create JSON response with HTTP caching headers or `304 Not Modified` for a valid client copy.
+
+    The ETag combines `version` (e.g. did and revision) with a hash of the response content.
+    """
+    response = api.create_response(request, data, status=200)
+    digest = sha256(response.content).hexdigest()[:16]
+    etag = f'"{version}-{digest}"'
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    response["Cache-Control"] = settings.HTTP_CACHE_CONTROL
+    response = get_conditional_response(request, etag, last_modified, response)
+    response["Surrogate-Key"] = " ".join(keys)
+    return response
+
+
+def uncached_response(request, data: Any) -> HttpResponse:
+    """Create JSON response for provisional (staged) data that must not be cached."""
+    response = api.create_response(request, data, status=200)
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+async def aprovisional_url(code: str) -> Optional[str]:
+    """URL of the provisional declaration for an ISCC-ID (None if no declaration is staged)."""
+    if await sync_to_async(staging.provisional)(code) is None:
+        return None
+    path = reverse(f"{api.urls_namespace}:declaration", kwargs=dict(iscc_id=f"ISCC:{code}"))
+    return f"{path}?provisional=true"
+
+
 ####################################################################################################
 # Public endpoints                                                                                 #
 ####################################################################################################
@@ -52,14 +96,148 @@ def index(request):
     tags=["public"],
     response=s.DeclarationResponse,
     auth=None,
+    url_name="declaration",
 )
-def declaration(request, iscc_id: str):
-    """Get declaration for ISCC-ID"""
+async def declaration(request, iscc_id: str, provisional: bool = False):
+    """
+    Get declaration for ISCC-ID
+
+    With `provisional` ISCC-IDs of staged declarations that are not yet confirmed are returned
+    as well (not cached).
+    """
     try:
         ic.iscc_validate(ic.iscc_normalize(iscc_id), strict=True)
     except ValueError as e:
         raise HttpError(400, str(e))
-    return IsccId.get_safe(iscc_id=ic.Code(iscc_id).code)
+    code = ic.Code(iscc_id).code
+    try:
+        obj = await IsccId.aget_safe(iscc_id=code)
+    except IsccId.DoesNotExist:
+        data = await sync_to_async(staging.provisional)(code) if provisional else None
+        if data is None:
+            raise
+        return uncached_response(request, s.DeclarationResponse(**data))
+    data = s.DeclarationResponse.from_orm(obj).dict()
+    version = f"{obj.did}.{obj.revision}"
+    modified = int(obj.timestamp.timestamp())
+    return cached_response(request, data, version, [obj.iscc_id], last_modified=modified)
+
+
+@api.get(
+    "/declarations",
+    tags=["public"],
+    response=s.DeclarationPage,
+    auth=None,
+    exclude_none=True,
+)
+async def declarations(
+    request,
+    chain_id: Optional[int] = None,
+    declarer: Optional[str] = None,
+    owner: Optional[str] = None,
+    registrar: Optional[str] = None,
+    min_did: Optional[int] = None,
+    max_did: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """
+    List declarations in did order.
+
+    Filters combine with AND. `min_did` and `since` are inclusive, `max_did` and `until` exclusive
+    bounds. Pages are walked with the opaque `cursor` (`next` of the previous page), so every page
+    costs the same independent of its position. No total count is computed.
+    """
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HttpError(400, str(e))
+    wallets = {}
+    for name, wallet in dict(declarer=declarer, owner=owner, registrar=registrar).items():
+        if wallet:
+            try:
+                wallets[name] = to_checksum_address(wallet) if wallet.startswith("0x") else wallet
+            except ValueError as e:
+                raise HttpError(400, str(e))
+    qs = IsccId.objects.filter(redacted=False)
+    if chain_id is not None:
+        qs = qs.filter(chain_id=chain_id)
+    if "declarer" in wallets:
+        qs = qs.filter(declarer_id=wallets["declarer"])
+    if "owner" in wallets:
+        qs = qs.filter(owner__username=wallets["owner"])
+    if "registrar" in wallets:
+        qs = qs.filter(registrar_id=wallets["registrar"])
+    if min_did is not None:
+        qs = qs.filter(did__gte=min_did)
+    if max_did is not None:
+        qs = qs.filter(did__lt=max_did)
+    if since is not None:
+        qs = qs.filter(did__gte=time_to_did(since))
+    if until is not None:
+        qs = qs.filter(did__lt=time_to_did(until))
+    if after is not None:
+        qs = qs.filter(did__gt=after)
+    qs = qs.select_related("declarer", "registrar", "chain").order_by("did")
+    objs = [obj async for obj in qs[: limit + 1]]
+    items = [s.DeclarationResponse.from_orm(obj) for obj in objs[:limit]]
+    cursor = encode_cursor(objs[limit - 1].did) if len(objs) > limit else None
+    return {"items": items, "next": cursor}
+
+
+@api.get("/export", tags=["public"], auth=None, response={202: Message})
+def export_(request, history: bool = False, after: Optional[int] = None, gzip: bool = False):
+    """
+    Download declarations as NDJSON in did order.
+
+    Exports live ISCC-IDs or, with `history`, all declaration events. Interrupted exports can be
+    resumed with `after` set to the last exported `did`. With `gzip` the file is compressed.
+
+    Export files are written by a background task and served for `EXPORT_MAX_AGE` seconds. While
+    a file is being written `202` is returned with `Retry-After`.
+    """
+    path = export.snapshot_path(history, after, gzip)
+    if not export.is_fresh(path):
+        if not export.is_building(path):
+            build_export(history, after, gzip)
+        if not export.is_fresh(path):
+            message = Message(message="Export is being prepared, retry later")
+            response = api.create_response(request, message, status=202)
+            response["Retry-After"] = str(settings.EXPORT_RETRY_AFTER)
+            return response
+    content_type = "application/gzip" if gzip else "application/x-ndjson"
+    return FileResponse(
+        open(path, "rb"), content_type=content_type, as_attachment=gzip, filename=path.name
+    )
+
+
+@api.post(
+    "/declarations/lookup",
+    tags=["public"],
+    response={200: s.LookupResponse, 422: Message},
+    auth=None,
+)
+async def lookup(request, data: s.Lookup):
+    """Get declarations for many ISCC-IDs with a single query."""
+    if len(data.iscc_ids) > settings.LOOKUP_MAX_IDS:
+        return 422, Message(message=f"Max {settings.LOOKUP_MAX_IDS} ISCC-IDs per request")
+    codes, invalid = {}, []
+    for iscc_id in data.iscc_ids:
+        try:
+            norm = ic.iscc_normalize(iscc_id)
+            ic.iscc_validate(norm, strict=True)
+        except ValueError:
+            invalid.append(iscc_id)
+            continue
+        codes.setdefault(norm[len("ISCC:") :], norm)
+    qs = IsccId.objects.filter(iscc_id__in=list(codes), active=True, deleted=False, redacted=False)
+    qs = qs.select_related("declarer", "registrar", "chain")
+    objs = {obj.iscc_id: obj async for obj in qs}
+    found = [s.DeclarationResponse.from_orm(objs[code]) for code in codes if code in objs]
+    missing = [norm for code, norm in codes.items() if code not in objs]
+    return 200, dict(found=found, missing=missing, invalid=invalid)
 
 
 @api.get(
@@ -70,37 +248,171 @@ def declaration(request, iscc_id: str):
     exclude_none=True,
     by_alias=True,
 )
-def metadata(request, iscc_id: str):
-    """Get metadata for ISCC-ID"""
+async def metadata(request, iscc_id: str, provisional: bool = False):
+    """
+    Get metadata for ISCC-ID
+
+    With `provisional` the declared ISCC-CODE and wallet of a staged declaration are returned
+    (not cached). Metadata from the Meta-URL is only imported after registration.
+    """
     try:
         ic.iscc_validate(ic.iscc_normalize(iscc_id), strict=True)
     except ValueError as e:
         raise HttpError(400, str(e))
-    return IsccId.get_safe(iscc_id=ic.Code(iscc_id).code).metadata
+    code = ic.Code(iscc_id).code
+    try:
+        obj = await IsccId.aget_safe(iscc_id=code)
+    except IsccId.DoesNotExist:
+        data = await sync_to_async(staging.provisional)(code) if provisional else None
+        if data is None:
+            raise
+        meta = dict(
+            iscc=ic.iscc_normalize(data["iscc_code"]),
+            iscc_id=f"ISCC:{code}",
+            wallet=data["declarer"],
+        )
+        return uncached_response(
+            request, ics.IsccMeta(**meta).dict(exclude_none=True, by_alias=True)
+        )
+    data = ics.IsccMeta.parse_obj(obj.metadata or {}).dict(exclude_none=True, by_alias=True)
+    return cached_response(request, data, f"{obj.did}.{obj.revision}", [obj.iscc_id])
 
 
 @api.get("/resolve/{iscc_id}", tags=["public"], auth=None, response={200: s.Redirect, 404: Message})
-def resolve(request, iscc_id: str):
+async def resolve(request, iscc_id: str, provisional: bool = False):
+    """
+    Resolve ISCC-ID to its redirection target
+
+    With `provisional` staged ISCC-IDs resolve to their provisional declaration (not cached).
+    """
     try:
         norm = ic.iscc_normalize(iscc_id)
         ic.iscc_validate(norm)
     except ValueError as e:
         return 404, Message(message=str(e))
 
-    # Fetch from database
+    # Resolve to redirect target or local entry (cached)
+    code = norm.lstrip("ISCC:")
+    url = await aresolve_url(code)
+    if url is None and provisional:
+        url = await aprovisional_url(code)
+        if url is not None:
+            return uncached_response(request, {"url": url})
+    if url is None:
+        return 404, Message(message=f"{iscc_id} does not exist")
+    return cached_response(request, {"url": url}, code, [code])
+
+
+@api.get(
+    "/similar/{iscc_id}",
+    tags=["public"],
+    auth=None,
+    response={200: List[s.Similar], 404: Message},
+)
+async def similar(
+    request,
+    iscc_id: str,
+    max_distance: int = Query(simhash.DEFAULT_DISTANCE, ge=0, le=simhash.MAX_DISTANCE),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Find near-duplicate ISCC-IDs within a Hamming distance of their simhashes."""
     try:
-        iscc_obj = IsccId.get_safe(iscc_id=norm.lstrip("ISCC:"))
-    except IsccId.DoesNotExist:
+        ic.iscc_validate(ic.iscc_normalize(iscc_id), strict=True)
+    except ValueError as e:
+        return 404, Message(message=str(e))
+    code = ic.Code(iscc_id).code
+    qs = IsccId.objects.filter(iscc_id=code, active=True, deleted=False, redacted=False)
+    value = await qs.values_list("simhash", flat=True).afirst()
+    if value is None:
         return 404, Message(message=f"{iscc_id} does not exist")
+    rows = [row async for row in simhash.candidates(value, max_distance).exclude(iscc_id=code)]
+    matches = simhash.rank(rows, value, max_distance, limit)
+    return 200, [
+        dict(iscc_id=f"ISCC:{iid}", iscc_code=f"ISCC:{iscc_code}", distance=dist)
+        for iid, iscc_code, dist in matches
+    ]
+
+
+@api.get(
+    "/iscc_code/{iscc_code}",
+    tags=["public"],
+    auth=None,
+    response=s.CodeMatches,
+    exclude_none=True,
+)
+async def iscc_code_(
+    request,
+    iscc_code: str,
+    unit: Optional[str] = Query(None, regex="^(meta|semantic|content|data|instance)$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    count: bool = False,
+):
+    """
+    Find ISCC-IDs for an ISCC-CODE.
+
+    Matches the exact ISCC-CODE or, with `unit`, all ISCC-CODEs that share the given unit (e.g.
+    `unit=instance` for identical files). Results are paginated with an opaque `cursor` (`next`
+    of the previous page). With `count` only the number of matches is returned.
+    """
+    try:
+        norm = ic.iscc_normalize(iscc_code)
+        ic.iscc_validate(norm, strict=True)
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HttpError(400, str(e))
+    code = ic.iscc_clean(norm)
+    qs = IsccId.objects.filter(active=True, deleted=False, redacted=False)
+    if unit is None:
+        qs = qs.filter(iscc_code=code)
+    else:
+        value = units.decompose(code).get(unit)
+        if value is None:
+            raise HttpError(400, f"{iscc_code} has no {unit} unit")
+        qs = qs.filter(**{f"{unit}_unit": value})
+    if count:
+        return {"count": await qs.acount()}
+    if after is not None:
+        qs = qs.filter(did__gt=after)
+    qs = qs.order_by("did").values_list("did", "iscc_id", "iscc_code")
+    rows = [row async for row in qs[: limit + 1]]
+    items = [
+        dict(did=did, iscc_id=f"ISCC:{iid}", iscc_code=f"ISCC:{match}")
+        for did, iid, match in rows[:limit]
+    ]
+    cursor = encode_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+    return {"items": items, "next": cursor}
 
-    # Resolve if we can
-    if iscc_obj.metadata:
-        url = iscc_obj.metadata.get("redirect")
-        if url:
-            return 200, {"url": url}
 
-    # Redirect to local entry
-    return {"url": iscc_obj.get_registry_url()}
+@api.get(
+    "/iscc_code/{iscc_code}/similar",
+    tags=["public"],
+    auth=None,
+    response={200: Dict[str, List[s.Similar]], 503: Message},
+)
+def similar_units(
+    request,
+    iscc_code: str,
+    max_distance: int = Query(8, ge=0, le=64),
+    k: int = Query(10, ge=1, le=100),
+):
+    """Find declarations with similar ISCC-CODE units (top-k per unit within a Hamming distance)."""
+    try:
+        norm = ic.iscc_normalize(iscc_code)
+        ic.iscc_validate(norm, strict=True)
+    except ValueError as e:
+        raise HttpError(400, str(e))
+    try:
+        result = units.similar(ic.iscc_clean(norm), max_distance, k)
+    except RuntimeError as e:
+        return 503, Message(message=str(e))
+    return 200, {
+        name: [
+            dict(iscc_id=f"ISCC:{iid}", iscc_code=f"ISCC:{code}", distance=dist)
+            for iid, code, dist in matches
+        ]
+        for name, matches in result.items()
+    }
 
 
 @api.post("/forecast", tags=["public"], response=s.Forecast, auth=None, exclude_none=True)
@@ -110,40 +422,215 @@ def forecast(request, data: s.Forecast):
     return s.Forecast(iscc_id=f"ISCC:{iscc_id}")
 
 
+@api.post(
+    "/forecast/batch",
+    tags=["public"],
+    response={200: List[s.Forecast], 422: Message},
+    auth=None,
+    exclude_none=True,
+)
+def forecast_batch(request, data: List[s.Forecast]):
+    """Create ISCC-ID forecasts for many declarations (in input order)."""
+    if len(data) > settings.FORECAST_MAX_ITEMS:
+        return 422, Message(message=f"Max {settings.FORECAST_MAX_ITEMS} forecasts per request")
+    iscc_ids = mint_many([(f.iscc_code, f.chain_id, f.wallet) for f in data])
+    return 200, [s.Forecast(iscc_id=f"ISCC:{iscc_id}") for iscc_id in iscc_ids]
+
+
 ####################################################################################################
 # Private observer endpoints                                                                       #
 ####################################################################################################
 
 
 @api.get("/head/{chain_id}", tags=["observer"], response={200: Head, 422: Message})
-def head(request, chain_id: int, offset: int = 0):
+async def head(request, chain_id: int, offset: int = 0):
     """Return block header of the latest registration event for given chain."""
-    qs = IsccId.objects.filter(chain_id=chain_id).order_by("-did")
-    if not qs.exists():
+    # The ring holds the latest `HEAD_RING_SIZE` events (or all events of shorter chains)
+    ring = await ChainHead.objects.filter(chain_id=chain_id).afirst()
+    if ring is None:
         return 422, Message(message="No registrations found for chain")
-    try:
-        obj = qs[offset]
-    except IndexError:
+    obj = ring.event(offset)
+    if obj is None and len(ring.headers) >= settings.HEAD_RING_SIZE:
+        qs = IsccId.objects.filter(chain_id=chain_id).order_by("-did")
+        obj = await qs[offset : offset + 1].afirst()
+    if obj is None:
         return 422, Message(message=f"No registration at offset {offset}")
     return 200, obj
 
 
-@api.post("/register", tags=["observer"], response={201: RegistrationResponse, 422: Message})
-def register_(request, declartion: Declaration):
-    """Register an on-chain ISCC-Declaration for ISCC-ID minting."""
+def retry_later(request, chain_id: int) -> HttpResponse:
+    """Backpressure response for observers (503 with `Retry-After`)"""
+    message = Message(message=f"Ingest queue of chain {chain_id} is full")
+    response = api.create_response(request, message, status=503)
+    response["Retry-After"] = str(settings.INGEST_RETRY_AFTER)
+    return response
+
+
+def enqueue(declarations: List[Declaration]) -> List[s.Ticket]:
+    """Append declarations to the ingest queue and schedule the consumer of their chain."""
+    tickets = ingest.enqueue(declarations)
     try:
-        iid_obj = register(declartion)
+        apply_ingest(declarations[0].chain_id)
+    except Exception:
+        pass
+    return [s.Ticket(ticket=ticket, status=ingest.QUEUED) for ticket in tickets]
+
+
+@api.post(
+    "/register",
+    tags=["observer"],
+    response={
+        201: RegistrationResponse,
+        202: s.Ticket,
+        409: s.ForkPoint,
+        422: Message,
+        503: Message,
+    },
+    exclude_none=True,
+)
+def register_(request, declartion: Declaration):
+    """
+    Register an on-chain ISCC-Declaration for ISCC-ID minting.
+
+    With the ingest queue enabled the declaration is queued and a ticket is returned (`202`).
+    On chains with a confirmation depth the declaration is staged and its ISCC-ID is
+    `provisional`. A declaration that conflicts with a registered block of its chain is rejected
+    (`409`) with the fork point to rollback from.
+    """
+    if ingest.get_queue() is not None:
+        if ingest.full(declartion.chain_id):
+            return retry_later(request, declartion.chain_id)
+        return 202, enqueue([declartion])[0]
+    result = staging.submit([declartion])[0]
+    if isinstance(result, ForkError):
+        return 409, result.fork_point()
+    if isinstance(result, RegistrationError):
+        return 422, Message(message=str(result))
+    if isinstance(result, IsccId):
         # enqueue task to fetch metadata
         try:
-            fetch_metadata(iid_obj.did)
+            fetch_metadata(result.did)
         except Exception:
             pass
-        return 201, dict(did=iid_obj.did, iscc_id=f"ISCC:{iid_obj.iscc_id}")
+    return 201, registration(declartion, result)
+
+
+@api.post(
+    "/register/batch",
+    tags=["observer"],
+    response={
+        200: List[s.RegistrationResult],
+        202: List[s.Ticket],
+        422: Message,
+        503: Message,
+    },
+    exclude_none=True,
+)
+def register_batch_(request, declarations: List[Declaration]):
+    """
+    Register an ordered list of on-chain ISCC-Declarations from a single chain.
+
+    With the ingest queue enabled the declarations are queued and a ticket each is returned
+    (`202`).
+    """
+    if ingest.get_queue() is not None and declarations:
+        if ingest.full(declarations[0].chain_id):
+            return retry_later(request, declarations[0].chain_id)
+        try:
+            return 202, enqueue(declarations)
+        except RegistrationError as e:
+            return 422, Message(message=str(e))
+    try:
+        results = staging.submit(declarations)
     except RegistrationError as e:
         return 422, Message(message=str(e))
 
+    # enqueue a single task to fetch metadata
+    dids = [r.did for r in results if isinstance(r, IsccId) and r.meta_url]
+    if dids:
+        try:
+            fetch_metadata_batch(dids)
+        except Exception:
+            pass
+
+    return 200, [registration(d, result) for d, result in zip(declarations, results)]
+
+
+def registration(d: Declaration, result) -> dict:
+    """Registration result of a declaration (new, staged or failed)"""
+    if isinstance(result, IsccId):
+        return dict(did=result.did, iscc_id=f"ISCC:{result.iscc_id}")
+    if isinstance(result, StagedDeclaration):
+        return dict(did=result.did, iscc_id=f"ISCC:{result.iscc_id}", provisional=True)
+    if isinstance(result, ForkError):
+        return dict(did=d.did, error=str(result), fork=result.fork_point())
+    return dict(did=d.did, error=str(result))
+
+
+@api.post(
+    "/promote/{chain_id}",
+    tags=["observer"],
+    response={200: List[s.RegistrationResult]},
+    exclude_none=True,
+)
+def promote(request, chain_id: int, block_height: int):
+    """
+    Register staged declarations of a chain confirmed by the chain tip at `block_height`.
+
+    Declarations rejected at promotion are reported with their `error` (and `fork` point).
+    """
+    results = staging.promote(chain_id, block_height)
+    return 200, [registration(d, result) for d, result in results]
+
+
+@api.get("/ingest", tags=["observer"], response={200: s.IngestStatus, 404: Message})
+def ingest_status(request):
+    """Report ingest queue depth per chain (with `Retry-After` while a queue is full)."""
+    if ingest.get_queue() is None:
+        return 404, Message(message="Ingest queue is disabled")
+    queues = [dict(chain_id=c, depth=ingest.depth(c)) for c in ChainModel.Chain.values]
+    full = any(q["depth"] >= settings.INGEST_MAX_DEPTH for q in queues)
+    data = dict(queues=queues, max_depth=settings.INGEST_MAX_DEPTH, backpressure=full)
+    response = api.create_response(request, s.IngestStatus(**data), status=200)
+    if full:
+        response["Retry-After"] = str(settings.INGEST_RETRY_AFTER)
+    return response
+
+
+@api.get(
+    "/ingest/{ticket}",
+    tags=["observer"],
+    response={200: s.Ticket, 404: Message},
+    exclude_none=True,
+)
+def ingest_ticket(request, ticket: str):
+    """Poll the outcome of a queued registration."""
+    if ingest.get_queue() is None:
+        return 404, Message(message="Ingest queue is disabled")
+    result = ingest.status(ticket)
+    if result is None:
+        return 404, Message(message=f"Unknown ticket {ticket}")
+    return 200, result
+
+
+@api.post("/rollback/{block_hash}", tags=["observer"], response={200: s.Rollback, 404: Message})
+def rollback_(request, block_hash: str, chain_only: bool = False):
+    """
+    Rollback events to state before `block_hash`
 
-@api.post("/rollback/{block_hash}", tags=["observer"], response={200: Head, 404: Message})
-def rollback_(request, block_hash: str):
-    """Rollback events to state before `block_hash`"""
-    return rollback(block_hash)
+    With `chain_only` only events of the forked chain are removed. Staged declarations of the
+    forked chain from `block_hash` onwards are discarded (a reorg within the confirmation window
+    only discards staged declarations).
+    """
+    staged = StagedDeclaration.objects.filter(block_hash=block_hash)
+    chain_id = staged.values_list("chain_id", flat=True).first()
+    discarded = staging.discard(block_hash)
+    if chain_id is not None and not Block.objects.filter(block_hash=block_hash).exists():
+        ring = ChainHead.objects.filter(chain_id=chain_id).first()
+        obj = ring.event(0) if ring else None
+        if obj is None:
+            return 404, Message(message=f"Discarded {discarded} staged declarations")
+        return 200, s.Rollback(**Head.from_orm(obj).dict(by_alias=True), discarded=discarded)
+    result = rollback(block_hash, chain_only=chain_only)
+    result.discarded = discarded
+    return result
@@ -0,0 +1,243 @@
+"""
+Read-through cache for ISCC-ID resolution.
+
+Maps ISCC-IDs to their redirect URL (including negative results for unknown ISCC-IDs) with an
+in-process LRU tier and an optional shared Redis tier (`RESOLVER_CACHE_URL`). Entries in the local
+tier expire after `RESOLVER_CACHE_TTL` seconds to bound staleness across worker processes.
+
+Invalidation replaces shared entries with short-lived tombstones and shared entries are only
+written if absent, so a read-through that looked up the database before the invalidating commit
+cannot write its stale URL back for the (long) `RESOLVER_CACHE_REDIS_TTL`.
+"""
+from collections import Counter, OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import Dict, Iterable, List, Optional
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from loguru import logger as log
+
+
+NOT_FOUND = ""
+#: Shared tier marker of a recently invalidated ISCC-ID (read as a cache miss)
+TOMBSTONE = "\x00"
+
+
+class LRU:
+    """Thread-safe in-process LRU mapping with per-entry time to live."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < monotonic():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        with self.lock:
+            self.data[key] = (monotonic() + self.ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def __len__(self):
+        return len(self.data)
+
+
+class ResolverCache:
+    """Two tier cache for ISCC-ID redirect URLs."""
+
+    prefix = "iscc-registry:resolver:"
+    hits_key = "iscc-registry:resolver-hits"
+    hits_flush = 100
+
+    def __init__(self, maxsize: int, ttl: float, redis_url: str = "", redis_ttl: int = 0):
+        self.local = LRU(maxsize, ttl)
+        self.redis = None
+        self.redis_ttl = redis_ttl or None
+        self.tombstone_ttl = max(int(ttl), 1)
+        self.hits = Counter()
+        if redis_url:
+            import redis
+
+            self.redis = redis.Redis.from_url(redis_url)
+
+    def get(self, iscc_id: str) -> Optional[str]:
+        """Return cached URL, `NOT_FOUND` for cached negative result or None for a cache miss."""
+        value = self.local.get(iscc_id)
+        if value is None and self.redis is not None:
+            try:
+                value = self.redis.get(self.prefix + iscc_id)
+            except Exception as e:
+                log.warning(f"resolver cache read failed: {e}")
+            if value is not None:
+                value = value.decode("utf-8")
+                if value == TOMBSTONE:
+                    return None
+                self.local.set(iscc_id, value)
+        return value
+
+    def set(self, iscc_id: str, url: str):
+        self.local.set(iscc_id, url)
+        if self.redis is not None:
+            try:
+                self.redis.set(self.prefix + iscc_id, url, ex=self.redis_ttl, nx=True)
+            except Exception as e:
+                log.warning(f"resolver cache write failed: {e}")
+
+    def delete(self, iscc_ids: Iterable[str]):
+        keys = []
+        for iscc_id in iscc_ids:
+            self.local.delete(iscc_id)
+            keys.append(self.prefix + iscc_id)
+        if keys and self.redis is not None:
+            pipe = self.redis.pipeline(transaction=False)
+            for key in keys:
+                pipe.set(key, TOMBSTONE, ex=self.tombstone_ttl)
+            pipe.execute()
+
+    def hit(self, iscc_id: str):
+        """Count resolution of ISCC-ID (flushed to shared tier in batches)."""
+        if self.redis is None:
+            return
+        self.hits[iscc_id] += 1
+        if sum(self.hits.values()) >= self.hits_flush:
+            hits, self.hits = self.hits, Counter()
+            pipe = self.redis.pipeline(transaction=False)
+            for key, count in hits.items():
+                pipe.zincrby(self.hits_key, count, key)
+            try:
+                pipe.execute()
+            except Exception as e:
+                log.warning(f"resolver hit count flush failed: {e}")
+
+    def top(self, n: int) -> List[str]:
+        """Return the `n` most resolved ISCC-IDs (requires shared tier)."""
+        if self.redis is None:
+            return []
+        return [k.decode("utf-8") for k in self.redis.zrevrange(self.hits_key, 0, n - 1)]
+
+    def clear(self):
+        self.local.clear()
+        self.hits.clear()
+
+
+resolver_cache = ResolverCache(
+    maxsize=settings.RESOLVER_CACHE_SIZE,
+    ttl=settings.RESOLVER_CACHE_TTL,
+    redis_url=settings.RESOLVER_CACHE_URL,
+    redis_ttl=settings.RESOLVER_CACHE_REDIS_TTL,
+)
+
+
+#: Redirect URL of the current declaration (lookup path from the live ISCC-ID projection)
+REDIRECT = "event__meta_blob__data__redirect"
+
+
+def lookup_urls(iscc_ids: Iterable[str]) -> Dict[str, str]:
+    """Lookup redirect URLs for ISCC-IDs from the database (`NOT_FOUND` if not resolvable)."""
+    from iscc_registry.models import IsccId, LiveIsccId
+
+    urls = dict.fromkeys(iscc_ids, NOT_FOUND)
+    qs = LiveIsccId.objects.filter(iscc_id__in=list(urls))
+    for iscc_id, did, redirect in qs.values_list("iscc_id", "event_id", REDIRECT):
+        urls[iscc_id] = redirect or IsccId(did=did).get_registry_url()
+    return urls
+
+
+def resolve_url(iscc_id: str) -> Optional[str]:
+    """Resolve ISCC-ID (without prefix) to its redirect URL (None if it does not exist)."""
+    url = resolver_cache.get(iscc_id)
+    if url is None:
+        url = lookup_urls([iscc_id])[iscc_id]
+        resolver_cache.set(iscc_id, url)
+    resolver_cache.hit(iscc_id)
+    return url or None
+
+
+async def alookup_urls(iscc_ids: Iterable[str]) -> Dict[str, str]:
+    """Async version of `lookup_urls` using the async ORM interface."""
+    from iscc_registry.models import IsccId, LiveIsccId
+
+    urls = dict.fromkeys(iscc_ids, NOT_FOUND)
+    qs = LiveIsccId.objects.filter(iscc_id__in=list(urls))
+    async for iscc_id, did, redirect in qs.values_list("iscc_id", "event_id", REDIRECT):
+        urls[iscc_id] = redirect or IsccId(did=did).get_registry_url()
+    return urls
+
+
+async def aresolve_url(iscc_id: str) -> Optional[str]:
+    """
+    Async version of `resolve_url`.
+
+    Hits in the in-process tier are served without leaving the event loop. The (blocking) shared
+    tier is only consulted via a thread if configured.
+    """
+    url = resolver_cache.local.get(iscc_id)
+    if url is None:
+        if resolver_cache.redis is not None:
+            url = await sync_to_async(resolver_cache.get)(iscc_id)
+        if url is None:
+            url = (await alookup_urls([iscc_id]))[iscc_id]
+            if resolver_cache.redis is not None:
+                await sync_to_async(resolver_cache.set)(iscc_id, url)
+            else:
+                resolver_cache.set(iscc_id, url)
+    if resolver_cache.redis is not None:
+        await sync_to_async(resolver_cache.hit)(iscc_id)
+    return url or None
+
+
+def warm(iscc_ids: Iterable[str]) -> int:
+    """Populate resolver cache for ISCC-IDs. Returns number of cached entries."""
+    urls = lookup_urls(iscc_ids)
+    for iscc_id, url in urls.items():
+        resolver_cache.set(iscc_id, url)
+    return len(urls)
+
+
+def invalidate(iscc_ids: Iterable[str]):
+    """
+    Invalidate cached resolution for ISCC-IDs once the current transaction commits.
+
+    If `HTTP_PURGE_URL` is configured the ISCC-IDs are also purged (as surrogate keys) from the
+    caching reverse proxy.
+    """
+    iscc_ids = list(iscc_ids)
+    if not iscc_ids:
+        return
+
+    def _invalidate():
+        try:
+            resolver_cache.delete(iscc_ids)
+        except Exception as e:
+            log.error(f"resolver cache invalidation failed: {e}")
+        if settings.HTTP_PURGE_URL:
+            from iscc_registry.tasks import purge_http_cache
+
+            try:
+                purge_http_cache(sorted(iscc_ids))
+            except Exception as e:
+                log.error(f"enqueue http cache purge failed: {e}")
+
+    transaction.on_commit(_invalidate)
@@ -3,3 +3,22 @@
 
 class RegistrationError(Exception):
     pass
+
+
+class ForkError(RegistrationError):
+    """Declaration conflicts with a registered block of its chain"""
+
+    def __init__(self, message: str, chain_id: int, block_height: int, block_hash: str):
+        super().__init__(message)
+        self.chain_id = chain_id
+        self.block_height = block_height
+        self.block_hash = block_hash
+
+    def fork_point(self) -> dict:
+        """Machine-readable fork point (rollback from `block_hash`)"""
+        return dict(
+            message=str(self),
+            chain_id=self.chain_id,
+            block_height=self.block_height,
+            block_hash=self.block_hash,
+        )
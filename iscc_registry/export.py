@@ -0,0 +1,177 @@
+"""
+Streaming NDJSON export of the registry.
+
+Declarations are read in did order with `.iterator(chunk_size=...)` (a server-side cursor on
+PostgreSQL) and serialized without model instances, so memory stays flat independent of the
+registry size. Exports can be resumed after the last exported `did` and optionally gzipped.
+
+Each line carries the full `schema.Declaration` field set (with `chain_id` and the `parent_hash`
+from the block ledger), so a history export can be fed into `import_declarations` to seed a
+mirror.
+
+The public export endpoint serves export files written by a background task (see `write`), as
+ASGI streaming responses are iterated synchronously on the event loop.
+"""
+import json
+import os
+import zlib
+from pathlib import Path
+from time import time
+from typing import Dict, Iterator, Optional
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from iscc_registry.models import Block, ChainModel, IsccId
+
+
+#: Seconds without writes after which a partial export file is considered abandoned
+STALLED = 60
+
+FIELDS = (
+    "did",
+    "iscc_id",
+    "iscc_code",
+    "declarer_id",
+    "meta_url",
+    "message",
+    "chain_id",
+    "block_height",
+    "block_hash",
+    "parent_hash",
+    "tx_idx",
+    "tx_hash",
+    "timestamp",
+    "registrar_id",
+    "revision",
+    "active",
+)
+
+
+def rows(history: bool = False, after: Optional[int] = None, chunk_size: int = 2000) -> Iterator:
+    """Declaration rows in did order (live ISCC-IDs only unless `history`)"""
+    qs = IsccId.objects.filter(redacted=False)
+    if not history:
+        qs = qs.filter(active=True, deleted=False)
+    if after is not None:
+        qs = qs.filter(did__gt=after)
+    blocks = Block.objects.filter(chain_id=OuterRef("chain_id"), block_hash=OuterRef("block_hash"))
+    qs = qs.annotate(parent_hash=Subquery(blocks.values("parent_hash")[:1]))
+    return qs.order_by("did").values_list(*FIELDS).iterator(chunk_size=chunk_size)
+
+
+def serialize(row: tuple, chains: Dict[int, str]) -> str:
+    """Serialize a declaration row (declaration endpoint fields plus `schema.Declaration` fields)"""
+    data = dict(zip(FIELDS, row))
+    return json.dumps(
+        {
+            "did": data["did"],
+            "iscc_id": f"ISCC:{data['iscc_id']}",
+            "iscc_code": f"ISCC:{data['iscc_code']}",
+            "declarer": data["declarer_id"],
+            "meta_url": data["meta_url"],
+            "message": data["message"],
+            "chain": chains.get(data["chain_id"], ""),
+            "chain_id": data["chain_id"],
+            "block_height": data["block_height"],
+            "block_hash": data["block_hash"],
+            "parent_hash": data["parent_hash"],
+            "tx_idx": data["tx_idx"],
+            "tx_hash": data["tx_hash"],
+            "timestamp": data["timestamp"].isoformat(),
+            "registrar": data["registrar_id"],
+            "revision": data["revision"],
+            "active": data["active"],
+        }
+    )
+
+
+def ndjson(
+    history: bool = False, after: Optional[int] = None, chunk_size: int = 2000
+) -> Iterator[bytes]:
+    """Export declarations as NDJSON (one bytes chunk per `chunk_size` declarations)"""
+    chains = dict(ChainModel.objects.values_list("chain", "name"))
+    lines = []
+    for row in rows(history, after, chunk_size):
+        lines.append(serialize(row, chains))
+        if len(lines) == chunk_size:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def gzipped(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Compress a stream of chunks into a single gzip stream"""
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def snapshot_path(history: bool = False, after: Optional[int] = None, gzip: bool = False) -> Path:
+    """Export file for the given export options (in `EXPORT_ROOT`)"""
+    name = "history" if history else "live"
+    if after is not None:
+        name += f"-after-{after}"
+    suffix = ".ndjson.gz" if gzip else ".ndjson"
+    return Path(settings.EXPORT_ROOT) / f"iscc-registry-{name}{suffix}"
+
+
+def partial_path(path: Path) -> Path:
+    """Temporary file an export is written to before it is moved into place"""
+    return path.with_name(path.name + ".part")
+
+
+def age(path: Path) -> Optional[float]:
+    """Seconds since the last modification of a file (None if it does not exist)"""
+    try:
+        return time() - path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def is_fresh(path: Path) -> bool:
+    """Whether an export file exists and is younger than `EXPORT_MAX_AGE`"""
+    seconds = age(path)
+    return seconds is not None and seconds < settings.EXPORT_MAX_AGE
+
+
+def is_building(path: Path) -> bool:
+    """Whether an export file is being written (partial file written to recently)"""
+    seconds = age(partial_path(path))
+    return seconds is not None and seconds < STALLED
+
+
+def write(
+    path: Path,
+    history: bool = False,
+    after: Optional[int] = None,
+    gzip: bool = False,
+    chunk_size: int = 2000,
+) -> int:
+    """Write an export file (replaced atomically once complete). Returns the size in bytes."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    chunks = ndjson(history, after, chunk_size)
+    if gzip:
+        chunks = gzipped(chunks)
+    partial = partial_path(path)
+    size = 0
+    with open(partial, "wb") as outf:
+        for chunk in chunks:
+            outf.write(chunk)
+            size += len(chunk)
+    os.replace(partial, path)
+    return size
+
+
+def prune(root: Path) -> int:
+    """Delete outdated export files (rebuilt on request). Returns number of deleted files."""
+    deleted = 0
+    for path in root.glob("iscc-registry-*"):
+        seconds = age(path)
+        limit = STALLED if path.name.endswith(".part") else settings.EXPORT_MAX_AGE
+        if seconds is not None and seconds >= limit:
+            path.unlink(missing_ok=True)
+            deleted += 1
+    return deleted
@@ -0,0 +1,145 @@
+"""
+Concurrent batched metadata fetching.
+
+Metadata for pending declarations (with `meta_url` but without a metadata blob) is fetched in
+chunks by a thread pool over a pooled HTTP session with a per-host concurrency limit. Metadata is
+stored content-addressed in `MetadataBlob` (keyed by IPFS CID or Meta-URL hash), so each distinct
+Meta-URL is downloaded only once and declarations just reference the shared blob. Content behind
+raw-codec CIDs is verified locally before it is stored.
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from threading import BoundedSemaphore, Lock
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+from django.conf import settings
+from loguru import logger as log
+from requests.adapters import HTTPAdapter
+import requests
+from iscc_registry.cache import invalidate
+from iscc_registry.models import IsccId, MetadataBlob
+from iscc_registry.utils import gateway_url, is_immutable, metadata_key, verify_cid
+
+
+class MetadataFetcher:
+    """Fetch JSON metadata concurrently with connection pooling and per-host limits."""
+
+    def __init__(self, workers: int, per_host: int, timeout: int):
+        self.workers = workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.limits = defaultdict(lambda: BoundedSemaphore(self.per_host))
+        self.lock = Lock()
+
+    def limit(self, url: str) -> BoundedSemaphore:
+        with self.lock:
+            return self.limits[urlsplit(url).netloc]
+
+    def fetch(self, meta_url: str) -> Optional[dict]:
+        """Fetch metadata for a single Meta-URL (None on failure or CID mismatch)."""
+        url = gateway_url(meta_url)
+        try:
+            with self.limit(url):
+                response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            key = metadata_key(meta_url)
+            if is_immutable(key) and verify_cid(key, response.content) is False:
+                log.warning(f"fetched metadata from {url} does not match its CID")
+                return None
+            return response.json() or None
+        except (requests.RequestException, ValueError) as e:
+            log.warning(f"fetch metadata from {url} failed: {e}")
+            return None
+
+    def fetch_many(self, meta_urls: Dict[Any, str]) -> Dict[Any, Optional[dict]]:
+        """Fetch metadata for a mapping of key -> Meta-URL concurrently."""
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = pool.map(self.fetch, meta_urls.values())
+            return dict(zip(meta_urls.keys(), results))
+
+
+@lru_cache(maxsize=None)
+def get_fetcher() -> MetadataFetcher:
+    """Process wide fetcher (shares the connection pool between tasks)"""
+    return MetadataFetcher(
+        workers=settings.FETCH_WORKERS,
+        per_host=settings.FETCH_PER_HOST,
+        timeout=settings.READ_TIMEOUT,
+    )
+
+
+def resolve(
+    objs: List[IsccId], fetcher: Optional[MetadataFetcher] = None, refresh: bool = False
+) -> int:
+    """
+    Link declarations to their metadata blobs. Returns number of linked declarations.
+
+    Only content that is not stored yet is fetched (once per distinct Meta-URL). With `refresh`
+    content behind mutable (non-IPFS) Meta-URLs is fetched again.
+    """
+    keys = {obj.did: metadata_key(obj.meta_url) for obj in objs}
+    known = set(
+        MetadataBlob.objects.filter(key__in=set(keys.values())).values_list("key", flat=True)
+    )
+    if refresh:
+        known = {key for key in known if is_immutable(key)}
+    missing = {}
+    for obj in objs:
+        if keys[obj.did] not in known:
+            missing.setdefault(keys[obj.did], obj.meta_url)
+    if missing:
+        results = (fetcher or get_fetcher()).fetch_many(missing)
+        blobs = [MetadataBlob(key=key, data=data) for key, data in results.items() if data]
+        if blobs:
+            MetadataBlob.objects.bulk_create(
+                blobs, update_conflicts=True, unique_fields=["key"], update_fields=["data"]
+            )
+            known.update(blob.key for blob in blobs)
+            if refresh:
+                # Refreshed mutable content changed for all declarations sharing the Meta-URL
+                shared = IsccId.objects.filter(meta_blob__in=[blob.key for blob in blobs])
+                invalidate(set(shared.values_list("iscc_id", flat=True)))
+    updated = []
+    for obj in objs:
+        if keys[obj.did] in known and obj.meta_blob_id != keys[obj.did]:
+            obj.meta_blob_id = keys[obj.did]
+            updated.append(obj)
+    if updated:
+        IsccId.objects.bulk_update(updated, fields=["meta_blob"])
+        invalidate([obj.iscc_id for obj in updated])
+    return sum(1 for obj in objs if keys[obj.did] in known)
+
+
+def fetch_dids(
+    dids: Iterable[int], fetcher: Optional[MetadataFetcher] = None, refresh: bool = False
+) -> int:
+    """Fetch and store metadata for the given declarations. Returns number of linked rows."""
+    objs = list(
+        IsccId.objects.filter(did__in=list(dids), meta_url__isnull=False).only(
+            "did", "iscc_id", "meta_url", "meta_blob"
+        )
+    )
+    return resolve(objs, fetcher, refresh)
+
+
+def fetch_pending(chunk_size: int = 100, limit: Optional[int] = None) -> int:
+    """Fetch metadata for all active declarations that have none yet (walks in did order)."""
+    fetcher = get_fetcher()
+    qs = IsccId.objects.filter(active=True, meta_url__isnull=False, meta_blob__isnull=True)
+    qs = qs.only("did", "iscc_id", "meta_url", "meta_blob").order_by("did")
+    last_did, total, seen = -1, 0, 0
+    while limit is None or seen < limit:
+        size = chunk_size if limit is None else min(chunk_size, limit - seen)
+        objs = list(qs.filter(did__gt=last_did)[:size])
+        if not objs:
+            break
+        total += resolve(objs, fetcher)
+        seen += len(objs)
+        last_did = objs[-1].did
+        log.info(f"fetched metadata for {total} of {seen} pending declarations")
+    return total
@@ -0,0 +1,298 @@
+"""
+Optional asynchronous ingest queue for observer registrations.
+
+With `INGEST_QUEUE` enabled `/register` only validates declarations, appends them to a per-chain
+queue and returns a ticket. The `apply_ingest` task drains the queue of a chain in batches of
+`INGEST_BATCH_SIZE` (sorted by did) through `staging.submit` and stores the outcome per ticket
+for status polling. Entries are only removed from the queue after their batch was committed, so a
+crashed consumer re-applies them (identical declarations that are already registered or staged are
+reported as such). Tickets of staged declarations are updated with the outcome of their promotion
+(see `settle`).
+
+If a batch fails with an unexpected error its entries are applied one by one. Entries that still
+fail (or cannot be parsed) are dead-lettered: their ticket is `failed` with the error and they are
+removed from the queue, so a single poison entry does not block the queue of its chain.
+
+The queue is a Redis stream per chain (`INGEST_QUEUE=redis`, using `REDIS_URL`) or an in-process
+stand-in (`INGEST_QUEUE=memory`) for tests and development.
+"""
+import json
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from itertools import count
+from threading import RLock
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from loguru import logger as log
+from iscc_registry.exceptions import ForkError, RegistrationError
+from iscc_registry.models import IsccId, StagedDeclaration
+from iscc_registry.schema import Declaration
+from iscc_registry.staging import submit
+
+
+QUEUED = "queued"
+STAGED = "staged"
+REGISTERED = "registered"
+FAILED = "failed"
+
+
+def chain_of(ticket: str) -> int:
+    """Chain-ID of a ticket (tickets are `<chain_id>-<entry id>`)"""
+    return int(ticket.split("-", 1)[0])
+
+
+class MemoryQueue:
+    """In-process stand-in for the Redis ingest queue (tests and development)."""
+
+    def __init__(self):
+        self.streams = defaultdict(OrderedDict)
+        self.results = {}
+        self.tracked = {}
+        self.seq = count(1)
+        self.lock = RLock()
+
+    def append(self, chain_id: int, payloads: List[str]) -> List[str]:
+        with self.lock:
+            tickets = [f"{chain_id}-{next(self.seq)}" for _ in payloads]
+            self.streams[chain_id].update(zip(tickets, payloads))
+        return tickets
+
+    def read(self, chain_id: int, n: int) -> List[Tuple[str, str]]:
+        with self.lock:
+            return list(self.streams[chain_id].items())[:n]
+
+    def ack(self, chain_id: int, results: Dict[str, str], keep: bool = False):
+        with self.lock:
+            self.store(results, keep=keep)
+            for ticket in results:
+                self.streams[chain_id].pop(ticket, None)
+
+    def store(self, results: Dict[str, str], keep: bool = False):
+        with self.lock:
+            for ticket, result in results.items():
+                if not (keep and ticket in self.results):
+                    self.results[ticket] = result
+
+    def track(self, tickets: Dict[int, str]):
+        with self.lock:
+            self.tracked.update(tickets)
+
+    def tickets(self, dids: List[int]) -> Dict[int, str]:
+        return {did: self.tracked[did] for did in dids if did in self.tracked}
+
+    def depth(self, chain_id: int) -> int:
+        return len(self.streams[chain_id])
+
+    def pending(self, ticket: str) -> bool:
+        return ticket in self.streams[chain_of(ticket)]
+
+    def result(self, ticket: str) -> Optional[str]:
+        return self.results.get(ticket)
+
+
+class RedisQueue:
+    """Durable ingest queue with one Redis stream per chain."""
+
+    prefix = "iscc-registry:ingest:"
+    results_prefix = "iscc-registry:ingest-result:"
+    tickets_prefix = "iscc-registry:ingest-ticket:"
+
+    def __init__(self, url: str, result_ttl: int):
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.result_ttl = result_ttl
+
+    def key(self, chain_id: int) -> str:
+        return f"{self.prefix}{chain_id}"
+
+    def append(self, chain_id: int, payloads: List[str]) -> List[str]:
+        pipe = self.redis.pipeline()
+        for payload in payloads:
+            pipe.xadd(self.key(chain_id), {"declaration": payload})
+        return [f"{chain_id}-{entry_id.decode()}" for entry_id in pipe.execute()]
+
+    def read(self, chain_id: int, n: int) -> List[Tuple[str, str]]:
+        entries = self.redis.xrange(self.key(chain_id), count=n)
+        return [
+            (f"{chain_id}-{entry_id.decode()}", fields[b"declaration"].decode())
+            for entry_id, fields in entries
+        ]
+
+    def ack(self, chain_id: int, results: Dict[str, str], keep: bool = False):
+        if not results:
+            return
+        pipe = self.redis.pipeline()
+        self.store(results, keep=keep, pipe=pipe)
+        pipe.xdel(self.key(chain_id), *[ticket.split("-", 1)[1] for ticket in results])
+        pipe.execute()
+
+    def store(self, results: Dict[str, str], keep: bool = False, pipe=None):
+        execute = pipe is None
+        pipe = self.redis.pipeline() if execute else pipe
+        for ticket, result in results.items():
+            pipe.set(self.results_prefix + ticket, result, ex=self.result_ttl, nx=keep)
+        if execute:
+            pipe.execute()
+
+    def track(self, tickets: Dict[int, str]):
+        pipe = self.redis.pipeline()
+        for did, ticket in tickets.items():
+            pipe.set(f"{self.tickets_prefix}{did}", ticket, ex=self.result_ttl)
+        pipe.execute()
+
+    def tickets(self, dids: List[int]) -> Dict[int, str]:
+        if not dids:
+            return {}
+        values = self.redis.mget([f"{self.tickets_prefix}{did}" for did in dids])
+        return {did: v.decode() for did, v in zip(dids, values) if v is not None}
+
+    def depth(self, chain_id: int) -> int:
+        return self.redis.xlen(self.key(chain_id))
+
+    def pending(self, ticket: str) -> bool:
+        entry_id = ticket.split("-", 1)[1]
+        return bool(self.redis.xrange(self.key(chain_of(ticket)), entry_id, entry_id))
+
+    def result(self, ticket: str) -> Optional[str]:
+        value = self.redis.get(self.results_prefix + ticket)
+        return value.decode() if value is not None else None
+
+
+@lru_cache(maxsize=None)
+def get_queue():
+    """Configured ingest queue (None if registrations are applied synchronously)"""
+    if settings.INGEST_QUEUE == "redis":
+        return RedisQueue(settings.REDIS_URL, settings.INGEST_RESULT_TTL)
+    if settings.INGEST_QUEUE == "memory":
+        return MemoryQueue()
+    return None
+
+
+def enqueue(declarations: List[Declaration]) -> List[str]:
+    """Append declarations of a single chain to its ingest queue. Returns a ticket each."""
+    chain_ids = {d.chain_id for d in declarations}
+    if len(chain_ids) != 1:
+        raise RegistrationError("Batch registration requires declarations from a single chain")
+    return get_queue().append(chain_ids.pop(), [d.json() for d in declarations])
+
+
+def depth(chain_id: int) -> int:
+    """Number of queued declarations of a chain"""
+    return get_queue().depth(chain_id)
+
+
+def full(chain_id: int) -> bool:
+    """Whether observers should back off before appending to the queue of a chain"""
+    return depth(chain_id) >= settings.INGEST_MAX_DEPTH
+
+
+def status(ticket: str) -> Optional[dict]:
+    """Outcome of a ticket (`queued` while pending, None for unknown or expired tickets)"""
+    try:
+        chain_of(ticket)
+    except ValueError:
+        return None
+    queue = get_queue()
+    result = queue.result(ticket)
+    if result is not None:
+        return json.loads(result)
+    if queue.pending(ticket):
+        return dict(ticket=ticket, status=QUEUED)
+    return None
+
+
+def apply(chain_id: int, batch_size: int) -> Optional[List[int]]:
+    """
+    Apply the next batch of queued declarations of a chain in did order.
+
+    Returns the dids of new registrations with a Meta-URL or None if the queue is empty.
+    """
+    queue = get_queue()
+    entries = queue.read(chain_id, batch_size)
+    if not entries:
+        return None
+    batch, outcomes, staged = [], {}, {}
+    for ticket, payload in entries:
+        try:
+            batch.append((Declaration.parse_raw(payload), ticket))
+        except ValueError as e:
+            log.error(f"dead-lettering unparsable ingest entry {ticket}: {e}")
+            outcomes[ticket] = json.dumps(
+                dict(ticket=ticket, status=FAILED, error=f"Invalid declaration: {e}")
+            )
+    batch.sort(key=lambda entry: entry[0].did)
+    # Remember tickets so promotion of staged declarations can settle them
+    queue.track({d.did: ticket for d, ticket in batch})
+    declarations = [d for d, _ in batch]
+    try:
+        results = submit(declarations)
+    except Exception:
+        log.exception(f"ingest batch of chain {chain_id} failed, applying entries one by one")
+        results = [isolate(d) for d in declarations]
+    dids = [r.did for r in results if isinstance(r, IsccId) and r.meta_url]
+    results = replayed(declarations, results)
+    for (d, ticket), result in zip(batch, results):
+        target = staged if isinstance(result, StagedDeclaration) else outcomes
+        target[ticket] = outcome(ticket, d, result)
+    queue.ack(chain_id, outcomes)
+    # Keep the outcome of declarations already promoted within the same submit
+    queue.ack(chain_id, staged, keep=True)
+    return dids
+
+
+def isolate(d: Declaration):
+    """Apply a single declaration, turning unexpected errors into a dead-letter failure."""
+    try:
+        return submit([d])[0]
+    except Exception as e:
+        log.exception(f"dead-lettering ingest declaration {d.did}")
+        return RegistrationError(f"Unprocessable declaration {d.did}: {e!r}")
+
+
+def replayed(declarations: List[Declaration], results: list) -> list:
+    """Replace errors of re-applied declarations by their existing registration or staging."""
+    failed = [d.did for d, r in zip(declarations, results) if isinstance(r, RegistrationError)]
+    if not failed:
+        return results
+    known = {obj.did: obj for obj in IsccId.objects.filter(did__in=failed)}
+    known.update({obj.did: obj for obj in StagedDeclaration.objects.filter(did__in=failed)})
+    return [
+        known[d.did] if d.did in known and identical(d, known[d.did]) else result
+        for d, result in zip(declarations, results)
+    ]
+
+
+def identical(d: Declaration, obj) -> bool:
+    """Whether a registered (or staged) declaration stems from the same transaction as `d`"""
+    if isinstance(obj, StagedDeclaration):
+        return obj.block_hash == d.block_hash and obj.declaration["tx_hash"] == d.tx_hash
+    return obj.block_hash == d.block_hash and obj.tx_hash == d.tx_hash
+
+
+def outcome(ticket: str, d: Declaration, result) -> str:
+    """Serialized ticket outcome of a declaration (registered, staged or failed)"""
+    if isinstance(result, IsccId):
+        data = dict(status=REGISTERED, did=result.did, iscc_id=f"ISCC:{result.iscc_id}")
+    elif isinstance(result, StagedDeclaration):
+        data = dict(status=STAGED, did=result.did, iscc_id=f"ISCC:{result.iscc_id}")
+    else:
+        data = dict(status=FAILED, did=d.did, error=str(result))
+        if isinstance(result, ForkError):
+            data["fork"] = result.fork_point()
+    return json.dumps(dict(ticket=ticket, **data))
+
+
+def settle(promoted: List[Tuple[Declaration, object]]):
+    """Update the tickets of promoted staged declarations with their registration outcome."""
+    queue = get_queue()
+    if queue is None:
+        return
+    tickets = queue.tickets([d.did for d, _ in promoted])
+    outcomes = {
+        tickets[d.did]: outcome(tickets[d.did], d, result)
+        for d, result in promoted
+        if d.did in tickets
+    }
+    if outcomes:
+        queue.store(outcomes)
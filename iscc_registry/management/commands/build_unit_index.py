@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from iscc_registry.units import UnitIndex
+
+
+class Command(BaseCommand):
+    help = "Write a snapshot of the ISCC-CODE unit similarity index"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output", default=None, help="Snapshot path (default UNIT_INDEX_PATH)"
+        )
+
+    def handle(self, *args, **options):
+        path = options["output"] or settings.UNIT_INDEX_PATH
+        if not path:
+            raise CommandError("No output path (set --output or UNIT_INDEX_PATH)")
+        index = UnitIndex.from_db()
+        index.save(path)
+        self.stdout.write(self.style.SUCCESS(f"Wrote unit index with {len(index)} rows to {path}"))
@@ -0,0 +1,35 @@
+import sys
+from django.core.management.base import BaseCommand
+from iscc_registry import export
+
+
+class Command(BaseCommand):
+    help = "Export declarations as NDJSON in did order"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Output file (use - for stdout)")
+        parser.add_argument("--history", action="store_true", help="Export all declarations")
+        parser.add_argument("--after", type=int, default=None, help="Resume after this did")
+        parser.add_argument("--gzip", action="store_true", help="Compress output with gzip")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows per database fetch")
+
+    def handle(self, *args, **options):
+        chunks = export.ndjson(
+            history=options["history"], after=options["after"], chunk_size=options["chunk_size"]
+        )
+        if options["gzip"]:
+            chunks = export.gzipped(chunks)
+        size = 0
+        if options["path"] == "-":
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+                size += len(chunk)
+            sys.stdout.buffer.flush()
+        else:
+            # Append when resuming so a partial export can be completed
+            mode = "ab" if options["after"] is not None else "wb"
+            with open(options["path"], mode) as outf:
+                for chunk in chunks:
+                    outf.write(chunk)
+                    size += len(chunk)
+            self.stdout.write(self.style.SUCCESS(f"Exported {size} bytes to {options['path']}"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from iscc_registry.fetcher import fetch_pending
+
+
+class Command(BaseCommand):
+    help = "Fetch metadata for all declarations that have a Meta-URL but no metadata yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=100, help="Declarations per chunk")
+        parser.add_argument("--limit", type=int, default=None, help="Max declarations to process")
+
+    def handle(self, *args, **options):
+        updated = fetch_pending(chunk_size=options["chunk_size"], limit=options["limit"])
+        self.stdout.write(self.style.SUCCESS(f"Stored metadata for {updated} declarations"))
@@ -0,0 +1,114 @@
+import itertools
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from pydantic import ValidationError
+from iscc_registry.models import IsccId
+from iscc_registry.schema import Declaration
+from iscc_registry.tasks import fetch_metadata_batch
+from iscc_registry.transactions import register_batch
+
+
+class Command(BaseCommand):
+    help = "Import ISCC declarations from a JSONL/NDJSON file (or stdin)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path to JSONL file or '-' for stdin")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Declarations per batch")
+        parser.add_argument(
+            "--checkpoint", help="Checkpoint file for resuming (default: <path>.checkpoint)"
+        )
+        parser.add_argument("--restart", action="store_true", help="Ignore existing checkpoint")
+        parser.add_argument("--no-metadata", action="store_true", help="Skip metadata fetching")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        checkpoint = options["checkpoint"]
+        if checkpoint is None and path != "-":
+            checkpoint = path + ".checkpoint"
+        checkpoint = Path(checkpoint) if checkpoint else None
+
+        skip = 0
+        if checkpoint and checkpoint.exists() and not options["restart"]:
+            skip = json.loads(checkpoint.read_text())["lines"]
+            self.stdout.write(f"Resuming after line {skip}")
+
+        try:
+            infile = sys.stdin if path == "-" else open(path, "rt", encoding="utf-8")
+        except OSError as e:
+            raise CommandError(str(e))
+        try:
+            self.run(infile, skip, checkpoint, options["chunk_size"], options["no_metadata"])
+        finally:
+            if infile is not sys.stdin:
+                infile.close()
+
+    def run(self, infile, skip, checkpoint, chunk_size, no_metadata):
+        lines = itertools.islice(infile, skip, None)
+        position = skip
+        registered = failed = 0
+        start = time.perf_counter()
+        while True:
+            chunk = list(itertools.islice(lines, chunk_size))
+            if not chunk:
+                break
+            declarations = []
+            for lineno, line in enumerate(chunk, start=position + 1):
+                if not line.strip():
+                    continue
+                try:
+                    declarations.append(Declaration(**json.loads(line)))
+                except (ValueError, ValidationError) as e:
+                    failed += 1
+                    self.stderr.write(f"line {lineno}: invalid declaration - {e}")
+
+            ok, errors = self.apply(declarations, no_metadata)
+            registered += ok
+            failed += errors
+            position += len(chunk)
+            if checkpoint:
+                save_checkpoint(checkpoint, position)
+            rate = registered / (time.perf_counter() - start)
+            self.stdout.write(
+                f"line {position}: {registered} registered, {failed} failed ({rate:.0f}/s)"
+            )
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {registered} declarations ({failed} failed) in {elapsed:.1f}s"
+            )
+        )
+
+    def apply(self, declarations, no_metadata):
+        """Register declarations per chain in did order. Returns (registered, failed) counts."""
+        ok = errors = 0
+        declarations = sorted(declarations, key=lambda d: (d.chain_id, d.did))
+        meta_dids = []
+        with transaction.atomic():
+            for _, group in itertools.groupby(declarations, key=lambda d: d.chain_id):
+                for result in register_batch(list(group)):
+                    if isinstance(result, IsccId):
+                        ok += 1
+                        if result.meta_url:
+                            meta_dids.append(result.did)
+                    else:
+                        errors += 1
+                        self.stderr.write(str(result))
+        if meta_dids and not no_metadata:
+            try:
+                fetch_metadata_batch(meta_dids)
+            except Exception as e:
+                self.stderr.write(f"enqueue metadata fetching failed: {e}")
+        return ok, errors
+
+
+def save_checkpoint(checkpoint: Path, lines: int):
+    """Atomically persist number of processed input lines."""
+    tmp = checkpoint.with_name(checkpoint.name + ".tmp")
+    tmp.write_text(json.dumps({"lines": lines}))
+    os.replace(tmp, checkpoint)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from iscc_registry.transactions import rebuild_live
+
+
+class Command(BaseCommand):
+    help = "Rebuild the live ISCC-ID projection from the declaration log"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=10000, help="ISCC-IDs per chunk")
+
+    def handle(self, *args, **options):
+        total = rebuild_live(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt live projection for {total} ISCC-IDs"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from iscc_registry.simhash import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recalculate the simhash similarity index for all declarations"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Declarations per chunk")
+
+    def handle(self, *args, **options):
+        total = rebuild(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt simhash index for {total} declarations"))
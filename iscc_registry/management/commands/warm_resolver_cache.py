@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from iscc_registry.cache import resolver_cache, warm
+from iscc_registry.models import IsccId
+
+
+class Command(BaseCommand):
+    help = "Populate the shared resolver cache (RESOLVER_CACHE_URL) with the most resolved ISCC-IDs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=10000, help="Number of ISCC-IDs")
+
+    def handle(self, *args, **options):
+        # The in-process tier of this command is discarded on exit and only the shared tier
+        # collects resolution statistics, so warming requires the Redis tier.
+        if resolver_cache.redis is None:
+            raise CommandError("No shared resolver cache configured (set RESOLVER_CACHE_URL)")
+        limit = options["limit"]
+        iscc_ids = resolver_cache.top(limit)
+        if not iscc_ids:
+            # Without resolution statistics fall back to the latest registrations
+            qs = IsccId.objects.filter(active=True, deleted=False, redacted=False)
+            iscc_ids = list(qs.order_by("-did").values_list("iscc_id", flat=True)[:limit])
+        count = warm(iscc_ids)
+        self.stdout.write(f"Cached resolution for {count} ISCC-IDs")
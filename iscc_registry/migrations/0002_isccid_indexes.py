@@ -0,0 +1,37 @@
+# Generated by Django 4.1 on 2026-10-18 15:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("iscc_registry", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="user",
+            name="name",
+            field=models.CharField(
+                blank=True, default=None, max_length=150, null=True, verbose_name="name"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="user",
+            name="url",
+            field=models.URLField(blank=True, default=None, null=True, verbose_name="url"),
+        ),
+        migrations.AddIndex(
+            model_name="isccid",
+            index=models.Index(fields=["iscc_id", "did"], name="isccid_iscc_id_did_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="isccid",
+            index=models.Index(fields=["chain", "did"], name="isccid_chain_did_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="isccid",
+            index=models.Index(fields=["block_hash", "did"], name="isccid_block_hash_did_idx"),
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 4.1 on 2026-10-18 16:09
+
+from hashlib import sha256
+import json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+CHUNK_SIZE = 1000
+
+
+def blob_key(meta_url, data):
+    if meta_url and meta_url.startswith("ipfs://"):
+        return meta_url.replace("ipfs://", "")
+    if meta_url:
+        return "sha256:" + sha256(meta_url.encode("utf-8")).hexdigest()
+    return "sha256:" + sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def move_metadata(apps, schema_editor):
+    """Move inline metadata into deduplicated blobs (newest declaration wins for mutable URLs)"""
+    IsccId = apps.get_model("iscc_registry", "IsccId")
+    MetadataBlob = apps.get_model("iscc_registry", "MetadataBlob")
+    qs = IsccId.objects.filter(metadata__isnull=False).only("did", "meta_url", "metadata")
+    objs = []
+    for obj in qs.order_by("-did").iterator(chunk_size=CHUNK_SIZE):
+        obj.meta_blob_id = blob_key(obj.meta_url, obj.metadata)
+        objs.append(obj)
+        if len(objs) == CHUNK_SIZE:
+            store(MetadataBlob, IsccId, objs)
+            objs = []
+    store(MetadataBlob, IsccId, objs)
+
+
+def store(MetadataBlob, IsccId, objs):
+    blobs = {}
+    for obj in objs:
+        blobs.setdefault(obj.meta_blob_id, obj.metadata)
+    blobs = [MetadataBlob(key=k, data=v) for k, v in blobs.items()]
+    MetadataBlob.objects.bulk_create(blobs, ignore_conflicts=True)
+    IsccId.objects.bulk_update(objs, fields=["meta_blob"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("iscc_registry", "0002_isccid_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MetadataBlob",
+            fields=[
+                (
+                    "key",
+                    models.CharField(
+                        help_text="IPFS CID (path) or `sha256:`-prefixed hash of the Meta-URL",
+                        max_length=255,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="key",
+                    ),
+                ),
+                ("data", models.JSONField(help_text="Imported ISCC Metadata", verbose_name="data")),
+                (
+                    "fetched",
+                    models.DateTimeField(
+                        auto_now=True,
+                        help_text="Time the metadata was last fetched",
+                        verbose_name="fetched",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "metadata blob",
+                "verbose_name_plural": "metadata blobs",
+            },
+        ),
+        migrations.AddField(
+            model_name="isccid",
+            name="meta_blob",
+            field=models.ForeignKey(
+                blank=True,
+                default=None,
+                help_text="Imported ISCC Metadata",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="declarations",
+                to="iscc_registry.metadatablob",
+                verbose_name="metadata blob",
+            ),
+        ),
+        migrations.RunPython(move_metadata, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="isccid",
+            name="metadata",
+        ),
+    ]
@@ -0,0 +1,114 @@
+from django.db import migrations, models
+
+
+CHUNK_SIZE = 1000
+
+
+def to_int(simhash):
+    value = int(simhash, 16)
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def convert_simhash(apps, schema_editor):
+    """Convert hex simhashes to signed 64-bit integers and split them into 16-bit blocks"""
+    IsccId = apps.get_model("iscc_registry", "IsccId")
+    names = ["simhash", "simhash_0", "simhash_1", "simhash_2", "simhash_3"]
+    qs = IsccId.objects.only("did", "simhash_hex").order_by("did")
+    last_did = -1
+    while True:
+        objs = list(qs.filter(did__gt=last_did)[:CHUNK_SIZE])
+        if not objs:
+            break
+        for obj in objs:
+            obj.simhash = to_int(obj.simhash_hex)
+            unsigned = obj.simhash & ((1 << 64) - 1)
+            for i in range(4):
+                setattr(obj, f"simhash_{i}", (unsigned >> (16 * (3 - i))) & 0xFFFF)
+        IsccId.objects.bulk_update(objs, fields=names)
+        last_did = objs[-1].did
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("iscc_registry", "0003_metadata_blob"),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name="isccid",
+            old_name="simhash",
+            new_name="simhash_hex",
+        ),
+        migrations.AddField(
+            model_name="isccid",
+            name="simhash",
+            field=models.BigIntegerField(
+                default=0,
+                help_text="Simhash of ISCC-ID (signed 64-bit integer)",
+                verbose_name="simhash",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="isccid",
+            name="simhash_0",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Bits 0-15 of simhash (similarity index)",
+                verbose_name="simhash block 0",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="isccid",
+            name="simhash_1",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Bits 16-31 of simhash (similarity index)",
+                verbose_name="simhash block 1",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="isccid",
+            name="simhash_2",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Bits 32-47 of simhash (similarity index)",
+                verbose_name="simhash block 2",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="isccid",
+            name="simhash_3",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Bits 48-63 of simhash (similarity index)",
+                verbose_name="simhash block 3",
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(convert_simhash, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="isccid",
+            name="simhash_hex",
+        ),
+        migrations.AddIndex(
+            model_name="isccid",
+            index=models.Index(fields=["simhash_0"], name="isccid_simhash_0_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="isccid",
+            index=models.Index(fields=["simhash_1"], name="isccid_simhash_1_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="isccid",
+            index=models.Index(fields=["simhash_2"], name="isccid_simhash_2_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="isccid",
+            index=models.Index(fields=["simhash_3"], name="isccid_simhash_3_idx"),
+        ),
+    ]
@@ -0,0 +1,97 @@
+from django.db import migrations, models
+import iscc_core as ic
+
+
+CHUNK_SIZE = 1000
+UNITS = {
+    ic.MT.META: "meta_unit",
+    ic.MT.SEMANTIC: "semantic_unit",
+    ic.MT.CONTENT: "content_unit",
+    ic.MT.DATA: "data_unit",
+    ic.MT.INSTANCE: "instance_unit",
+}
+
+
+def decompose_units(apps, schema_editor):
+    """Store ISCC-CODE units of existing declarations"""
+    IsccId = apps.get_model("iscc_registry", "IsccId")
+    qs = IsccId.objects.only("did", "iscc_code").order_by("did")
+    last_did = -1
+    while True:
+        objs = list(qs.filter(did__gt=last_did)[:CHUNK_SIZE])
+        if not objs:
+            break
+        for obj in objs:
+            for unit in ic.iscc_decompose(obj.iscc_code):
+                code = ic.Code(unit)
+                if code.maintype in UNITS:
+                    value = int.from_bytes(code.hash_bytes[:8], "big", signed=True)
+                    setattr(obj, UNITS[code.maintype], value)
+        IsccId.objects.bulk_update(objs, fields=list(UNITS.values()))
+        last_did = objs[-1].did
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("iscc_registry", "0004_simhash_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="isccid",
+            name="meta_unit",
+            field=models.BigIntegerField(
+                blank=True,
+                default=None,
+                help_text="First 64 bits of the Meta-Code unit of the ISCC-CODE (signed)",
+                null=True,
+                verbose_name="meta unit",
+            ),
+        ),
+        migrations.AddField(
+            model_name="isccid",
+            name="semantic_unit",
+            field=models.BigIntegerField(
+                blank=True,
+                default=None,
+                help_text="First 64 bits of the Semantic-Code unit of the ISCC-CODE (signed)",
+                null=True,
+                verbose_name="semantic unit",
+            ),
+        ),
+        migrations.AddField(
+            model_name="isccid",
+            name="content_unit",
+            field=models.BigIntegerField(
+                blank=True,
+                default=None,
+                help_text="First 64 bits of the Content-Code unit of the ISCC-CODE (signed)",
+                null=True,
+                verbose_name="content unit",
+            ),
+        ),
+        migrations.AddField(
+            model_name="isccid",
+            name="data_unit",
+            field=models.BigIntegerField(
+                blank=True,
+                default=None,
+                help_text="First 64 bits of the Data-Code unit of the ISCC-CODE (signed)",
+                null=True,
+                verbose_name="data unit",
+            ),
+        ),
+        migrations.AddField(
+            model_name="isccid",
+            name="instance_unit",
+            field=models.BigIntegerField(
+                blank=True,
+                default=None,
+                help_text="First 64 bits of the Instance-Code unit of the ISCC-CODE (signed)",
+                null=True,
+                verbose_name="instance unit",
+            ),
+        ),
+        migrations.RunPython(decompose_units, migrations.RunPython.noop),
+    ]
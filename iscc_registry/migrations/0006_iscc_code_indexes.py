@@ -0,0 +1,61 @@
+# Generated by Django 4.1 on 2026-10-18 16:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("iscc_registry", "0005_isccid_units"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="isccid",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["iscc_code", "did"],
+                name="isccid_iscc_code_did_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="isccid",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["meta_unit", "did"],
+                name="isccid_meta_unit_did_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="isccid",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["semantic_unit", "did"],
+                name="isccid_semantic_unit_did_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="isccid",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["content_unit", "did"],
+                name="isccid_content_unit_did_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="isccid",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["data_unit", "did"],
+                name="isccid_data_unit_did_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="isccid",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["instance_unit", "did"],
+                name="isccid_instance_unit_did_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.1 on 2026-10-18 16:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("iscc_registry", "0006_iscc_code_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="isccid",
+            index=models.Index(fields=["declarer", "did"], name="isccid_declarer_did_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="isccid",
+            index=models.Index(fields=["owner", "did"], name="isccid_owner_did_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="isccid",
+            index=models.Index(fields=["registrar", "did"], name="isccid_registrar_did_idx"),
+        ),
+    ]
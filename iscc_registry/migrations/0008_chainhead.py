@@ -0,0 +1,66 @@
+# Generated by Django 4.1 on 2026-10-18 16:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_heads(apps, schema_editor):
+    """Build head rings from the event log"""
+    IsccId = apps.get_model("iscc_registry", "IsccId")
+    ChainHead = apps.get_model("iscc_registry", "ChainHead")
+    chain_ids = IsccId.objects.values_list("chain_id", flat=True).distinct()
+    for chain_id in list(chain_ids):
+        objs = IsccId.objects.filter(chain_id=chain_id).order_by("-did")[: settings.HEAD_RING_SIZE]
+        headers = [
+            dict(
+                did=obj.did,
+                block_height=obj.block_height,
+                block_hash=obj.block_hash,
+                tx_idx=obj.tx_idx,
+                tx_hash=obj.tx_hash,
+                timestamp=obj.timestamp.isoformat(),
+            )
+            for obj in objs
+        ]
+        ChainHead.objects.create(chain_id=chain_id, headers=headers)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("iscc_registry", "0007_declaration_list_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChainHead",
+            fields=[
+                (
+                    "chain",
+                    models.OneToOneField(
+                        help_text="Observed chain",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="head",
+                        serialize=False,
+                        to="iscc_registry.chainmodel",
+                        verbose_name="chain",
+                    ),
+                ),
+                (
+                    "headers",
+                    models.JSONField(
+                        default=list,
+                        help_text="Block headers of the latest `HEAD_RING_SIZE` registration events (newest first)",
+                        verbose_name="headers",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "chain head",
+                "verbose_name_plural": "chain heads",
+            },
+        ),
+        migrations.RunPython(build_heads, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.1 on 2026-10-18 16:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+CHUNK_SIZE = 10000
+
+
+def build_live(apps, schema_editor):
+    """Build the live ISCC-ID projection from the declaration log"""
+    IsccId = apps.get_model("iscc_registry", "IsccId")
+    LiveIsccId = apps.get_model("iscc_registry", "LiveIsccId")
+    qs = IsccId.objects.filter(active=True, deleted=False, redacted=False).order_by("did")
+    last_did = -1
+    while True:
+        rows = list(qs.filter(did__gt=last_did).values_list("iscc_id", "did")[:CHUNK_SIZE])
+        if not rows:
+            break
+        LiveIsccId.objects.bulk_create([LiveIsccId(iscc_id=i, event_id=did) for i, did in rows])
+        last_did = rows[-1][1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("iscc_registry", "0008_chainhead"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LiveIsccId",
+            fields=[
+                (
+                    "iscc_id",
+                    models.CharField(
+                        help_text="ISCC-ID - digital asset identifier",
+                        max_length=32,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ISCC-ID",
+                    ),
+                ),
+                (
+                    "event",
+                    models.OneToOneField(
+                        db_constraint=False,
+                        help_text="Current declaration of the ISCC-ID",
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="live",
+                        to="iscc_registry.isccid",
+                        verbose_name="declaration",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "live ISCC-ID",
+                "verbose_name_plural": "live ISCC-IDs",
+            },
+        ),
+        migrations.RunPython(build_live, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 4.1 on 2026-10-18 16:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("iscc_registry", "0009_live_iscc_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chainmodel",
+            name="confirmations",
+            field=models.PositiveSmallIntegerField(
+                default=0,
+                help_text="Blocks a declaration is staged before registration (0 registers immediately)",
+                verbose_name="confirmations",
+            ),
+        ),
+        migrations.CreateModel(
+            name="StagedDeclaration",
+            fields=[
+                (
+                    "did",
+                    models.PositiveBigIntegerField(
+                        help_text="Cross-Chain time-ordered unique Declaration-ID",
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="did",
+                    ),
+                ),
+                (
+                    "block_height",
+                    models.PositiveBigIntegerField(
+                        help_text="N-th block on source ledger", verbose_name="block height"
+                    ),
+                ),
+                (
+                    "block_hash",
+                    models.CharField(
+                        help_text="Hash of block", max_length=255, verbose_name="block hash"
+                    ),
+                ),
+                (
+                    "iscc_id",
+                    models.CharField(
+                        help_text="Provisional ISCC-ID (forecast at staging time)",
+                        max_length=32,
+                        verbose_name="ISCC-ID",
+                    ),
+                ),
+                (
+                    "declaration",
+                    models.JSONField(
+                        help_text="Observed declaration data", verbose_name="declaration"
+                    ),
+                ),
+                (
+                    "chain",
+                    models.ForeignKey(
+                        help_text="Source chain of the declaration",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="staged",
+                        to="iscc_registry.chainmodel",
+                        verbose_name="chain",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "staged declaration",
+                "verbose_name_plural": "staged declarations",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="stageddeclaration",
+            index=models.Index(
+                fields=["chain", "block_height", "block_hash"], name="staged_chain_block_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stageddeclaration",
+            index=models.Index(fields=["iscc_id", "did"], name="staged_iscc_id_did_idx"),
+        ),
+    ]
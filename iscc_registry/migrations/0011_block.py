@@ -0,0 +1,112 @@
+# Generated by Django 4.1 on 2026-10-18 16:35
+
+from itertools import islice
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+CHUNK_SIZE = 10000
+
+
+def build_blocks(apps, schema_editor):
+    """Build the block ledger from the declaration log"""
+    IsccId = apps.get_model("iscc_registry", "IsccId")
+    Block = apps.get_model("iscc_registry", "Block")
+    qs = (
+        IsccId.objects.values("chain_id", "block_height", "block_hash")
+        .annotate(declarations=models.Count("did"), first_did=models.Min("did"))
+        .order_by("chain_id", "block_height", "block_hash")
+    )
+    objs = (Block(**row) for row in qs.iterator(chunk_size=CHUNK_SIZE))
+    while True:
+        chunk = list(islice(objs, CHUNK_SIZE))
+        if not chunk:
+            break
+        Block.objects.bulk_create(chunk)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("iscc_registry", "0010_staged_declaration"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Block",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                (
+                    "block_height",
+                    models.PositiveBigIntegerField(
+                        help_text="N-th block on source ledger", verbose_name="block height"
+                    ),
+                ),
+                (
+                    "block_hash",
+                    models.CharField(
+                        help_text="Hash of block", max_length=255, verbose_name="block hash"
+                    ),
+                ),
+                (
+                    "parent_hash",
+                    models.CharField(
+                        blank=True,
+                        help_text="Hash of the parent block (if reported by the observer)",
+                        max_length=255,
+                        null=True,
+                        verbose_name="parent hash",
+                    ),
+                ),
+                (
+                    "declarations",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Number of registered declarations in the block",
+                        verbose_name="declarations",
+                    ),
+                ),
+                (
+                    "first_did",
+                    models.PositiveBigIntegerField(
+                        help_text="Declaration-ID of the first registered declaration in the block",
+                        verbose_name="first did",
+                    ),
+                ),
+                (
+                    "chain",
+                    models.ForeignKey(
+                        help_text="Source chain of the block",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="blocks",
+                        to="iscc_registry.chainmodel",
+                        verbose_name="chain",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "block",
+                "verbose_name_plural": "blocks",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="block",
+            index=models.Index(fields=["chain", "block_height"], name="block_chain_height_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="block",
+            index=models.Index(fields=["block_hash"], name="block_hash_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="block",
+            constraint=models.UniqueConstraint(
+                fields=("chain", "block_hash"), name="block_chain_hash_uniq"
+            ),
+        ),
+        migrations.RunPython(build_blocks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.1 on 2026-10-18 16:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("iscc_registry", "0011_block"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="isccid",
+            name="simhash_0",
+            field=models.PositiveIntegerField(
+                help_text="Bits 48-63 of simhash (similarity index, most significant)",
+                verbose_name="simhash block 0",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="isccid",
+            name="simhash_1",
+            field=models.PositiveIntegerField(
+                help_text="Bits 32-47 of simhash (similarity index)", verbose_name="simhash block 1"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="isccid",
+            name="simhash_2",
+            field=models.PositiveIntegerField(
+                help_text="Bits 16-31 of simhash (similarity index)", verbose_name="simhash block 2"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="isccid",
+            name="simhash_3",
+            field=models.PositiveIntegerField(
+                help_text="Bits 0-15 of simhash (similarity index, least significant)",
+                verbose_name="simhash block 3",
+            ),
+        ),
+    ]
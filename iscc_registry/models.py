@@ -1,14 +1,15 @@
 import json
-from typing import Optional
+from datetime import datetime
+from typing import Dict, Optional
 
 from django.contrib.admin import display
 from django.contrib.auth.models import AbstractUser, Group
-from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 from django.conf import settings
+from iscc_registry.cache import LRU
 from iscc_registry.utils import linkify, render_markdown
 import iscc_schema as ics
 
@@ -34,15 +35,59 @@ class User(AbstractUser):
     @classmethod
     def get_or_create(cls, wallet: str, group: str):
         """Get or reate user and add to group"""
-        if group not in ("registrar", "declarer"):
-            raise ValueError(f"invalid group {group}")
-        try:
-            user = cls.objects.get(username=wallet)
-        except cls.DoesNotExist:
-            user = cls.objects.create_user(username=wallet)
-            group, group_created = Group.objects.get_or_create(name=group)
-            user.groups.add(group)
-        return user
+        return cls.objects.get(pk=cls.resolve({wallet: group})[wallet])
+
+    @classmethod
+    def resolve(cls, wallets: Dict[str, str]) -> Dict[str, int]:
+        """
+        Resolve wallets to user ids and create missing users (`wallets` maps wallet to group).
+
+        Known wallets are served from the in-process `user_cache` (populated after commit). The
+        remaining wallets are selected with one query. Missing users are inserted in bulk with
+        `ignore_conflicts` so concurrent observers may race on the same wallet, then selected
+        and added to their group.
+        """
+        for group in set(wallets.values()):
+            if group not in ("registrar", "declarer"):
+                raise ValueError(f"invalid group {group}")
+        result = {}
+        for wallet in wallets:
+            pk = user_cache.get(wallet)
+            if pk is not None:
+                result[wallet] = pk
+        missing = [wallet for wallet in wallets if wallet not in result]
+        if not missing:
+            return result
+
+        found = dict(cls.objects.filter(username__in=missing).values_list("username", "pk"))
+        new = [wallet for wallet in missing if wallet not in found]
+        if new:
+            users = [cls(username=wallet) for wallet in new]
+            for user in users:
+                user.set_unusable_password()
+            cls.objects.bulk_create(users, ignore_conflicts=True)
+            created = dict(cls.objects.filter(username__in=new).values_list("username", "pk"))
+            names = {wallets[wallet] for wallet in new}
+            Group.objects.bulk_create([Group(name=name) for name in names], ignore_conflicts=True)
+            groups = dict(Group.objects.filter(name__in=names).values_list("name", "pk"))
+            Membership = cls.groups.through
+            Membership.objects.bulk_create(
+                [Membership(user_id=created[w], group_id=groups[wallets[w]]) for w in new],
+                ignore_conflicts=True,
+            )
+            found.update(created)
+
+        def populate():
+            for wallet, pk in found.items():
+                user_cache.set(wallet, pk)
+
+        transaction.on_commit(populate)
+        result.update(found)
+        return result
+
+
+#: In-process wallet to user id cache
+user_cache = LRU(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL)
 
 
 class ChainModel(models.Model):
@@ -84,6 +129,12 @@ class ChainModel(models.Model):
         help_text="Template for testnet explorer transaction url",
     )
 
+    confirmations = models.PositiveSmallIntegerField(
+        verbose_name="confirmations",
+        default=0,
+        help_text="Blocks a declaration is staged before registration (0 registers immediately)",
+    )
+
     def __str__(self):
         return self.name
 
@@ -91,6 +142,190 @@ class ChainModel(models.Model):
         return f"Chain(id={self.id}, name={self.name})"
 
 
+class ChainHead(models.Model):
+    """Ring of the latest registration events of a chain (maintained by register and rollback)"""
+
+    class Meta:
+        verbose_name = "chain head"
+        verbose_name_plural = "chain heads"
+
+    chain = models.OneToOneField(
+        "ChainModel",
+        verbose_name="chain",
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="head",
+        help_text="Observed chain",
+    )
+
+    headers = models.JSONField(
+        verbose_name="headers",
+        default=list,
+        help_text="Block headers of the latest `HEAD_RING_SIZE` registration events (newest first)",
+    )
+
+    @staticmethod
+    def header(obj: "IsccId") -> dict:
+        """Ring entry for a registration event"""
+        return dict(
+            did=obj.did,
+            block_height=obj.block_height,
+            block_hash=obj.block_hash,
+            tx_idx=obj.tx_idx,
+            tx_hash=obj.tx_hash,
+            timestamp=obj.timestamp.isoformat(),
+        )
+
+    def event(self, offset: int = 0) -> Optional["IsccId"]:
+        """Registration event at `offset` from the head (None if not in the ring)"""
+        if not 0 <= offset < len(self.headers):
+            return None
+        entry = dict(self.headers[offset])
+        entry["timestamp"] = datetime.fromisoformat(entry["timestamp"])
+        return IsccId(chain_id=self.chain_id, **entry)
+
+    def __str__(self):
+        return f"Head(chain={self.chain_id})"
+
+
+class StagedDeclaration(models.Model):
+    """Observed declaration waiting for the confirmation depth of its chain before registration"""
+
+    class Meta:
+        verbose_name = "staged declaration"
+        verbose_name_plural = "staged declarations"
+        indexes = [
+            models.Index(
+                name="staged_chain_block_idx", fields=["chain", "block_height", "block_hash"]
+            ),
+            models.Index(name="staged_iscc_id_did_idx", fields=["iscc_id", "did"]),
+        ]
+
+    did = models.PositiveBigIntegerField(
+        verbose_name="did",
+        primary_key=True,
+        help_text="Cross-Chain time-ordered unique Declaration-ID",
+    )
+
+    chain = models.ForeignKey(
+        "ChainModel",
+        verbose_name="chain",
+        on_delete=models.CASCADE,
+        related_name="staged",
+        help_text="Source chain of the declaration",
+    )
+
+    block_height = models.PositiveBigIntegerField(
+        verbose_name="block height",
+        help_text="N-th block on source ledger",
+    )
+
+    block_hash = models.CharField(
+        verbose_name="block hash",
+        max_length=255,
+        help_text="Hash of block",
+    )
+
+    iscc_id = models.CharField(
+        verbose_name="ISCC-ID",
+        max_length=32,
+        help_text="Provisional ISCC-ID (forecast at staging time)",
+    )
+
+    declaration = models.JSONField(
+        verbose_name="declaration",
+        help_text="Observed declaration data",
+    )
+
+    def __str__(self):
+        return f"Staged({self.did})"
+
+
+class Block(models.Model):
+    """Source chain block with registered declarations (written during registration)"""
+
+    class Meta:
+        verbose_name = "block"
+        verbose_name_plural = "blocks"
+        constraints = [
+            models.UniqueConstraint(name="block_chain_hash_uniq", fields=["chain", "block_hash"]),
+        ]
+        indexes = [
+            models.Index(name="block_chain_height_idx", fields=["chain", "block_height"]),
+            models.Index(name="block_hash_idx", fields=["block_hash"]),
+        ]
+
+    chain = models.ForeignKey(
+        "ChainModel",
+        verbose_name="chain",
+        on_delete=models.CASCADE,
+        related_name="blocks",
+        help_text="Source chain of the block",
+    )
+
+    block_height = models.PositiveBigIntegerField(
+        verbose_name="block height",
+        help_text="N-th block on source ledger",
+    )
+
+    block_hash = models.CharField(
+        verbose_name="block hash",
+        max_length=255,
+        help_text="Hash of block",
+    )
+
+    parent_hash = models.CharField(
+        verbose_name="parent hash",
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text="Hash of the parent block (if reported by the observer)",
+    )
+
+    declarations = models.PositiveIntegerField(
+        verbose_name="declarations",
+        default=0,
+        help_text="Number of registered declarations in the block",
+    )
+
+    first_did = models.PositiveBigIntegerField(
+        verbose_name="first did",
+        help_text="Declaration-ID of the first registered declaration in the block",
+    )
+
+    def __str__(self):
+        return f"Block({self.chain_id}:{self.block_height})"
+
+
+class MetadataBlob(models.Model):
+    """Content-addressed ISCC Metadata shared by all declarations with the same Meta-URL"""
+
+    class Meta:
+        verbose_name = "metadata blob"
+        verbose_name_plural = "metadata blobs"
+
+    key = models.CharField(
+        verbose_name="key",
+        primary_key=True,
+        max_length=255,
+        help_text="IPFS CID (path) or `sha256:`-prefixed hash of the Meta-URL",
+    )
+
+    data = models.JSONField(
+        verbose_name="data",
+        help_text="Imported ISCC Metadata",
+    )
+
+    fetched = models.DateTimeField(
+        verbose_name="fetched",
+        auto_now=True,
+        help_text="Time the metadata was last fetched",
+    )
+
+    def __str__(self):
+        return self.key
+
+
 class IsccId(models.Model):
     """An ISCC-ID minted from a declaration."""
 
@@ -105,6 +340,48 @@ class IsccId(models.Model):
                 condition=Q(active=True),
             )
         ]
+        indexes = [
+            models.Index(name="isccid_iscc_id_did_idx", fields=["iscc_id", "did"]),
+            models.Index(name="isccid_chain_did_idx", fields=["chain", "did"]),
+            models.Index(name="isccid_block_hash_did_idx", fields=["block_hash", "did"]),
+            models.Index(name="isccid_declarer_did_idx", fields=["declarer", "did"]),
+            models.Index(name="isccid_owner_did_idx", fields=["owner", "did"]),
+            models.Index(name="isccid_registrar_did_idx", fields=["registrar", "did"]),
+            models.Index(name="isccid_simhash_0_idx", fields=["simhash_0"]),
+            models.Index(name="isccid_simhash_1_idx", fields=["simhash_1"]),
+            models.Index(name="isccid_simhash_2_idx", fields=["simhash_2"]),
+            models.Index(name="isccid_simhash_3_idx", fields=["simhash_3"]),
+            models.Index(
+                name="isccid_iscc_code_did_idx",
+                fields=["iscc_code", "did"],
+                condition=Q(active=True),
+            ),
+            models.Index(
+                name="isccid_meta_unit_did_idx",
+                fields=["meta_unit", "did"],
+                condition=Q(active=True),
+            ),
+            models.Index(
+                name="isccid_semantic_unit_did_idx",
+                fields=["semantic_unit", "did"],
+                condition=Q(active=True),
+            ),
+            models.Index(
+                name="isccid_content_unit_did_idx",
+                fields=["content_unit", "did"],
+                condition=Q(active=True),
+            ),
+            models.Index(
+                name="isccid_data_unit_did_idx",
+                fields=["data_unit", "did"],
+                condition=Q(active=True),
+            ),
+            models.Index(
+                name="isccid_instance_unit_did_idx",
+                fields=["instance_unit", "did"],
+                condition=Q(active=True),
+            ),
+        ]
 
     did = models.PositiveBigIntegerField(
         verbose_name="did",
@@ -214,18 +491,79 @@ class IsccId(models.Model):
         help_text="Contract address of registrar",
     )
 
-    simhash = models.CharField(
-        verbose_name="simhash", max_length=32, help_text="Simhash of ISCC-ID"
+    simhash = models.BigIntegerField(
+        verbose_name="simhash", help_text="Simhash of ISCC-ID (signed 64-bit integer)"
     )
 
-    metadata = models.JSONField(
-        verbose_name="metadata",
+    simhash_0 = models.PositiveIntegerField(
+        verbose_name="simhash block 0",
+        help_text="Bits 48-63 of simhash (similarity index, most significant)",
+    )
+
+    simhash_1 = models.PositiveIntegerField(
+        verbose_name="simhash block 1", help_text="Bits 32-47 of simhash (similarity index)"
+    )
+
+    simhash_2 = models.PositiveIntegerField(
+        verbose_name="simhash block 2", help_text="Bits 16-31 of simhash (similarity index)"
+    )
+
+    simhash_3 = models.PositiveIntegerField(
+        verbose_name="simhash block 3",
+        help_text="Bits 0-15 of simhash (similarity index, least significant)",
+    )
+
+    meta_blob = models.ForeignKey(
+        "MetadataBlob",
+        verbose_name="metadata blob",
         null=True,
         blank=True,
         default=None,
+        on_delete=models.SET_NULL,
+        related_name="declarations",
         help_text="Imported ISCC Metadata",
     )
 
+    meta_unit = models.BigIntegerField(
+        verbose_name="meta unit",
+        null=True,
+        blank=True,
+        default=None,
+        help_text="First 64 bits of the Meta-Code unit of the ISCC-CODE (signed)",
+    )
+
+    semantic_unit = models.BigIntegerField(
+        verbose_name="semantic unit",
+        null=True,
+        blank=True,
+        default=None,
+        help_text="First 64 bits of the Semantic-Code unit of the ISCC-CODE (signed)",
+    )
+
+    content_unit = models.BigIntegerField(
+        verbose_name="content unit",
+        null=True,
+        blank=True,
+        default=None,
+        help_text="First 64 bits of the Content-Code unit of the ISCC-CODE (signed)",
+    )
+
+    data_unit = models.BigIntegerField(
+        verbose_name="data unit",
+        null=True,
+        blank=True,
+        default=None,
+        help_text="First 64 bits of the Data-Code unit of the ISCC-CODE (signed)",
+    )
+
+    instance_unit = models.BigIntegerField(
+        verbose_name="instance unit",
+        null=True,
+        blank=True,
+        default=None,
+        help_text="First 64 bits of the Instance-Code unit of the ISCC-CODE (signed)",
+    )
+
     frozen = models.BooleanField(
         verbose_name="frozen",
         default=False,
@@ -252,14 +590,23 @@ class IsccId(models.Model):
 
     @staticmethod
     def get_safe(iscc_id: str):
-        """Ensure only the active and non-deleted ISCC-ID is returned"""
-        return IsccId.objects.get(iscc_id=iscc_id, active=True, deleted=False, redacted=False)
+        """Ensure only the active and non-deleted ISCC-ID is returned (via the live projection)"""
+        return IsccId.objects.get(live__iscc_id=iscc_id)
+
+    @staticmethod
+    async def aget_safe(iscc_id: str):
+        """Async `get_safe` with related objects loaded for serialization"""
+        qs = IsccId.objects.select_related("declarer", "registrar", "chain", "meta_blob")
+        return await qs.aget(live__iscc_id=iscc_id)
+
+    @property
+    def metadata(self) -> Optional[dict]:
+        """Imported ISCC Metadata (shared via the content-addressed metadata blob)"""
+        return self.meta_blob.data if self.meta_blob_id else None
 
     def get_admin_url(self):
-        content_type = ContentType.objects.get_for_model(self.__class__)
-        return reverse(
-            "admin:%s_%s_change" % (content_type.app_label, content_type.model), args=(self.did,)
-        )
+        opts = self._meta.concrete_model._meta
+        return reverse("admin:%s_%s_change" % (opts.app_label, opts.model_name), args=(self.did,))
 
     def get_registry_url(self):
         return self.get_admin_url().replace("dashboard", "registry")
@@ -296,7 +643,7 @@ class IsccId(models.Model):
 
     @display(description="license")
     def display_license(self):
-        if self.metadata.get("license"):
+        if self.metadata and self.metadata.get("license"):
             return linkify(self.metadata.get("license"))
 
     @display(description="Ledger URL")
@@ -346,6 +693,37 @@ class IsccId(models.Model):
         return f"IsccId({self.did})"
 
 
+class LiveIsccId(models.Model):
+    """
+    Current state of the registry: one row per live (active, non-deleted, non-redacted) ISCC-ID.
+
+    Maintained by register, rollback and redaction and rebuildable from the declaration log.
+    """
+
+    class Meta:
+        verbose_name = "live ISCC-ID"
+        verbose_name_plural = "live ISCC-IDs"
+
+    iscc_id = models.CharField(
+        verbose_name="ISCC-ID",
+        primary_key=True,
+        max_length=32,
+        help_text="ISCC-ID - digital asset identifier",
+    )
+
+    event = models.OneToOneField(
+        IsccId,
+        verbose_name="declaration",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="live",
+        help_text="Current declaration of the ISCC-ID",
+    )
+
+    def __str__(self):
+        return f"ISCC:{self.iscc_id}"
+
+
 class Redact(IsccId):
     class Meta:
         proxy = True
@@ -82,9 +82,9 @@ class IsccIdAdmin(PublicModelAdmin):
         return f"ISCC:{obj.iscc_code}"
 
     def get_queryset(self, request):
-        """Only list active and non-deleted ISCC-IDs"""
+        """Only list live ISCC-IDs (via the live projection)"""
         qs = super().get_queryset(request)
-        return qs.filter(active=True, deleted=False, redacted=False)
+        return qs.filter(live__isnull=False)
 
 
 class ChainAdmin(PublicModelAdmin):
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Dict, List, Optional
 from ninja import Schema, ModelSchema
 from pydantic import Field, root_validator, validator
 import iscc_core as ic
@@ -23,6 +23,7 @@ class Declaration(Schema):
     chain_id: int = Field(..., description="ID of source chain")
     block_height: int = Field(..., description="Block height")
     block_hash: str = Field(..., description="Block hash")
+    parent_hash: Optional[str] = Field(None, description="Hash of the parent block")
     tx_idx: int = Field(..., description="Index of TX within block")
     tx_hash: str = Field(..., description="Hash of transaction")
     declarer: str = Field(..., description="Wallet-Address of original declaring party")
@@ -118,6 +119,26 @@ class DeclarationResponse(ModelSchema):
         return obj.chain.name if obj.chain else ""
 
 
+class DeclarationPage(Schema):
+
+    items: List[DeclarationResponse] = Field(..., description="Declarations in did order")
+    next: Optional[str] = Field(None, description="Cursor for the next page (if any)")
+
+
+class Lookup(Schema):
+
+    iscc_ids: List[str] = Field(
+        ..., description="ISCC-IDs to look up", example=["ISCC:MMAOHZYGQLBASTFM"]
+    )
+
+
+class LookupResponse(Schema):
+
+    found: List[DeclarationResponse] = Field(..., description="Declarations of live ISCC-IDs")
+    missing: List[str] = Field(..., description="Valid ISCC-IDs without live declaration")
+    invalid: List[str] = Field(..., description="Malformed ISCC-IDs")
+
+
 class RegistrationResponse(Schema):
 
     did: int = Field(
@@ -135,6 +156,114 @@ class RegistrationResponse(Schema):
         regex="^ISCC:[A-Z2-7]{10,73}$",
     )
 
+    provisional: Optional[bool] = Field(
+        None, description="ISCC-ID is a forecast until the declaration has enough confirmations"
+    )
+
+
+class ForkPoint(Schema):
+
+    message: str = Field(..., description="Reason for the rejected registration")
+    chain_id: int = Field(..., description="ID of source chain", example=2)
+    block_height: int = Field(
+        ..., description="Height of the registered block that conflicts with the declaration"
+    )
+    block_hash: str = Field(
+        ..., description="Hash of the registered block to rollback from (`/rollback/{block_hash}`)"
+    )
+
+
+class RegistrationResult(Schema):
+
+    did: int = Field(
+        ...,
+        description="Cross-Chain time-ordered unique Declaration-ID",
+        example=330445058337719994,
+    )
+
+    iscc_id: Optional[str] = Field(
+        None,
+        description="Globally unique ISCC-ID (if registered)",
+        example="ISCC:MMAOHZYGQLBASTFM",
+    )
+
+    provisional: Optional[bool] = Field(
+        None, description="ISCC-ID is a forecast until the declaration has enough confirmations"
+    )
+
+    error: Optional[str] = Field(None, description="Reason for failed registration")
+    fork: Optional[ForkPoint] = Field(None, description="Fork point if the block was rejected")
+
+
+class Ticket(Schema):
+
+    ticket: str = Field(
+        ..., description="Ingest ticket for status polling", example="2-1697040000000-0"
+    )
+    status: str = Field(
+        ...,
+        description="Ingest status (`queued`, `staged`, `registered` or `failed`)",
+        example="queued",
+    )
+    did: Optional[int] = Field(
+        None,
+        description="Cross-Chain time-ordered unique Declaration-ID (once applied)",
+        example=330445058337719994,
+    )
+    iscc_id: Optional[str] = Field(
+        None,
+        description="Globally unique ISCC-ID (if registered)",
+        example="ISCC:MMAOHZYGQLBASTFM",
+    )
+    error: Optional[str] = Field(None, description="Reason for failed registration")
+    fork: Optional[ForkPoint] = Field(None, description="Fork point if the block was rejected")
+
+
+class IngestQueue(Schema):
+
+    chain_id: int = Field(..., description="ID of source chain", example=2)
+    depth: int = Field(..., description="Number of queued declarations", example=12)
+
+
+class IngestStatus(Schema):
+
+    queues: List[IngestQueue] = Field(..., description="Ingest queue per chain")
+    max_depth: int = Field(..., description="Queue depth at which registrations are rejected")
+    backpressure: bool = Field(..., description="Whether any queue is full")
+
+
+class Similar(Schema):
+
+    iscc_id: str = Field(..., description="ISCC-ID", example="ISCC:MMAOHZYGQLBASTFM")
+    iscc_code: str = Field(
+        ...,
+        description="ISCC-CODE",
+        example="ISCC:KACYPXW445FTYNJ3CYSXHAFJMA2HUWULUNRFE3BLHRSCXYH2M5AEGQY",
+    )
+    distance: int = Field(..., description="Hamming distance to the query", example=3)
+
+
+class CodeMatch(Schema):
+
+    did: int = Field(
+        ...,
+        description="Cross-Chain time-ordered unique Declaration-ID",
+        example=330445058337719994,
+    )
+    iscc_id: str = Field(..., description="ISCC-ID", example="ISCC:MMAOHZYGQLBASTFM")
+    iscc_code: str = Field(
+        ...,
+        description="ISCC-CODE",
+        example="ISCC:KACYPXW445FTYNJ3CYSXHAFJMA2HUWULUNRFE3BLHRSCXYH2M5AEGQY",
+    )
+
+
+class CodeMatches(Schema):
+
+    count: Optional[int] = Field(None, description="Number of matching ISCC-IDs (count mode)")
+    items: Optional[List[CodeMatch]] = Field(None, description="Matching ISCC-IDs in did order")
+    next: Optional[str] = Field(None, description="Cursor for the next page (if any)")
+
 
 class Forecast(Schema):
 
@@ -183,6 +312,15 @@ class Head(ModelSchema):
         model_fields = ["chain", "block_height", "block_hash", "tx_idx", "tx_hash", "timestamp"]
 
 
+class Rollback(Head):
+
+    heads: List[Head] = Field([], description="New heads of all chains affected by the rollback")
+    deleted: int = Field(0, description="Number of removed declaration events")
+    reactivated: int = Field(0, description="Number of reactivated ISCC-ID revisions")
+    discarded: int = Field(0, description="Number of discarded staged declarations")
+    timings: Dict[str, float] = Field({}, description="Duration of rollback phases in seconds")
+
+
 class Message(Schema):
     message: str
 
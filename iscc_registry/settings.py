@@ -20,6 +20,29 @@ env = environ.Env(
     IPFS_RETRY_DELAY=(int, 60),
     READ_TIMEOUT=(int, 30),
     SITE_EMAIL=(str, "example@example.com"),
+    RESOLVER_CACHE_SIZE=(int, 100000),
+    RESOLVER_CACHE_TTL=(int, 60),
+    RESOLVER_CACHE_URL=(str, ""),
+    RESOLVER_CACHE_REDIS_TTL=(int, 86400),
+    HTTP_CACHE_CONTROL=(str, "public, max-age=60"),
+    HTTP_PURGE_URL=(str, ""),
+    FETCH_WORKERS=(int, 32),
+    FETCH_PER_HOST=(int, 8),
+    UNIT_INDEX_PATH=(str, ""),
+    UNIT_INDEX_REFRESH=(int, 3600),
+    LOOKUP_MAX_IDS=(int, 1000),
+    HEAD_RING_SIZE=(int, 16),
+    USER_CACHE_SIZE=(int, 10000),
+    USER_CACHE_TTL=(int, 3600),
+    FORECAST_MAX_ITEMS=(int, 1000),
+    INGEST_QUEUE=(str, ""),
+    INGEST_BATCH_SIZE=(int, 500),
+    INGEST_MAX_DEPTH=(int, 10000),
+    INGEST_RETRY_AFTER=(int, 5),
+    INGEST_RESULT_TTL=(int, 86400),
+    EXPORT_ROOT=(str, ""),
+    EXPORT_MAX_AGE=(int, 3600),
+    EXPORT_RETRY_AFTER=(int, 10),
 )
 
 SENTRY_DSN = env("SENTRY_DSN")
@@ -148,3 +171,26 @@ CORS_ALLOW_ALL_ORIGINS = env("CORS_ALLOW_ALL_ORIGINS")
 TESTNET = env("TESTNET")
 READ_TIMEOUT = env("READ_TIMEOUT")
 SITE_EMAIL = env("SITE_EMAIL")
+RESOLVER_CACHE_SIZE = env("RESOLVER_CACHE_SIZE")
+RESOLVER_CACHE_TTL = env("RESOLVER_CACHE_TTL")
+RESOLVER_CACHE_URL = env("RESOLVER_CACHE_URL")
+RESOLVER_CACHE_REDIS_TTL = env("RESOLVER_CACHE_REDIS_TTL")
+HTTP_CACHE_CONTROL = env("HTTP_CACHE_CONTROL")
+HTTP_PURGE_URL = env("HTTP_PURGE_URL")
+FETCH_WORKERS = env("FETCH_WORKERS")
+FETCH_PER_HOST = env("FETCH_PER_HOST")
+UNIT_INDEX_PATH = env("UNIT_INDEX_PATH")
+UNIT_INDEX_REFRESH = env("UNIT_INDEX_REFRESH")
+LOOKUP_MAX_IDS = env("LOOKUP_MAX_IDS")
+HEAD_RING_SIZE = env("HEAD_RING_SIZE")
+USER_CACHE_SIZE = env("USER_CACHE_SIZE")
+USER_CACHE_TTL = env("USER_CACHE_TTL")
+FORECAST_MAX_ITEMS = env("FORECAST_MAX_ITEMS")
+INGEST_QUEUE = env("INGEST_QUEUE")
+INGEST_BATCH_SIZE = env("INGEST_BATCH_SIZE")
+INGEST_MAX_DEPTH = env("INGEST_MAX_DEPTH")
+INGEST_RETRY_AFTER = env("INGEST_RETRY_AFTER")
+INGEST_RESULT_TTL = env("INGEST_RESULT_TTL")
+EXPORT_ROOT = env("EXPORT_ROOT") or str(BASE_DIR / "exports")
+EXPORT_MAX_AGE = env("EXPORT_MAX_AGE")
+EXPORT_RETRY_AFTER = env("EXPORT_RETRY_AFTER")
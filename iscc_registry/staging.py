@@ -0,0 +1,157 @@
+"""
+Confirmation-depth staging of observed declarations.
+
+Chains with `ChainModel.confirmations > 0` do not register declarations immediately. They are
+kept in the `StagedDeclaration` table (with a forecasted provisional ISCC-ID) and promoted in bulk
+through `register_batch` once the observed chain tip is at least `confirmations` blocks above
+their block. A reorg within the confirmation window only discards staged rows instead of rolling
+back registered events.
+"""
+import json
+from typing import List, Optional, Tuple, Union
+from django.db import transaction
+from loguru import logger as log
+from iscc_registry.exceptions import RegistrationError
+from iscc_registry.models import Block, ChainModel, IsccId, StagedDeclaration
+from iscc_registry.schema import Declaration
+from iscc_registry.transactions import chain_lock, mint_many, register_batch
+
+
+def confirmations(chain_id: int) -> int:
+    """Confirmation depth of a chain (0 if declarations are registered immediately)"""
+    qs = ChainModel.objects.filter(chain=chain_id).values_list("confirmations", flat=True)
+    return qs.first() or 0
+
+
+def submit(
+    declarations: List[Declaration],
+) -> List[Union[IsccId, StagedDeclaration, RegistrationError]]:
+    """
+    Register declarations of a single chain or stage them until they are confirmed.
+
+    Returns the new `IsccId`, the `StagedDeclaration` or the `RegistrationError` for each
+    declaration (in input order). Staging also promotes all staged declarations of the chain
+    that are confirmed by the new chain tip.
+    """
+    if not declarations:
+        return []
+    chain_ids = {d.chain_id for d in declarations}
+    if len(chain_ids) != 1:
+        raise RegistrationError("Batch registration requires declarations from a single chain")
+    chain_id = chain_ids.pop()
+    depth = confirmations(chain_id)
+    if not depth:
+        return register_batch(declarations)
+    with chain_lock([chain_id]):
+        results = stage(declarations)
+        promote(chain_id, max(d.block_height for d in declarations), depth)
+    return results
+
+
+def stage(declarations: List[Declaration]) -> List[Union[StagedDeclaration, RegistrationError]]:
+    """Add declarations to the staging table with their provisional ISCC-ID."""
+    dids = [d.did for d in declarations]
+    staged = set(StagedDeclaration.objects.filter(did__in=dids).values_list("did", flat=True))
+    registered = set(IsccId.objects.filter(did__in=dids).values_list("did", flat=True))
+    known = staged | registered
+    fresh = [d for d in declarations if d.did not in known]
+    iscc_ids = mint_many([(d.iscc_code, d.chain_id, d.declarer) for d in fresh])
+    provisional = {d.did: iscc_id for d, iscc_id in zip(fresh, iscc_ids)}
+    results, objs = [], []
+    for d in declarations:
+        if d.did in registered:
+            results.append(RegistrationError(f"Declaration {d.did} already registered"))
+            continue
+        if d.did in known:
+            results.append(RegistrationError(f"Declaration {d.did} already staged"))
+            continue
+        known.add(d.did)
+        obj = StagedDeclaration(
+            did=d.did,
+            chain_id=d.chain_id,
+            block_height=d.block_height,
+            block_hash=d.block_hash,
+            iscc_id=provisional[d.did],
+            declaration=json.loads(d.json()),
+        )
+        objs.append(obj)
+        results.append(obj)
+    StagedDeclaration.objects.bulk_create(objs)
+    return results
+
+
+def promote(
+    chain_id: int, tip: int, depth: Optional[int] = None
+) -> List[Tuple[Declaration, Union[IsccId, RegistrationError]]]:
+    """
+    Register all staged declarations of a chain that are `depth` blocks below `tip`.
+
+    Returns each promoted declaration (in did order) with its new `IsccId` or the
+    `RegistrationError` that rejected it. Rejected declarations are removed from staging as well
+    (a `ForkError` carries the fork point to rollback from). The outcome is also reported to the
+    ingest tickets of the declarations.
+    """
+    depth = confirmations(chain_id) if depth is None else depth
+    with chain_lock([chain_id]):
+        qs = StagedDeclaration.objects.filter(chain_id=chain_id, block_height__lte=tip - depth)
+        staged = list(qs.order_by("did"))
+        if not staged:
+            return []
+        declarations = [Declaration.parse_obj(obj.declaration) for obj in staged]
+        promoted = list(zip(declarations, register_batch(declarations)))
+        StagedDeclaration.objects.filter(did__in=[obj.did for obj in staged]).delete()
+    for d, result in promoted:
+        if isinstance(result, RegistrationError):
+            log.warning(f"staged declaration {d.did} not registered: {result}")
+    dids = [r.did for _, r in promoted if isinstance(r, IsccId) and r.meta_url]
+    if dids:
+        from iscc_registry.tasks import fetch_metadata_batch
+
+        transaction.on_commit(lambda: fetch_metadata_batch(dids))
+    from iscc_registry import ingest
+
+    transaction.on_commit(lambda: ingest.settle(promoted))
+    log.info(f"promoted {len(staged)} staged declarations of chain {chain_id} at tip {tip}")
+    return promoted
+
+
+@transaction.atomic
+def discard(block_hash: str) -> int:
+    """Discard staged declarations of the chain from the block `block_hash` onwards."""
+    start = StagedDeclaration.objects.filter(block_hash=block_hash).order_by("did").first()
+    if start is None:
+        start = Block.objects.filter(block_hash=block_hash).only("chain_id", "block_height").first()
+    if start is None:
+        return 0
+    qs = StagedDeclaration.objects.filter(
+        chain_id=start.chain_id, block_height__gte=start.block_height
+    )
+    discarded, _ = qs.delete()
+    log.info(f"discarded {discarded} staged declarations from block {block_hash}")
+    return discarded
+
+
+def provisional(iscc_id: str) -> Optional[dict]:
+    """Declaration data of the latest staged declaration with a provisional ISCC-ID"""
+    qs = StagedDeclaration.objects.filter(iscc_id=iscc_id).select_related("chain")
+    obj = qs.order_by("-did").first()
+    if obj is None:
+        return None
+    d = Declaration.parse_obj(obj.declaration)
+    if d.delete:
+        return None
+    return dict(
+        did=obj.did,
+        iscc_id=obj.iscc_id,
+        iscc_code=d.iscc_code,
+        declarer=d.declarer,
+        meta_url=d.meta_url,
+        message=d.message,
+        chain=obj.chain.name,
+        block_height=d.block_height,
+        block_hash=d.block_hash,
+        tx_idx=d.tx_idx,
+        tx_hash=d.tx_hash,
+        timestamp=d.timestamp,
+        registrar=d.registrar or "",
+    )
@@ -1,5 +1,8 @@
 """Background tasks"""
+from pathlib import Path
+from typing import List, Optional
 from huey.contrib import djhuey as huey
+from iscc_registry import export, fetcher, ingest
 from iscc_registry.models import IsccId
 from django.conf import settings
 import requests
@@ -8,20 +11,64 @@ from loguru import logger as log
 
 @huey.db_task(retries=settings.IPFS_RETRIES, delay=settings.IPFS_RETRY_DELAY)
 def fetch_metadata(did: int):
-    """Fetch and store ISCC metadata"""
-    iscc_id_obj = IsccId.objects.get(did=did)
+    """Fetch and store ISCC metadata (refreshes content behind mutable Meta-URLs)"""
+    iscc_id_obj = IsccId.objects.only("did", "iscc_id", "meta_url", "meta_blob").get(did=did)
     log.debug(f"meta_url {iscc_id_obj.meta_url}")
     if not iscc_id_obj.meta_url:
         return
-    if iscc_id_obj.meta_url.startswith("ipfs://"):
-        url = settings.IPFS_GATEWAY + iscc_id_obj.meta_url.replace("ipfs://", "")
-    else:
-        url = iscc_id_obj.meta_url
-
-    log.debug(f"fetch metadata from: {url}")
-    meta = requests.get(url, timeout=settings.READ_TIMEOUT)
-    data = meta.json()
-    if data:
-        log.info(f"fetched metadata for {iscc_id_obj.iscc_id}: {data}")
-        iscc_id_obj.metadata = data
-        iscc_id_obj.save()
+    if not fetcher.resolve([iscc_id_obj], refresh=True):
+        raise RuntimeError(f"fetching metadata from {iscc_id_obj.meta_url} failed")
+    log.info(f"fetched metadata for {iscc_id_obj.iscc_id}")
+
+
+@huey.db_task()
+def fetch_metadata_batch(dids: List[int]):
+    """Fetch and store ISCC metadata for multiple declarations enqueued with a single write"""
+    fetcher.fetch_dids(dids)
+    # Retry failed fetches as single tasks
+    failed = IsccId.objects.filter(did__in=dids, meta_url__isnull=False, meta_blob__isnull=True)
+    for did in failed.values_list("did", flat=True):
+        fetch_metadata(did)
+
+
+@huey.db_task()
+def fetch_pending_metadata(chunk_size: int = 100):
+    """Backfill metadata for all declarations without metadata"""
+    fetcher.fetch_pending(chunk_size=chunk_size)
+
+
+@huey.task(retries=3, retry_delay=10)
+def purge_http_cache(keys: List[str]):
+    """Purge responses tagged with surrogate keys from the caching reverse proxy"""
+    log.debug(f"purge surrogate keys {keys}")
+    response = requests.request(
+        "PURGE",
+        settings.HTTP_PURGE_URL,
+        headers={"Surrogate-Key": " ".join(keys)},
+        timeout=settings.READ_TIMEOUT,
+    )
+    response.raise_for_status()
+
+
+@huey.db_task(retries=3, retry_delay=10)
+def apply_ingest(chain_id: int):
+    """Apply the ingest queue of a chain in did order (one consumer per chain)"""
+    with huey.lock_task(f"apply-ingest-{chain_id}"):
+        while True:
+            dids = ingest.apply(chain_id, settings.INGEST_BATCH_SIZE)
+            if dids is None:
+                break
+            if dids:
+                fetch_metadata_batch(dids)
+
+
+@huey.db_task()
+def build_export(history: bool = False, after: Optional[int] = None, gzip: bool = False):
+    """Write the export file for the export endpoint (skipped while the file is fresh)"""
+    path = export.snapshot_path(history, after, gzip)
+    with huey.lock_task(f"build-export-{path.name}"):
+        if export.is_fresh(path):
+            return
+        export.prune(Path(settings.EXPORT_ROOT))
+        size = export.write(path, history=history, after=after, gzip=gzip)
+    log.info(f"exported {size} bytes to {path}")
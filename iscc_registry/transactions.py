@@ -1,108 +1,511 @@
-from iscc_registry.exceptions import RegistrationError
-from iscc_registry.schema import Declaration, Head
-from iscc_registry.models import User, IsccId
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import RLock
+from time import perf_counter
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from iscc_registry import simhash, units
+from iscc_registry.cache import invalidate
+from iscc_registry.exceptions import ForkError, RegistrationError
+from iscc_registry.schema import Declaration, Head, Rollback
+from iscc_registry.models import Block, ChainHead, ChainModel, LiveIsccId, User, IsccId
+from django.conf import settings
 from django.db import transaction, IntegrityError
+from django.db.models import Count, Exists, Max, OuterRef, Subquery
+from loguru import logger as log
 import iscc_core as ic
 
 
-@transaction.atomic
+#: Number of ISCC-ID candidates checked per query while minting
+MINT_WINDOW = 4
+#: First key of the PostgreSQL advisory locks that serialize registrations per chain
+LOCK_NAMESPACE = 0x15CC
+#: Process-wide write lock for backends without advisory locks
+write_lock = RLock()
+
+
 def register(d: Declaration) -> IsccId:
-    """Register an ISCC delcaration."""
+    """
+    Register an ISCC delcaration.
+
+    Uses the same minimal-query write path as `register_batch`. The latest state of the candidate
+    ISCC-ID is loaded once and reused for minting, deletion/freeze checks and the revision number.
+    """
+    result = register_batch([d])[0]
+    if isinstance(result, RegistrationError):
+        raise result
+    return result
+
+
+def register_batch(declarations: List[Declaration]) -> List[Union[IsccId, RegistrationError]]:
+    """
+    Register an ordered list of ISCC declarations from a single chain.
+
+    All declarations are applied within one transaction with bulk inserts. The result holds either
+    the new `IsccId` entry or the `RegistrationError` for each declaration (in input order).
+
+    Registrations are serialized per chain (see `chain_lock`) and the latest declarations of
+    candidate ISCC-IDs are row locked while minting, so multiple observers can ingest
+    concurrently.
+
+    Declarations are checked against the block ledger of the chain. A declaration whose block
+    (or `parent_hash`) conflicts with a registered block is rejected with a `ForkError` that
+    carries the fork point.
+    """
+    if not declarations:
+        return []
+    chain_ids = {d.chain_id for d in declarations}
+    if len(chain_ids) != 1:
+        raise RegistrationError("Batch registration requires declarations from a single chain")
+    chain_id = chain_ids.pop()
+
+    with chain_lock([chain_id]):
+        # Load known declaration ids for monotonic id checks
+        registered = list(
+            IsccId.objects.filter(chain_id=chain_id, did__gte=min(d.did for d in declarations))
+            .order_by("did")
+            .values_list("did", flat=True)
+        )
+
+        # Load registered blocks around the batch for fork checks (keyed by height)
+        heights = [d.block_height for d in declarations]
+        blocks = {
+            block.block_height: block
+            for block in Block.objects.filter(
+                chain_id=chain_id,
+                block_height__gte=min(heights) - 1,
+                block_height__lte=max(heights),
+            )
+        }
+        touched = {}
+
+        # Prefetch current state of first choice ISCC-ID candidates
+        state = load_state({d.get_iscc_id() for d in declarations}, lock=True)
+
+        # Resolve (or create) all users of the batch (group by first appearance)
+        wallets = {}
+        for d in declarations:
+            wallets.setdefault(d.declarer, "declarer")
+            if d.registrar:
+                wallets.setdefault(d.registrar, "registrar")
+        users = {w: User(pk=pk, username=w) for w, pk in User.resolve(wallets).items()}
+
+        deactivate = []
+        new_objs = []
+        results = []
+        for d in declarations:
+            try:
+                check_fork(d, blocks)
+                idx = bisect_left(registered, d.did)
+                if idx < len(registered):
+                    if registered[idx] == d.did:
+                        raise RegistrationError(f"Declaration {d.did} already registered")
+                    raise RegistrationError(
+                        f"Found later declaration {registered[idx]} than {d.did}"
+                    )
+
+                candidate = mint(d.iscc_code, d.chain_id, d.declarer, state=state, lock=True)
+                ancestor = state[candidate]
+                check_deletion(d, candidate, ancestor)
+            except RegistrationError as e:
+                results.append(e)
+                continue
+
+            # Deactivate previous version (either persisted or pending in this batch)
+            if ancestor is not None:
+                if ancestor._state.adding:
+                    ancestor.active = False
+                else:
+                    deactivate.append(ancestor.did)
+
+            new_iid_obj = build(d, candidate, ancestor, users[d.declarer], users.get(d.registrar))
+            state[candidate] = new_iid_obj
+            registered.append(d.did)
+            block = count_block(d, blocks)
+            touched[block.block_height] = block
+            new_objs.append(new_iid_obj)
+            results.append(new_iid_obj)
+
+        if deactivate:
+            IsccId.objects.filter(did__in=deactivate).update(active=False)
+        IsccId.objects.bulk_create(new_objs)
+        push_blocks(list(touched.values()))
+        if new_objs:
+            push_head(new_objs[0].chain_id, new_objs)
+            push_live(new_objs)
+        invalidate({obj.iscc_id for obj in new_objs})
+        return results
+
+
+def check_fork(d: Declaration, blocks: Dict[int, Block]):
+    """Reject a declaration whose block or parent conflicts with the registered blocks."""
+    known = blocks.get(d.block_height)
+    if known is not None and known.block_hash != d.block_hash:
+        raise ForkError(
+            f"Block {d.block_hash} conflicts with registered block {known.block_hash} "
+            f"at height {d.block_height}",
+            d.chain_id,
+            known.block_height,
+            known.block_hash,
+        )
+    parent = blocks.get(d.block_height - 1)
+    if parent is not None and d.parent_hash and parent.block_hash != d.parent_hash:
+        raise ForkError(
+            f"Parent {d.parent_hash} of block {d.block_hash} conflicts with registered block "
+            f"{parent.block_hash} at height {parent.block_height}",
+            d.chain_id,
+            parent.block_height,
+            parent.block_hash,
+        )
+
+
+def count_block(d: Declaration, blocks: Dict[int, Block]) -> Block:
+    """Count a new registration in the (possibly new) ledger entry of its block."""
+    block = blocks.get(d.block_height)
+    if block is None:
+        block = Block(
+            chain_id=d.chain_id,
+            block_height=d.block_height,
+            block_hash=d.block_hash,
+            first_did=d.did,
+        )
+        blocks[d.block_height] = block
+    block.declarations += 1
+    block.parent_hash = block.parent_hash or d.parent_hash
+    return block
+
+
+def push_blocks(blocks: List[Block]):
+    """Write new and updated ledger entries (one insert and one update at most)."""
+    known = [block for block in blocks if not block._state.adding]
+    Block.objects.bulk_create([block for block in blocks if block._state.adding])
+    if known:
+        Block.objects.bulk_update(known, ["declarations", "parent_hash"])
+
+
+@contextmanager
+def chain_lock(chain_ids: Iterable[int]):
+    """
+    Serialize writes to the given chains within a transaction.
+
+    Uses transaction level advisory locks on PostgreSQL (acquired in chain order to avoid
+    deadlocks), so different chains are written in parallel. Other backends (SQLite) only support
+    a single writer and fall back to a process-wide lock.
+    """
+    connection = transaction.get_connection()
+    if connection.vendor == "postgresql":
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for key in lock_keys(chain_ids):
+                    cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", list(key))
+            yield
+    else:
+        with write_lock, transaction.atomic():
+            yield
+
+
+def lock_keys(chain_ids: Iterable[int]) -> List[Tuple[int, int]]:
+    """Advisory lock keys of chains (deduplicated and in chain order to avoid deadlocks)"""
+    return [(LOCK_NAMESPACE, chain_id) for chain_id in sorted(set(chain_ids))]
+
+
+def push_head(chain_id: int, objs: List[IsccId]):
+    """Add new registration events (in did order) to the head ring of their chain."""
+    head = ChainHead.objects.select_for_update().filter(chain_id=chain_id).first()
+    if head is None:
+        reset_heads([chain_id])
+        return
+    headers = [ChainHead.header(obj) for obj in reversed(objs)]
+    head.headers = (headers + head.headers)[: settings.HEAD_RING_SIZE]
+    head.save(update_fields=["headers"])
+
+
+def reset_heads(chain_ids: Iterable[int]) -> Dict[int, IsccId]:
+    """Rebuild the head rings of chains from the event log. Returns the head event per chain."""
+    fields = ("did", "chain_id", "block_height", "block_hash", "tx_idx", "tx_hash", "timestamp")
+    rings, heads = [], {}
+    for chain_id in chain_ids:
+        qs = IsccId.objects.filter(chain_id=chain_id).order_by("-did").only(*fields)
+        objs = list(qs[: settings.HEAD_RING_SIZE])
+        if objs:
+            headers = [ChainHead.header(obj) for obj in objs]
+            rings.append(ChainHead(chain_id=chain_id, headers=headers))
+            heads[chain_id] = objs[0]
+    ChainHead.objects.bulk_create(
+        rings, update_conflicts=True, unique_fields=["chain_id"], update_fields=["headers"]
+    )
+    empty = set(chain_ids) - set(heads)
+    if empty:
+        ChainHead.objects.filter(chain_id__in=empty).delete()
+    return heads
+
 
-    # check for monotonic ids
-    qs = IsccId.objects.filter(did__gte=d.did, chain_id=d.chain_id).only("did").order_by("did")
+def push_live(objs: List[IsccId]):
+    """Apply new registration events (in did order) to the live ISCC-ID projection."""
+    latest = {obj.iscc_id: obj for obj in objs}
+    live = [LiveIsccId(iscc_id=i, event_id=o.did) for i, o in latest.items() if not o.deleted]
+    gone = [i for i, o in latest.items() if o.deleted]
+    if live:
+        LiveIsccId.objects.bulk_create(
+            live, update_conflicts=True, unique_fields=["iscc_id"], update_fields=["event_id"]
+        )
+    if gone:
+        LiveIsccId.objects.filter(iscc_id__in=gone).delete()
+
+
+def sync_live(iscc_ids: Iterable[str]):
+    """Refresh the live projection of ISCC-IDs from the declaration log (e.g. after redaction)."""
+    iscc_ids = list(set(iscc_ids))
+    LiveIsccId.objects.filter(iscc_id__in=iscc_ids).delete()
+    qs = IsccId.objects.filter(iscc_id__in=iscc_ids, active=True, deleted=False, redacted=False)
+    rows = qs.values_list("iscc_id", "did")
+    LiveIsccId.objects.bulk_create([LiveIsccId(iscc_id=i, event_id=did) for i, did in rows])
+
+
+@transaction.atomic
+def rebuild_live(chunk_size: int = 10000) -> int:
+    """Rebuild the live ISCC-ID projection from the declaration log (walks in did order)."""
+    LiveIsccId.objects.all().delete()
+    qs = IsccId.objects.filter(active=True, deleted=False, redacted=False).order_by("did")
+    last_did, total = -1, 0
+    while True:
+        rows = list(qs.filter(did__gt=last_did).values_list("iscc_id", "did")[:chunk_size])
+        if not rows:
+            break
+        LiveIsccId.objects.bulk_create([LiveIsccId(iscc_id=i, event_id=did) for i, did in rows])
+        total += len(rows)
+        last_did = rows[-1][1]
+        log.info(f"rebuilt live projection for {total} ISCC-IDs")
+    return total
+
+
+def load_state(iscc_ids: Iterable[str], lock: bool = False) -> Dict[str, Optional[IsccId]]:
+    """
+    Load the latest declaration for each of the given ISCC-IDs (None if not registered).
+
+    With `lock` the loaded rows are locked until the end of the transaction.
+    """
+    state = dict.fromkeys(iscc_ids)
+    qs = (
+        IsccId.objects.filter(iscc_id__in=list(state))
+        .select_related("owner")
+        .only(
+            "did",
+            "active",
+            "iscc_id",
+            "iscc_code",
+            "owner__username",
+            "frozen",
+            "deleted",
+            "revision",
+        )
+        .order_by("did")
+    )
+    if lock:
+        qs = qs.select_for_update(of=("self",))
     for obj in qs:
-        if obj.did == d.did:
-            raise RegistrationError(f"Declaration {d.did} already registered")
-        raise RegistrationError(f"Found later declaration {obj.did} than {d.did}")
+        state[obj.iscc_id] = obj
+    return state
 
-    # Mint ISCC-ID
-    candidate = mint(d.iscc_code, d.chain_id, d.declarer)
 
-    # Check deletion rules
-    if d.delete and not IsccId.objects.filter(iscc_id=candidate).exists():
+def check_deletion(d: Declaration, candidate: str, ancestor: Optional[IsccId]):
+    """Check deletion rules for a declaration against the latest state of its ISCC-ID."""
+    if d.delete and ancestor is None:
         raise RegistrationError(f"Cannot delete new ISCC-ID {candidate}")
-    if d.delete and IsccId.objects.filter(iscc_id=candidate, frozen=True).exists():
+    if d.delete and ancestor.frozen:
         raise RegistrationError(f"Cannot delete frozen ISCC-ID {candidate}")
 
-    # initialize related objects
-    user_obj_declarer = User.get_or_create(wallet=d.declarer, group="declarer")
-    user_obj_registrar = None
-    if d.registrar:
-        user_obj_registrar = User.get_or_create(wallet=d.registrar, group="registrar")
-
-    # Deactivate pre-existing versions of ISCC-ID
-    IsccId.objects.filter(iscc_id=candidate).update(active=False)
 
-    # Create new IsccIdModel entry for declaration event
-    new_iid_obj = IsccId(
+def build(
+    d: Declaration,
+    candidate: str,
+    ancestor: Optional[IsccId],
+    declarer: User,
+    registrar: Optional[User],
+) -> IsccId:
+    """Build (unsaved) IsccId entry for a declaration event."""
+    return IsccId(
         did=d.did,
         iscc_id=candidate,
         iscc_code=d.iscc_code,
-        declarer=user_obj_declarer,
+        declarer=declarer,
         meta_url=d.meta_url or None,
         message=d.message or None,
         timestamp=d.timestamp,
-        owner=user_obj_declarer,
+        owner=declarer,
         chain_id=d.chain_id,
         block_height=d.block_height,
         block_hash=d.block_hash,
         tx_idx=d.tx_idx,
         tx_hash=d.tx_hash,
-        registrar=user_obj_registrar,
-        simhash=ic.alg_simhash_from_iscc_id(iscc_id=candidate, wallet=d.declarer),
+        registrar=registrar,
+        **simhash.fields(candidate, d.declarer),
+        **units.fields(d.iscc_code),
         frozen=d.freeze,
         deleted=d.delete,
-        revision=IsccId.objects.filter(iscc_id=candidate).count() + 1,
+        revision=ancestor.revision + 1 if ancestor else 1,
     )
-    new_iid_obj.save(force_insert=True)
-    return new_iid_obj
 
 
-@transaction.atomic
-def rollback(block_hash: str):
-    """Reset event history to before `block_hash` in case of a fork."""
-    start_obj = IsccId.objects.filter(block_hash=block_hash).order_by("did").first()
-    if start_obj is None:
-        raise IntegrityError(f"No declaration found for block {block_hash}")
-
-    # Select events from all chains for backwards iteration to have consistent state
-    stale_qs = IsccId.objects.filter(did__gte=start_obj.did).order_by("-did").only("did", "active")
-    stale_qs.update(active=False)
-    for stale_obj in stale_qs:
-        anc = stale_obj.ancestor()
-        if anc:
-            anc.active = True
-            anc.save()
-        stale_obj.delete()
-
-    new_head = IsccId.objects.filter(chain_id=start_obj.chain_id).order_by("did").last()
-    return Head.from_orm(new_head)
-
-
-def mint(iscc_code: str, chain_id: int, wallet: str) -> str:
+def rollback(block_hash: str, chain_only: bool = False) -> Rollback:
+    """
+    Reset event history to before `block_hash` in case of a fork.
+
+    The first event of the fork is looked up in the block ledger and ledger entries of removed
+    blocks are deleted with the events. Earlier blocks of other chains that interleave with the
+    removed events are kept and recounted.
+
+    The rollback is executed with a fixed number of set-based statements independent of the
+    number of stale events. Returns the new chain head with row counts and phase timings.
+
+    By default events from all chains are removed. With `chain_only` only the events of the
+    forked chain are removed and the state of unrelated chains is left untouched.
+    """
+    # Block registrations on all chains (stale events are selected across chains) or only on the
+    # forked chain with `chain_only`, so other chains keep registering during the rollback
+    chain_ids = ChainModel.Chain.values
+    if chain_only:
+        forked = Block.objects.filter(block_hash=block_hash).values_list("chain_id", flat=True)
+        chain_ids = list(forked)
+    with chain_lock(chain_ids):
+        timings = {}
+        t = perf_counter()
+        start = (
+            Block.objects.filter(block_hash=block_hash)
+            .only("chain_id", "first_did")
+            .order_by("first_did")
+            .first()
+        )
+        if start is None:
+            raise IntegrityError(f"No declaration found for block {block_hash}")
+        timings["lookup"] = perf_counter() - t
+
+        # Select events from all chains to have consistent state (unless chain_only)
+        stale_qs = IsccId.objects.filter(did__gte=start.first_did)
+        if chain_only:
+            stale_qs = stale_qs.filter(chain_id=start.chain_id)
+        affected = list(stale_qs.values_list("chain_id", "iscc_id").distinct())
+        chain_ids = {chain_id for chain_id, _ in affected}
+
+        # Deactivate stale events (frees the unique active ISCC-ID constraint)
+        t = perf_counter()
+        stale_qs.filter(active=True).update(active=False)
+        timings["deactivate"] = perf_counter() - t
+
+        # Reactivate the latest surviving revision of each affected ISCC-ID
+        t = perf_counter()
+        survivors = (
+            IsccId.objects.filter(did__lt=start.first_did, iscc_id__in=stale_qs.values("iscc_id"))
+            .values("iscc_id")
+            .annotate(latest=Max("did"))
+            .values("latest")
+        )
+        reactivated = IsccId.objects.filter(did__in=survivors).update(active=True)
+
+        # Point the live projection back to the reactivated revisions
+        LiveIsccId.objects.filter(event__in=stale_qs).delete()
+        restored = IsccId.objects.filter(did__in=survivors, deleted=False, redacted=False)
+        restored = restored.values_list("iscc_id", "did")
+        LiveIsccId.objects.bulk_create([LiveIsccId(iscc_id=i, event_id=did) for i, did in restored])
+        timings["reactivate"] = perf_counter() - t
+
+        # Blocks that started before the fork (on other chains) but hold stale events survive
+        t = perf_counter()
+        stale_blocks = stale_qs.filter(
+            chain_id=OuterRef("chain_id"), block_hash=OuterRef("block_hash")
+        )
+        overlapping = list(
+            Block.objects.filter(first_did__lt=start.first_did)
+            .filter(Exists(stale_blocks))
+            .values_list("pk", flat=True)
+        )
+        deleted, _ = stale_qs.delete()
+        blocks = Block.objects.filter(first_did__gte=start.first_did)
+        if chain_only:
+            blocks = blocks.filter(chain_id=start.chain_id)
+        blocks.delete()
+
+        # Recount the surviving declarations of overlapping blocks
+        if overlapping:
+            counts = (
+                IsccId.objects.filter(
+                    chain_id=OuterRef("chain_id"), block_hash=OuterRef("block_hash")
+                )
+                .order_by()
+                .values("block_hash")
+                .annotate(n=Count("did"))
+                .values("n")
+            )
+            Block.objects.filter(pk__in=overlapping).update(declarations=Subquery(counts))
+        timings["delete"] = perf_counter() - t
+
+        invalidate({iscc_id for _, iscc_id in affected})
+        log.info(f"rollback {block_hash}: {deleted} deleted, {reactivated} reactivated {timings}")
+        heads = reset_heads(sorted(chain_ids))
+        stats = dict(
+            heads=[Head.from_orm(heads[cid]) for cid in sorted(heads)],
+            deleted=deleted,
+            reactivated=reactivated,
+            timings=timings,
+        )
+        head = Head.from_orm(heads.get(start.chain_id)).dict(by_alias=True)
+        return Rollback(**head, **stats)
+
+
+def candidates(
+    iscc_code: str, chain_id: int, wallet: str, start: int = 0, stop: int = MINT_WINDOW
+) -> List[str]:
+    """ISCC-ID candidates for the uniqueness counters `start` up to (excluding) `stop`."""
+    return [
+        ic.gen_iscc_id_v0(iscc_code, chain_id, wallet, uc=uc)["iscc"].lstrip("ISCC:")
+        for uc in range(start, stop)
+    ]
+
+
+def mint(
+    iscc_code: str,
+    chain_id: int,
+    wallet: str,
+    state: Optional[dict] = None,
+    lock: bool = False,
+) -> str:
     """
     Mint ISCC-ID according to Minting protocol based on the history of the registry.
+
+    An optional `state` mapping (as returned by `load_state`) is used as a lookup cache for the
+    latest declaration of candidate ISCC-IDs. Candidates are generated in windows of
+    `MINT_WINDOW` (doubling for crowded codes) and unknown candidates of a window are loaded into
+    `state` with a single query (row locked with `lock`).
     """
-    uc = 0
+    state = {} if state is None else state
+    start, window = 0, MINT_WINDOW
     while True:
-        candidate = ic.gen_iscc_id_v0(iscc_code, chain_id, wallet, uc=uc)["iscc"].lstrip("ISCC:")
-        iid_obj = (
-            IsccId.objects.filter(iscc_id=candidate)
-            .only("iscc_code", "owner", "frozen", "deleted")
-            .order_by("did")
-            .last()
-        )
-        if iid_obj:
-            # ISCC-ID exists. It should be active.
-            if iid_obj.active is False:
-                raise IntegrityError(f"Latest {iid_obj.iscc_id} is not active")
-            # Check if we can update
-            can_update = iid_obj.owner.username == wallet
-            can_update = can_update and iid_obj.frozen is False and iid_obj.deleted is False
-            can_update = can_update and iid_obj.iscc_code == iscc_code
-            if not can_update:
-                # Try the next ISCC-ID
-                uc += 1
-                continue
-        return candidate
+        ids = candidates(iscc_code, chain_id, wallet, start, start + window)
+        for candidate in ids:
+            if candidate not in state:
+                state.update(load_state([c for c in ids if c not in state], lock=lock))
+            iid_obj = state[candidate]
+            if iid_obj:
+                # ISCC-ID exists. It should be active.
+                if iid_obj.active is False:
+                    raise IntegrityError(f"Latest {iid_obj.iscc_id} is not active")
+                # Check if we can update
+                can_update = iid_obj.owner.username == wallet
+                can_update = can_update and iid_obj.frozen is False and iid_obj.deleted is False
+                can_update = can_update and iid_obj.iscc_code == iscc_code
+                if not can_update:
+                    # Try the next ISCC-ID
+                    continue
+            return candidate
+        start, window = start + window, window * 2
+
+
+def mint_many(forecasts: List[Tuple[str, int, str]]) -> List[str]:
+    """
+    Mint ISCC-IDs for many (iscc_code, chain_id, wallet) tuples without registering them.
+
+    The first candidate window of all forecasts is prefetched with a single query, so only
+    crowded codes cost additional queries.
+    """
+    ids = {c for forecast in forecasts for c in candidates(*forecast)}
+    state = load_state(ids)
+    return [mint(*forecast, state=state) for forecast in forecasts]
@@ -0,0 +1,254 @@
+"""
+Content-similarity search across ISCC-CODE units.
+
+At registration the ISCC-CODE of a declaration is decomposed into its units and the first 64 bits
+of each unit body are stored as signed 64-bit integers (`meta_unit` ... `instance_unit`).
+
+Similarity search runs on a vectorized NumPy index with one row per live declaration
+(`did`, unit presence flags and the five unit values). The index is either memory-mapped from a
+snapshot file (`UNIT_INDEX_PATH`, written by `manage.py build_unit_index`) or built in memory from
+the database on first use. Declarations registered after the latest indexed `did` of their chain
+are merged into a delta, and all hits are checked against the database before they are returned,
+so stale index rows never leak out.
+
+NumPy is an optional dependency (`similarity` extra). Without it only the unit columns are
+maintained.
+"""
+import os
+from threading import Lock
+from time import monotonic
+from typing import Dict, Iterable, List, Optional, Tuple
+from django.conf import settings
+from django.db.models import Q
+from loguru import logger as log
+import iscc_core as ic
+from iscc_registry.models import IsccId
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+UNITS = ("meta", "semantic", "content", "data", "instance")
+MAINTYPES = {
+    ic.MT.META: "meta",
+    ic.MT.SEMANTIC: "semantic",
+    ic.MT.CONTENT: "content",
+    ic.MT.DATA: "data",
+    ic.MT.INSTANCE: "instance",
+}
+FIELDS = tuple(f"{unit}_unit" for unit in UNITS)
+#: Index columns: did, unit presence flags, unit values
+DID, FLAGS, OFFSET = 0, 1, 2
+#: Position of the chain-id in a did (timestamp | chain-id | tx-idx)
+CHAIN_SHIFT, CHAIN_MASK = 14, 0x3FFF
+CHUNK_SIZE = 100000
+
+
+def decompose(iscc_code: str) -> Dict[str, int]:
+    """Decompose ISCC-CODE into signed 64-bit integers per unit type"""
+    result = {}
+    for unit in ic.iscc_decompose(iscc_code):
+        code = ic.Code(unit)
+        name = MAINTYPES.get(code.maintype)
+        if name:
+            result[name] = int.from_bytes(code.hash_bytes[:8], "big", signed=True)
+    return result
+
+
+def fields(iscc_code: str) -> Dict[str, Optional[int]]:
+    """Calculate unit fields for an ISCC-CODE"""
+    units = decompose(iscc_code)
+    return {f"{unit}_unit": units.get(unit) for unit in UNITS}
+
+
+def popcount(values: "np.ndarray") -> "np.ndarray":
+    """Number of set bits per uint64 value"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return table[values.view(np.uint8).reshape(-1, 8)].sum(axis=1, dtype=np.uint8)
+
+
+class UnitIndex:
+    """Vectorized Hamming-distance index over ISCC-CODE units."""
+
+    def __init__(self, data: "np.ndarray"):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    def watermarks(self) -> Dict[int, int]:
+        """Latest indexed did per chain (declaration ids are only ordered per chain)"""
+        dids = self.data[:, DID]
+        chains = (dids >> np.uint64(CHAIN_SHIFT)) & np.uint64(CHAIN_MASK)
+        return {int(chain): int(dids[chains == chain].max()) for chain in np.unique(chains)}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple]) -> "UnitIndex":
+        """Build index from (did, meta_unit, ..., instance_unit) rows"""
+        chunks, chunk = [], []
+        for row in rows:
+            flags = sum(1 << i for i, value in enumerate(row[1:]) if value is not None)
+            chunk.append([row[0], flags] + [value or 0 for value in row[1:]])
+            if len(chunk) == CHUNK_SIZE:
+                chunks.append(np.array(chunk, dtype=np.int64))
+                chunk = []
+        if chunk or not chunks:
+            chunks.append(np.array(chunk, dtype=np.int64).reshape(-1, OFFSET + len(UNITS)))
+        return cls(np.concatenate(chunks).view(np.uint64))
+
+    @classmethod
+    def from_db(cls) -> "UnitIndex":
+        """Build index of live declarations"""
+        qs = IsccId.objects.filter(active=True, deleted=False, redacted=False)
+        rows = qs.order_by("did").values_list("did", *FIELDS)
+        return cls.from_rows(rows.iterator(chunk_size=CHUNK_SIZE))
+
+    @classmethod
+    def load(cls, path: str) -> "UnitIndex":
+        """Memory-map an index snapshot"""
+        return cls(np.load(path, mmap_mode="r"))
+
+    def save(self, path: str):
+        """Write index snapshot atomically"""
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as outf:
+            np.save(outf, np.ascontiguousarray(self.data))
+        os.replace(tmp, path)
+
+    def search(
+        self, units: Dict[str, int], max_distance: int, k: int
+    ) -> Dict[str, List[Tuple[int, int]]]:
+        """Top-k (did, distance) per query unit within `max_distance` (closest first)"""
+        result = {}
+        for name, value in units.items():
+            col = UNITS.index(name)
+            query = np.uint64(value & 0xFFFFFFFFFFFFFFFF)
+            dist = popcount(self.data[:, OFFSET + col] ^ query)
+            present = (self.data[:, FLAGS] & np.uint64(1 << col)) != 0
+            hits = np.flatnonzero(present & (dist <= max_distance))
+            if len(hits) > k:
+                hits = hits[np.argpartition(dist[hits], k - 1)[:k]]
+            hits = hits[np.lexsort((self.data[hits, DID], dist[hits]))]
+            result[name] = [(int(self.data[i, DID]), int(dist[i])) for i in hits]
+        return result
+
+
+def newer(marks: Dict[int, int]) -> Q:
+    """Filter for declarations after the per-chain watermarks"""
+    query = ~Q(chain_id__in=list(marks)) if marks else Q()
+    for chain_id, did in marks.items():
+        query |= Q(chain_id=chain_id, did__gt=did)
+    return query
+
+
+#: Base index (snapshot or database build) and delta of later declarations
+_base: Optional[UnitIndex] = None
+_delta: Optional[UnitIndex] = None
+#: Latest indexed did per chain
+_marks: Dict[int, int] = {}
+_mtime: Optional[float] = None
+_built: float = 0.0
+_lock = Lock()
+
+
+def _reset_base(base: UnitIndex):
+    global _base, _delta, _marks
+    _base, _delta = base, UnitIndex.from_rows([])
+    _marks = base.watermarks()
+
+
+def _rebuild():
+    global _built
+    _reset_base(UnitIndex.from_db())
+    _built = monotonic()
+    log.info(f"built unit index with {len(_base)} rows from database")
+
+
+def _update() -> bool:
+    """Merge declarations after the watermarks into the delta (False if a watermark is gone)"""
+    global _delta
+    marks = set(_marks.values())
+    live = Q(newer(_marks), active=True, deleted=False, redacted=False)
+    qs = IsccId.objects.filter(live | Q(did__in=marks)).order_by("did")
+    rows = list(qs.values_list("did", *FIELDS))
+    new = [row for row in rows if row[0] not in marks]
+    if len(rows) - len(new) < len(marks):
+        return False
+    if new:
+        delta = UnitIndex.from_rows(new)
+        _delta = UnitIndex(np.concatenate([_delta.data, delta.data]))
+        _marks.update(delta.watermarks())
+    return True
+
+
+def get_index() -> List[UnitIndex]:
+    """
+    Index partials: the base index and the delta of declarations registered after it.
+
+    The base is the snapshot (reloaded when the snapshot file changes) or an in-memory index built
+    from the database (rebuilt after `UNIT_INDEX_REFRESH` seconds). Declarations after the latest
+    indexed did of each chain are merged into the delta on every call. If an indexed watermark
+    declaration was removed by a rollback the base is rebuilt from the database.
+    """
+    global _mtime
+    path = settings.UNIT_INDEX_PATH
+    with _lock:
+        if path and os.path.exists(path):
+            mtime = os.path.getmtime(path)
+            if mtime != _mtime:
+                _reset_base(UnitIndex.load(path))
+                _mtime = mtime
+                log.info(f"loaded unit index snapshot with {len(_base)} rows from {path}")
+        elif _base is None or monotonic() - _built > settings.UNIT_INDEX_REFRESH:
+            _rebuild()
+        if not _update():
+            log.warning("unit index watermark rolled back, rebuilding from database")
+            _rebuild()
+            _update()
+        return [_base, _delta]
+
+
+def reset():
+    """Drop the process-local index"""
+    global _base, _delta, _marks, _mtime
+    with _lock:
+        _base, _delta, _marks, _mtime = None, None, {}, None
+
+
+def similar(iscc_code: str, max_distance: int, k: int) -> Dict[str, List[Tuple[str, str, int]]]:
+    """
+    Top-k live declarations per unit of `iscc_code` as (iscc_id, iscc_code, distance)
+
+    Index hits are checked against the database. Units with less than `k` live hits are searched
+    again with a doubled hit limit as long as the index has more candidates.
+    """
+    if np is None:
+        raise RuntimeError("similarity search requires numpy")
+    units = decompose(iscc_code)
+    partials = get_index()
+    live, checked, fetch = {}, set(), k
+    while True:
+        hits, truncated = {}, set()
+        for partial in partials:
+            for name, matches in partial.search(units, max_distance, fetch).items():
+                hits.setdefault(name, []).extend(matches)
+                if len(matches) == fetch:
+                    truncated.add(name)
+        dids = {did for matches in hits.values() for did, _ in matches} - checked
+        qs = IsccId.objects.filter(did__in=dids, active=True, deleted=False, redacted=False)
+        for did, iscc_id, code in qs.values_list("did", "iscc_id", "iscc_code"):
+            live[did] = (iscc_id, code)
+        checked |= dids
+        short = [n for n in truncated if sum(did in live for did, _ in hits[n]) < k]
+        if not short:
+            break
+        fetch *= 2
+    result = {}
+    for name, matches in hits.items():
+        matches = sorted((dist, did) for did, dist in matches if did in live)[:k]
+        result[name] = [live[did] + (dist,) for dist, did in matches]
+    return result
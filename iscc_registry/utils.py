@@ -1,13 +1,80 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from hashlib import sha256
+from typing import Optional
 from django.conf import settings
 from django.utils.safestring import mark_safe
+import iscc_core as ic
 import mistune
 import bleach
 
 
+#: Multicodec prefix of a CIDv1 with raw codec and sha2-256 multihash
+CID_RAW_SHA256 = bytes.fromhex("01551220")
+
+
+def gateway_url(url: str) -> str:
+    """Convert `ipfs://` URLs to HTTP URLs via the configured IPFS gateway"""
+    if url.startswith("ipfs://"):
+        return settings.IPFS_GATEWAY + url.replace("ipfs://", "")
+    return url
+
+
+def metadata_key(url: str) -> str:
+    """Content address for a Meta-URL (IPFS CID path or hash of a mutable URL)"""
+    if url.startswith("ipfs://"):
+        return url.replace("ipfs://", "")
+    return "sha256:" + sha256(url.encode("utf-8")).hexdigest()
+
+
+def is_immutable(key: str) -> bool:
+    """Whether the content behind a metadata key can never change"""
+    return not key.startswith("sha256:")
+
+
+def verify_cid(cid: str, content: bytes) -> Optional[bool]:
+    """
+    Verify content against a CID.
+
+    Returns None if the CID can not be verified locally. Only base32 CIDv1 with raw codec and
+    sha2-256 multihash are supported (other codecs like dag-pb require the IPFS object model).
+    """
+    if not cid.startswith("b") or "/" in cid:
+        return None
+    try:
+        raw = ic.decode_base32(cid[1:].upper())
+    except ValueError:
+        return None
+    if not raw.startswith(CID_RAW_SHA256):
+        return None
+    return sha256(content).digest() == raw[len(CID_RAW_SHA256) :]
+
+
+def encode_cursor(did: int) -> str:
+    """Opaque keyset pagination cursor for the last returned declaration"""
+    return urlsafe_b64encode(f"did:{did}".encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Decode keyset pagination cursor to declaration id (raises ValueError if invalid)"""
+    try:
+        raw = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor {cursor}")
+    prefix, _, did = raw.partition(":")
+    if prefix != "did" or not did.isdigit():
+        raise ValueError(f"Invalid cursor {cursor}")
+    return int(did)
+
+
+def time_to_did(dt: datetime) -> int:
+    """Smallest declaration id at the given time (did = timestamp | chain-id | tx-idx)"""
+    return int(dt.timestamp()) << 28
+
+
 def linkify(url: str) -> str:
     """Create clickable link from URL with IPFS support"""
-    link = settings.IPFS_GATEWAY + url.replace("ipfs://", "") if url.startswith("ipfs://") else url
-    html = f'<a href="{link}" target="top">{url}</a>'
+    html = f'<a href="{gateway_url(url)}" target="top">{url}</a>'
     return mark_safe(html)
 
 
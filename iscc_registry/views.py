@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.http import HttpResponseBadRequest, HttpResponseNotFound
 from django.shortcuts import render, redirect
-from iscc_registry.models import IsccId
+from iscc_registry.api_v1 import aprovisional_url
+from iscc_registry.cache import aresolve_url
 import iscc_core as ic
 
 
@@ -8,8 +10,8 @@ def index(request):
     return render(request, "index.html")
 
 
-def resolver(request, iscc_id):
-    """Resolve ISCC-ID"""
+async def resolver(request, iscc_id):
+    """Resolve ISCC-ID (staged ISCC-IDs with `?provisional=true`)"""
     # Validate ISCC string
     try:
         norm = ic.iscc_normalize(iscc_id)
@@ -17,17 +19,18 @@ def resolver(request, iscc_id):
     except ValueError as e:
         return HttpResponseBadRequest(str(e))
 
-    # Fetch from database
-    try:
-        iscc_obj = IsccId.get_safe(iscc_id=norm.lstrip("ISCC:"))
-    except IsccId.DoesNotExist:
+    # Resolve to redirect target or local entry (cached)
+    code = norm.lstrip("ISCC:")
+    url = await aresolve_url(code)
+    if url is None and request.GET.get("provisional", "").lower() in ("1", "true"):
+        url = await aprovisional_url(code)
+        if url is not None:
+            response = redirect(url, permanent=False)
+            response["Cache-Control"] = "no-store"
+            return response
+    if url is None:
         return HttpResponseNotFound(f"{iscc_id} not found.")
-
-    # Resolve if we can
-    if iscc_obj.metadata:
-        url = iscc_obj.metadata.get("redirect")
-        if url:
-            return redirect(url, permanent=False)
-
-    # Redirect to local entry
-    return redirect(iscc_obj.get_registry_url(), permanent=False)
+    response = redirect(url, permanent=False)
+    response["Cache-Control"] = settings.HTTP_CACHE_CONTROL
+    response["Surrogate-Key"] = code
+    return response
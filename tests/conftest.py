@@ -1,13 +1,32 @@
+import inspect
 import pytest
+from asgiref.sync import async_to_sync
 from ninja.testing import TestClient
-from iscc_registry import schema
+from ninja.testing.client import NinjaResponse
+from iscc_registry import ingest, schema
 from django.core.management import call_command
 from iscc_registry.api_v1 import api
+from iscc_registry.cache import resolver_cache
+from iscc_registry.models import user_cache
+
+
+class ApiClient(TestClient):
+    """Test client for sync and async API operations."""
+
+    def _call(self, func, request, kwargs):
+        result = func(request, **kwargs)
+        if inspect.isawaitable(result):
+
+            async def run():
+                return await result
+
+            result = async_to_sync(run)()
+        return NinjaResponse(result)
 
 
 @pytest.fixture(scope="session")
 def api_client():
-    return TestClient(api)
+    return ApiClient(api)
 
 
 @pytest.fixture(scope="session")
@@ -16,6 +35,20 @@ def django_db_setup(django_db_setup, django_db_blocker):
         call_command("loaddata", "--app", "iscc_registry.ChainModel", "chains")
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    resolver_cache.clear()
+    user_cache.clear()
+
+
+@pytest.fixture
+def queue(settings):
+    settings.INGEST_QUEUE = "memory"
+    ingest.get_queue.cache_clear()
+    yield ingest.get_queue()
+    ingest.get_queue.cache_clear()
+
+
 @pytest.fixture
 def dclr_a():
     return schema.Declaration(
@@ -35,8 +68,9 @@ def dclr_a_update():
     return schema.Declaration(
         timestamp=1649008120,
         chain_id=2,
-        block_height=14514543,
+        block_height=14514544,
         block_hash="0x60735e41758bd8f411117ac7f20ef3779c35ab9c9c2e4f5c70c87d4d73979f06",
+        parent_hash="0x60735e41758bd8f411117ac7f20ef3779c35ab9c9c2e4f5c70c87d4d73979f05",
         tx_idx=1,
         tx_hash="0xcade12c2cba31fbbfeddd1df932388dcd1c43fa346e233e34915dc3694546f3b",
         declarer="0x1ad91ee08f21be3de0ba2ba6918e714da6b45836",
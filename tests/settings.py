@@ -2,6 +2,7 @@ import os
 
 os.environ["DATABASE_URL"] = "sqlite://:memory:"
 os.environ["SECRET_KEY"] = "test-secret"
+os.environ["NINJA_SKIP_REGISTRY"] = "yes"
 from iscc_registry.settings import *
 
 HUEY = {
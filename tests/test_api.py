@@ -1,7 +1,13 @@
 # -*- coding: utf-8 -*-
+import gzip
+import json
+import os
+from time import time
 from dev.fake import Fake
 from dev.load import load
-from iscc_registry.models import IsccId
+from iscc_registry import export
+from iscc_registry.models import IsccId, MetadataBlob
+from iscc_registry.transactions import register, rollback
 
 
 def test_index(api_client):
@@ -82,13 +88,22 @@ def test_rollback(db, api_client):
     )
     assert resp.status_code == 200
     assert IsccId.objects.count() == 5
-    assert resp.json() == {
+    result = resp.json()
+    timings = result.pop("timings")
+    assert set(timings) == {"lookup", "deactivate", "reactivate", "delete"}
+    heads = result.pop("heads")
+    assert [h["chain"] for h in heads] == [0, 1, 2]
+    assert heads[2]["block_height"] == 837
+    assert result == {
         "block_hash": "0x37378e310269177c27f2c1e0a165ee7e84e83714a8fd279ef6b1de1b66b68980",
         "block_height": 837,
         "chain": 2,
         "timestamp": "2009-01-03T17:54:36Z",
         "tx_hash": "0x71eacd0549a3e80e966e12778c1745a79a6a5f92cca74147f6be1f723405095c",
         "tx_idx": 2213,
+        "deleted": 5,
+        "reactivated": 0,
+        "discarded": 0,
     }
     assert IsccId.objects.count() == 5
     assert (
@@ -97,3 +112,317 @@ def test_rollback(db, api_client):
         ).exists()
         is False
     )
+
+
+def test_register_batch(db, api_client):
+    f = Fake()
+    decs = [f.declaration for _ in range(20)]
+    chain_id = decs[0].chain_id
+    batch = [d for d in decs if d.chain_id == chain_id][:3]
+    payload = [d.dict() for d in batch]
+    for item in payload:
+        item["timestamp"] = int(item["timestamp"].timestamp())
+    h = {"Authorization": "Bearer observer-token"}
+    resp = api_client.post("/register/batch", json=payload, headers=h)
+    assert resp.status_code == 200
+    result = resp.json()
+    assert [r["did"] for r in result] == [d.did for d in batch]
+    assert all(r["iscc_id"].startswith("ISCC:") for r in result if "error" not in r)
+    assert IsccId.objects.filter(did__in=[r["did"] for r in result if "iscc_id" in r]).count()
+    resp = api_client.post("/register/batch", json=payload[:1], headers=h)
+    assert resp.json() == [
+        {"did": batch[0].did, "error": f"Declaration {batch[0].did} already registered"}
+    ]
+
+
+def test_register_fork(db, api_client, dclr_a, dclr_a_update):
+    register(dclr_a)
+    register(dclr_a_update)
+    h = {"Authorization": "Bearer observer-token"}
+    orphan = dclr_a_update.dict()
+    orphan.update(
+        timestamp=int(dclr_a_update.timestamp.timestamp()) + 12,
+        block_height=dclr_a_update.block_height + 1,
+        block_hash="0xorphan",
+        parent_hash="0xother",
+    )
+    resp = api_client.post("/register", json=orphan, headers=h)
+    assert resp.status_code == 409
+    fork = resp.json()
+    assert fork == {
+        "message": fork["message"],
+        "chain_id": 2,
+        "block_height": dclr_a_update.block_height,
+        "block_hash": dclr_a_update.block_hash,
+    }
+    resp = api_client.post("/register/batch", json=[orphan], headers=h)
+    assert resp.json()[0]["fork"] == fork
+    resp = api_client.post(f"/rollback/{fork['block_hash']}", headers=h)
+    assert resp.json()["block_hash"] == dclr_a.block_hash
+    assert api_client.post("/register", json=orphan, headers=h).status_code == 201
+
+
+def test_register_batch_mixed_chains_fails(db, api_client):
+    f = Fake()
+    decs = [f.declaration for _ in range(10)]
+    payload = [d.dict() for d in decs]
+    for item in payload:
+        item["timestamp"] = int(item["timestamp"].timestamp())
+    resp = api_client.post(
+        "/register/batch", json=payload, headers={"Authorization": "Bearer observer-token"}
+    )
+    assert resp.status_code == 422
+    assert resp.json() == {
+        "message": "Batch registration requires declarations from a single chain"
+    }
+
+
+def test_rollback_chain_only(db, api_client):
+    objs = load(10)
+    block_hash = "0x17f922af7f6650d2aaf11f7e6a434f7218b4e50eeeab62adb19dae2245077965"
+    start = IsccId.objects.get(block_hash=block_hash)
+    others = [o.did for o in objs if o.did > start.did and o.chain_id != start.chain_id]
+    resp = api_client.post(
+        f"/rollback/{block_hash}?chain_only=true",
+        headers={"Authorization": "Bearer observer-token"},
+    )
+    assert resp.status_code == 200
+    result = resp.json()
+    assert [h["chain"] for h in result["heads"]] == [start.chain_id]
+    assert others
+    assert result["deleted"] == 5 - len(others)
+    assert IsccId.objects.filter(did__in=others).count() == len(others)
+    assert not IsccId.objects.filter(chain_id=start.chain_id, did__gte=start.did).exists()
+
+
+def test_declaration(db, api_client, dclr_a):
+    iid_obj = register(dclr_a)
+    resp = api_client.get(f"/declaration/ISCC:{iid_obj.iscc_id}")
+    assert resp.status_code == 200
+    result = resp.json()
+    assert result["iscc_id"] == f"ISCC:{iid_obj.iscc_id}"
+    assert result["declarer"] == dclr_a.declarer
+    assert result["chain"] == "ETHEREUM"
+
+
+def test_metadata(db, api_client, dclr_a):
+    iid_obj = register(dclr_a)
+    blob = MetadataBlob.objects.create(key="sha256:title", data={"name": "Some Title"})
+    IsccId.objects.filter(did=iid_obj.did).update(meta_blob=blob)
+    resp = api_client.get(f"/metadata/ISCC:{iid_obj.iscc_id}")
+    assert resp.status_code == 200
+    assert resp.json()["name"] == "Some Title"
+
+
+def test_resolve(db, api_client, dclr_a):
+    iid_obj = register(dclr_a)
+    resp = api_client.get(f"/resolve/ISCC:{iid_obj.iscc_id}")
+    assert resp.status_code == 200
+    assert resp.json() == {"url": iid_obj.get_registry_url()}
+    resp = api_client.get("/resolve/ISCC:MEAJU5AXCPOIOYFL")
+    assert resp.status_code == 404
+
+
+def test_declaration_http_caching(db, api_client, dclr_a, settings):
+    settings.HTTP_CACHE_CONTROL = "public, max-age=300"
+    iid_obj = register(dclr_a)
+    resp = api_client.get(f"/declaration/ISCC:{iid_obj.iscc_id}")
+    assert resp.status_code == 200
+    etag = resp["ETag"]
+    assert etag.startswith(f'"{iid_obj.did}.1-')
+    assert resp["Cache-Control"] == "public, max-age=300"
+    assert resp["Surrogate-Key"] == iid_obj.iscc_id
+    assert resp["Last-Modified"] == "Sun, 03 Apr 2022 17:48:39 GMT"
+    resp = api_client.get(f"/declaration/ISCC:{iid_obj.iscc_id}", headers={"IF-NONE-MATCH": etag})
+    assert resp.status_code == 304
+    assert resp.content == b""
+
+
+def test_resolve_http_caching(db, api_client, dclr_a):
+    iid_obj = register(dclr_a)
+    resp = api_client.get(f"/resolve/ISCC:{iid_obj.iscc_id}")
+    etag = resp["ETag"]
+    resp = api_client.get(f"/resolve/ISCC:{iid_obj.iscc_id}", headers={"IF-NONE-MATCH": etag})
+    assert resp.status_code == 304
+    resp = api_client.get(f"/metadata/ISCC:{iid_obj.iscc_id}", headers={"IF-NONE-MATCH": etag})
+    assert resp.status_code == 200
+
+
+def test_similar(db, api_client, dclr_a):
+    iid_a = register(dclr_a)
+    # Same ISCC-CODE declared by another wallet has an identical simhash
+    other = dclr_a.copy(
+        update=dict(tx_idx=1, declarer="0x2ad91ee08f21be3de0ba2ba6918e714da6b45836")
+    )
+    iid_b = register(other)
+    resp = api_client.get(f"/similar/ISCC:{iid_a.iscc_id}?max_distance=0")
+    assert resp.status_code == 200
+    assert resp.json() == [
+        {"iscc_id": f"ISCC:{iid_b.iscc_id}", "iscc_code": f"ISCC:{iid_b.iscc_code}", "distance": 0}
+    ]
+    resp = api_client.get("/similar/ISCC:MEAJU5AXCPOIOYFL")
+    assert resp.status_code == 404
+    resp = api_client.get(f"/similar/ISCC:{iid_a.iscc_id}?max_distance=64")
+    assert resp.status_code == 422
+
+
+def test_iscc_code_lookup(db, api_client, dclr_a):
+    code = dclr_a.iscc_code
+    other_meta = "KACWKLHFPV6OPKDGAYCJRAL5Z36G76RFRMO4554RU26HZ4ORJGIVHDI"
+    objs = [
+        register(dclr_a.copy(update=dict(tx_idx=i, declarer=f"0x{i:040x}", iscc_code=c)))
+        for i, c in enumerate([code, code, code, other_meta])
+    ]
+    resp = api_client.get(f"/iscc_code/ISCC:{code}?limit=2")
+    assert resp.status_code == 200
+    page = resp.json()
+    assert [item["iscc_id"] for item in page["items"]] == [f"ISCC:{o.iscc_id}" for o in objs[:2]]
+    resp = api_client.get(f"/iscc_code/ISCC:{code}?limit=2&cursor={page['next']}")
+    page = resp.json()
+    assert page == {
+        "items": [
+            {"did": objs[2].did, "iscc_id": f"ISCC:{objs[2].iscc_id}", "iscc_code": f"ISCC:{code}"}
+        ]
+    }
+    resp = api_client.get(f"/iscc_code/ISCC:{code}?unit=instance&count=true")
+    assert resp.json() == {"count": 4}
+    # Lookup by the unit itself
+    resp = api_client.get(f"/iscc_code/ISCC:AAAWKLHFPV6OPKDG?unit=meta")
+    assert [item["did"] for item in resp.json()["items"]] == [objs[3].did]
+    resp = api_client.get(f"/iscc_code/ISCC:{code}?unit=semantic")
+    assert resp.status_code == 400
+    resp = api_client.get(f"/iscc_code/ISCC:{code}?cursor=invalid")
+    assert resp.status_code == 400
+
+
+def test_declarations(db, api_client, dclr_a, django_assert_num_queries):
+    registrar = "0x" + "2" * 40
+    objs = [
+        register(
+            dclr_a.copy(
+                update=dict(
+                    tx_idx=i,
+                    declarer=f"0x{i % 2 + 1:040x}",
+                    registrar=registrar if i == 3 else None,
+                )
+            )
+        )
+        for i in range(5)
+    ]
+    with django_assert_num_queries(1):
+        resp = api_client.get("/declarations?limit=2")
+    assert resp.status_code == 200
+    page = resp.json()
+    assert [item["did"] for item in page["items"]] == [o.did for o in objs[:2]]
+    assert page["items"][0]["chain"] == "ETHEREUM"
+    dids = [item["did"] for item in page["items"]]
+    while "next" in page:
+        page = api_client.get(f"/declarations?limit=2&cursor={page['next']}").json()
+        dids += [item["did"] for item in page["items"]]
+    assert dids == [o.did for o in objs]
+    declarer = f"0x{2:040x}"
+    resp = api_client.get(f"/declarations?declarer={declarer}")
+    assert [item["did"] for item in resp.json()["items"]] == [objs[1].did, objs[3].did]
+    resp = api_client.get(f"/declarations?owner={declarer}&chain_id=2")
+    assert len(resp.json()["items"]) == 2
+    resp = api_client.get(f"/declarations?registrar={registrar}")
+    assert [item["did"] for item in resp.json()["items"]] == [objs[3].did]
+    resp = api_client.get(f"/declarations?min_did={objs[1].did}&max_did={objs[3].did}")
+    assert [item["did"] for item in resp.json()["items"]] == [objs[1].did, objs[2].did]
+    resp = api_client.get("/declarations?since=2022-04-03T17:48:40Z")
+    assert resp.json() == {"items": []}
+    resp = api_client.get("/declarations?until=2022-04-03T17:48:40Z&chain_id=1")
+    assert resp.json() == {"items": []}
+    resp = api_client.get("/declarations?cursor=invalid")
+    assert resp.status_code == 400
+    resp = api_client.get("/declarations?declarer=0xzz")
+    assert resp.status_code == 400
+
+
+def test_export(db, api_client, dclr_a, dclr_a_update, settings, tmp_path):
+    settings.EXPORT_ROOT = str(tmp_path)
+    iid_a = register(dclr_a)
+    iid_b = register(dclr_a_update)
+    resp = api_client.get("/export")
+    assert resp.status_code == 200
+    assert resp["Content-Type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in resp.content.splitlines()]
+    assert len(lines) == 1
+    assert lines[0]["iscc_id"] == f"ISCC:{iid_b.iscc_id}"
+    assert lines[0]["chain"] == "ETHEREUM"
+    assert lines[0]["revision"] == 2
+    resp = api_client.get("/export?history=true")
+    assert [json.loads(line)["did"] for line in resp.content.splitlines()] == [iid_a.did, iid_b.did]
+    resp = api_client.get(f"/export?history=true&after={iid_a.did}&gzip=true")
+    assert resp["Content-Type"] == "application/gzip"
+    lines = gzip.decompress(resp.content).splitlines()
+    assert [json.loads(line)["did"] for line in lines] == [iid_b.did]
+
+
+def test_export_building(db, api_client, dclr_a, settings, tmp_path):
+    settings.EXPORT_ROOT = str(tmp_path)
+    register(dclr_a)
+    # Another request is writing the export file
+    partial = export.partial_path(export.snapshot_path())
+    partial.write_bytes(b"")
+    resp = api_client.get("/export")
+    assert resp.status_code == 202
+    assert resp["Retry-After"] == str(settings.EXPORT_RETRY_AFTER)
+    partial.unlink()
+    assert api_client.get("/export").status_code == 200
+    # Fresh export files are served until they reach EXPORT_MAX_AGE
+    register(dclr_a.copy(update=dict(tx_idx=2, declarer="0x" + "2" * 40)))
+    assert len(api_client.get("/export").content.splitlines()) == 1
+    outdated = time() - settings.EXPORT_MAX_AGE
+    os.utime(export.snapshot_path(), (outdated, outdated))
+    assert len(api_client.get("/export").content.splitlines()) == 2
+
+
+def test_lookup(db, api_client, dclr_a, django_assert_num_queries, settings):
+    iid_a = register(dclr_a)
+    other = register(dclr_a.copy(update=dict(tx_idx=2, declarer="0x" + "2" * 40)))
+    iscc_ids = [
+        f"ISCC:{other.iscc_id}",
+        iid_a.iscc_id,
+        "ISCC:MEAJU5AXCPOIOYFL",
+        "ISCC:INVALID",
+        f"ISCC:{other.iscc_id}",
+    ]
+    with django_assert_num_queries(1):
+        resp = api_client.post("/declarations/lookup", json={"iscc_ids": iscc_ids})
+    assert resp.status_code == 200
+    result = resp.json()
+    assert [d["iscc_id"] for d in result["found"]] == [
+        f"ISCC:{other.iscc_id}",
+        f"ISCC:{iid_a.iscc_id}",
+    ]
+    assert result["found"][0]["declarer"] == other.declarer_id
+    assert result["missing"] == ["ISCC:MEAJU5AXCPOIOYFL"]
+    assert result["invalid"] == ["ISCC:INVALID"]
+    settings.LOOKUP_MAX_IDS = 2
+    resp = api_client.post("/declarations/lookup", json={"iscc_ids": iscc_ids})
+    assert resp.status_code == 422
+
+
+def test_head_ring(db, api_client, settings, django_assert_num_queries):
+    settings.HEAD_RING_SIZE = 2
+    load(10)
+    h = {"Authorization": "Bearer observer-token"}
+    expected = [api_client.get(f"/head/1?offset={i}", headers=h).json() for i in range(3)]
+    assert expected[2]["block_hash"] != expected[1]["block_hash"]
+    # Offsets within the ring are a single primary key read
+    with django_assert_num_queries(1):
+        assert api_client.get("/head/1?offset=1", headers=h).json() == expected[1]
+    # Deeper offsets fall back to the event log
+    with django_assert_num_queries(2):
+        assert api_client.get("/head/1?offset=2", headers=h).json() == expected[2]
+
+
+def test_head_after_rollback(db, api_client, dclr_a, dclr_a_update):
+    h = {"Authorization": "Bearer observer-token"}
+    register(dclr_a)
+    register(dclr_a_update)
+    assert api_client.get("/head/2", headers=h).json()["tx_idx"] == 1
+    rollback(dclr_a_update.block_hash)
+    assert api_client.get("/head/2", headers=h).json()["tx_idx"] == 0
+    assert api_client.get("/head/2?offset=1", headers=h).status_code == 422
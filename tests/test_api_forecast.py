@@ -1,6 +1,6 @@
 from dev.fake import Fake
 from iscc_registry.schema import Forecast
-from iscc_registry.transactions import register
+from iscc_registry.transactions import mint, register
 
 
 def test_forecast_new(db, api_client):
@@ -30,3 +30,42 @@ def test_forecast_frozen(db, api_client):
     assert response.status_code == 200
     assert f"ISCC:{iid_obj.iscc_id}" == "ISCC:MMANWQAKQX42JUDB"
     assert response.json()["iscc_id"] == "ISCC:MMA5WQAKQX42JUDBAE"
+
+
+def test_forecast_frozen_single_query(db, dclr_a, django_assert_num_queries):
+    dclr_a.message = "frz:"
+    iid_obj = register(dclr_a)
+    with django_assert_num_queries(1):
+        iscc_id = mint(dclr_a.iscc_code, dclr_a.chain_id, dclr_a.declarer)
+    assert iscc_id != iid_obj.iscc_id
+
+
+def test_forecast_batch(db, api_client, django_assert_num_queries):
+    f = Fake()
+    registered = register(f.declaration)
+    items = [
+        Forecast(chain_id=d.chain_id, wallet=d.declarer, iscc_code=d.iscc_code).dict()
+        for d in (f.declaration, f.declaration)
+    ]
+    items.append(
+        Forecast(
+            chain_id=registered.chain_id,
+            wallet=registered.declarer_id,
+            iscc_code=registered.iscc_code,
+        ).dict()
+    )
+    with django_assert_num_queries(1):
+        response = api_client.post("/forecast/batch", json=items)
+    assert response.status_code == 200
+    result = response.json()
+    assert result[2] == {"iscc_id": f"ISCC:{registered.iscc_id}"}
+    for item, forecast in zip(items, result):
+        assert api_client.post("/forecast", json=item).json() == forecast
+
+
+def test_forecast_batch_max_items(db, api_client, settings):
+    settings.FORECAST_MAX_ITEMS = 1
+    d = Fake().declaration
+    item = Forecast(chain_id=d.chain_id, wallet=d.declarer, iscc_code=d.iscc_code).dict()
+    response = api_client.post("/forecast/batch", json=[item, item])
+    assert response.status_code == 422
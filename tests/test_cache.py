@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from iscc_registry.cache import LRU, resolver_cache, resolve_url, warm, NOT_FOUND, TOMBSTONE
+from iscc_registry.models import IsccId, MetadataBlob
+from iscc_registry.transactions import register, rollback
+
+
+def test_lru_evicts_least_recently_used():
+    lru = LRU(maxsize=2, ttl=60)
+    lru.set("a", "1")
+    lru.set("b", "2")
+    assert lru.get("a") == "1"
+    lru.set("c", "3")
+    assert lru.get("b") is None
+    assert lru.get("a") == "1"
+    assert len(lru) == 2
+
+
+def test_lru_expires():
+    lru = LRU(maxsize=2, ttl=-1)
+    lru.set("a", "1")
+    assert lru.get("a") is None
+
+
+def test_resolve_url_caches_negative(db, dclr_a, django_assert_num_queries):
+    iscc_id = dclr_a.get_iscc_id()
+    assert resolve_url(iscc_id) is None
+    assert resolver_cache.get(iscc_id) == NOT_FOUND
+    with django_assert_num_queries(0):
+        assert resolve_url(iscc_id) is None
+
+
+def test_register_invalidates(db, dclr_a, django_capture_on_commit_callbacks):
+    iscc_id = dclr_a.get_iscc_id()
+    assert resolve_url(iscc_id) is None
+    with django_capture_on_commit_callbacks(execute=True):
+        iid_obj = register(dclr_a)
+    assert resolve_url(iscc_id) == iid_obj.get_registry_url()
+
+
+def test_rollback_invalidates(db, dclr_a, dclr_a_update, django_capture_on_commit_callbacks):
+    iid_a = register(dclr_a)
+    iid_b = register(dclr_a_update)
+    blob = MetadataBlob.objects.create(
+        key="sha256:example", data={"redirect": "https://example.com"}
+    )
+    IsccId.objects.filter(did=iid_b.did).update(meta_blob=blob)
+    resolver_cache.clear()
+    assert resolve_url(iid_b.iscc_id) == "https://example.com"
+    with django_capture_on_commit_callbacks(execute=True):
+        rollback(iid_b.block_hash)
+    assert resolve_url(iid_b.iscc_id) == iid_a.get_registry_url()
+
+
+def test_resolver_view(db, client, dclr_a):
+    iid_obj = register(dclr_a)
+    response = client.get(f"/ISCC:{iid_obj.iscc_id}/")
+    assert response.status_code == 302
+    assert response.url == iid_obj.get_registry_url()
+    response = client.get("/ISCC:MEAJU5AXCPOIOYFL/")
+    assert response.status_code == 404
+
+
+def test_warm_resolver_cache(db, dclr_a):
+    iid_obj = register(dclr_a)
+    # Warming the in-process tier of a management command is pointless
+    with pytest.raises(CommandError, match="RESOLVER_CACHE_URL"):
+        call_command("warm_resolver_cache", limit=10)
+    assert warm([iid_obj.iscc_id]) == 1
+    assert resolver_cache.get(iid_obj.iscc_id) == iid_obj.get_registry_url()
+
+
+def test_invalidate_purges_http_cache(
+    db, dclr_a, settings, monkeypatch, django_capture_on_commit_callbacks
+):
+    purged = []
+    monkeypatch.setattr("iscc_registry.tasks.purge_http_cache", purged.append)
+    settings.HTTP_PURGE_URL = "http://cache/purge"
+    with django_capture_on_commit_callbacks(execute=True):
+        iid_obj = register(dclr_a)
+    assert purged == [[iid_obj.iscc_id]]
+
+
+class FakeRedis(dict):
+    """Shared tier stand-in (ignores expiry)"""
+
+    def get(self, key):
+        return super().get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self:
+            return None
+        self[key] = value.encode("utf-8")
+        return True
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        pass
+
+
+def test_invalidate_blocks_stale_write_back(
+    db, dclr_a, monkeypatch, django_capture_on_commit_callbacks
+):
+    shared = FakeRedis()
+    monkeypatch.setattr(resolver_cache, "redis", shared)
+    iscc_id = dclr_a.get_iscc_id()
+    assert resolve_url(iscc_id) is None
+    with django_capture_on_commit_callbacks(execute=True):
+        iid_obj = register(dclr_a)
+    assert shared[resolver_cache.prefix + iscc_id] == TOMBSTONE.encode("utf-8")
+    # A read-through that looked up the database before the registration committed
+    resolver_cache.set(iscc_id, NOT_FOUND)
+    assert shared[resolver_cache.prefix + iscc_id] == TOMBSTONE.encode("utf-8")
+    resolver_cache.local.clear()
+    assert resolver_cache.get(iscc_id) is None
+    assert resolve_url(iscc_id) == iid_obj.get_registry_url()
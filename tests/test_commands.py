@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+import gzip
+import json
+from io import StringIO
+import pytest
+from django.core.management import call_command, CommandError
+from dev.fake import Fake
+from iscc_registry.models import Block, ChainHead, IsccId, LiveIsccId
+from iscc_registry.schema import Declaration
+
+
+@pytest.fixture
+def jsonl(tmp_path):
+    f = Fake()
+    path = tmp_path / "declarations.jsonl"
+    with path.open("wt") as outf:
+        for _ in range(10):
+            d = f.declaration
+            d.message = None
+            outf.write(d.json() + "\n")
+    return path
+
+
+def test_import_declarations(db, jsonl):
+    out = StringIO()
+    call_command("import_declarations", str(jsonl), chunk_size=4, no_metadata=True, stdout=out)
+    assert IsccId.objects.count() == 10
+    assert "Imported 10 declarations (0 failed)" in out.getvalue()
+    assert json.loads(jsonl.with_name("declarations.jsonl.checkpoint").read_text()) == {"lines": 10}
+
+
+def test_import_declarations_resume(db, jsonl):
+    checkpoint = jsonl.with_name("declarations.jsonl.checkpoint")
+    checkpoint.write_text(json.dumps({"lines": 6}))
+    out = StringIO()
+    call_command("import_declarations", str(jsonl), no_metadata=True, stdout=out)
+    assert IsccId.objects.count() == 4
+    assert "Resuming after line 6" in out.getvalue()
+
+
+def test_import_declarations_invalid_line(db, jsonl):
+    with jsonl.open("at") as outf:
+        outf.write('{"chain_id": 1}\n')
+    out, err = StringIO(), StringIO()
+    call_command("import_declarations", str(jsonl), no_metadata=True, stdout=out, stderr=err)
+    assert IsccId.objects.count() == 10
+    assert "line 11: invalid declaration" in err.getvalue()
+
+
+def test_import_declarations_missing_file(db, tmp_path):
+    with pytest.raises(CommandError):
+        call_command("import_declarations", str(tmp_path / "missing.jsonl"))
+
+
+def test_export_declarations(db, jsonl, tmp_path):
+    call_command("import_declarations", str(jsonl), no_metadata=True, stdout=StringIO())
+    path = tmp_path / "export.ndjson"
+    call_command("export_declarations", str(path), chunk_size=3, stdout=StringIO())
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    dids = list(IsccId.objects.order_by("did").values_list("did", flat=True))
+    assert [line["did"] for line in lines] == dids
+    # Resume after an interrupted export
+    path.write_text("".join(line + "\n" for line in path.read_text().splitlines()[:4]))
+    call_command("export_declarations", str(path), after=dids[3], stdout=StringIO())
+    assert [json.loads(line)["did"] for line in path.read_text().splitlines()] == dids
+
+
+def test_export_import_roundtrip(db, tmp_path):
+    f = Fake()
+    source = tmp_path / "declarations.jsonl"
+    with source.open("wt") as outf:
+        for i in range(10):
+            d = f.declaration
+            d.message = None
+            d.parent_hash = f"0xparent{i}"
+            outf.write(d.json() + "\n")
+        # A later revision of the last ISCC-ID
+        update = Declaration(**dict(d.dict(), timestamp=f.timestamp, tx_idx=f.tx_idx))
+        outf.write(update.json() + "\n")
+    call_command("import_declarations", str(source), no_metadata=True, stdout=StringIO())
+    first = tmp_path / "first.ndjson"
+    call_command("export_declarations", str(first), history=True, stdout=StringIO())
+    # Seed an empty mirror from the export
+    for model in (LiveIsccId, Block, ChainHead, IsccId):
+        model.objects.all().delete()
+    out = StringIO()
+    call_command("import_declarations", str(first), no_metadata=True, stdout=out)
+    assert "Imported 11 declarations (0 failed)" in out.getvalue()
+    second = tmp_path / "second.ndjson"
+    call_command("export_declarations", str(second), history=True, stdout=StringIO())
+    assert second.read_text() == first.read_text()
+    lines = [json.loads(line) for line in first.read_text().splitlines()]
+    assert {line["parent_hash"] for line in lines} >= {f"0xparent{i}" for i in range(10)}
+    assert lines[-1]["revision"] == 2
+
+
+def test_export_declarations_gzip(db, jsonl, tmp_path):
+    call_command("import_declarations", str(jsonl), no_metadata=True, stdout=StringIO())
+    path = tmp_path / "export.ndjson.gz"
+    call_command("export_declarations", str(path), gzip=True, stdout=StringIO())
+    assert len(gzip.decompress(path.read_bytes()).splitlines()) == 10
+
+
+def test_rebuild_live_iscc_ids(db, jsonl):
+    call_command("import_declarations", str(jsonl), no_metadata=True, stdout=StringIO())
+    LiveIsccId.objects.all().delete()
+    out = StringIO()
+    call_command("rebuild_live_iscc_ids", chunk_size=4, stdout=out)
+    assert LiveIsccId.objects.count() == IsccId.objects.filter(active=True).count()
+    assert "Rebuilt live projection" in out.getvalue()
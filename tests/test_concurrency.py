@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+from collections import defaultdict
+from threading import Barrier, Thread
+import pytest
+from django.db import connection
+from django.db.models import Count
+from dev.fake import Fake
+from iscc_registry.exceptions import RegistrationError
+from iscc_registry.models import ChainModel, IsccId, LiveIsccId
+from iscc_registry.schema import Declaration
+from iscc_registry import transactions
+from iscc_registry.transactions import LOCK_NAMESPACE, chain_lock, lock_keys, register, rollback
+
+OBSERVERS = 3
+
+
+def declarations(n: int):
+    """Fake declarations with updates of earlier ISCC-IDs, grouped by chain in did order"""
+    f = Fake()
+    decls = []
+    for i in range(n):
+        d = f.declaration
+        d.message = None
+        decls.append(d)
+        if i % 3 == 0:
+            decls.append(Declaration(**dict(d.dict(), timestamp=f.timestamp, tx_idx=f.tx_idx)))
+    chains = defaultdict(list)
+    for d in sorted(decls, key=lambda d: d.did):
+        chains[d.chain_id].append(d)
+    return chains
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_observers():
+    chains = declarations(30)
+    barrier = Barrier(OBSERVERS * len(chains))
+    errors = []
+
+    def observe(decls):
+        barrier.wait()
+        try:
+            for d in decls:
+                try:
+                    register(d)
+                except RegistrationError:
+                    pass
+        except Exception as e:  # pragma: no cover
+            errors.append(e)
+        finally:
+            connection.close()
+
+    threads = [
+        Thread(target=observe, args=(decls,)) for decls in chains.values() for _ in range(OBSERVERS)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert IsccId.objects.count() == sum(len(decls) for decls in chains.values())
+    assert IsccId.objects.filter(revision=2).exists()
+    duplicates = (
+        IsccId.objects.filter(active=True)
+        .values("iscc_id")
+        .annotate(n=Count("did"))
+        .filter(n__gt=1)
+    )
+    assert not duplicates.exists()
+    live = set(LiveIsccId.objects.values_list("event_id", flat=True))
+    assert live == set(IsccId.objects.filter(active=True).values_list("did", flat=True))
+
+
+def test_lock_keys():
+    assert lock_keys([3, 1, 3]) == [(LOCK_NAMESPACE, 1), (LOCK_NAMESPACE, 3)]
+    assert lock_keys([]) == []
+
+
+def test_chain_lock_advisory(db, monkeypatch):
+    executed = []
+
+    class Cursor:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def execute(self, sql, params=None):
+            executed.append((sql, params))
+
+    # Exercise the PostgreSQL branch (savepoint statements are recorded as well)
+    with monkeypatch.context() as m:
+        m.setattr(connection, "vendor", "postgresql")
+        m.setattr(connection, "cursor", Cursor)
+        with chain_lock([3, 1, 3]):
+            pass
+    locks = [params for sql, params in executed if "pg_advisory_xact_lock" in sql]
+    assert locks == [[LOCK_NAMESPACE, 1], [LOCK_NAMESPACE, 3]]
+
+
+def test_rollback_chain_only_locks_forked_chain(db, dclr_a, dclr_a_update, monkeypatch):
+    register(dclr_a)
+    register(dclr_a_update)
+    locked = []
+
+    def recording_lock(chain_ids):
+        locked.append(sorted(chain_ids))
+        return chain_lock(chain_ids)
+
+    monkeypatch.setattr(transactions, "chain_lock", recording_lock)
+    rollback(dclr_a_update.block_hash, chain_only=True)
+    assert locked == [[dclr_a.chain_id]]
+    # A full rollback selects stale events across chains and locks all of them
+    register(dclr_a_update)
+    rollback(dclr_a_update.block_hash)
+    assert locked[-1] == sorted(ChainModel.Chain.values)
+
+
+def test_lock_keys_overlapping_chains():
+    # Overlapping chain sets acquire their shared locks in the same order whatever the input order
+    a, b = lock_keys([3, 2]), lock_keys([1, 3, 2, 1])
+    assert a == [(LOCK_NAMESPACE, 2), (LOCK_NAMESPACE, 3)]
+    assert b == [(LOCK_NAMESPACE, 1), (LOCK_NAMESPACE, 2), (LOCK_NAMESPACE, 3)]
+    shared = set(a) & set(b)
+    assert [k for k in a if k in shared] == [k for k in b if k in shared]
+    assert lock_keys(reversed([1, 2, 3])) == lock_keys([2, 3, 1])
+
+
+@pytest.mark.skipif(connection.vendor != "postgresql", reason="advisory locks need PostgreSQL")
+@pytest.mark.django_db(transaction=True)
+def test_chain_lock_holds_advisory_locks():  # pragma: no cover
+    sql = (
+        "SELECT classid::int, objid::int FROM pg_locks "
+        "WHERE locktype = 'advisory' AND pid = pg_backend_pid() ORDER BY objid"
+    )
+    with chain_lock([3, 1]):
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            assert cursor.fetchall() == [(LOCK_NAMESPACE, 1), (LOCK_NAMESPACE, 3)]
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        assert cursor.fetchall() == []
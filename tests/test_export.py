@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+import gzip
+import os
+from time import time
+from iscc_registry import export
+from iscc_registry.transactions import register
+
+
+def test_gzipped():
+    chunks = list(export.gzipped(iter([b"a\n", b"b\n"])))
+    assert gzip.decompress(b"".join(chunks)) == b"a\nb\n"
+
+
+def test_snapshot_path(settings, tmp_path):
+    settings.EXPORT_ROOT = str(tmp_path)
+    assert export.snapshot_path() == tmp_path / "iscc-registry-live.ndjson"
+    path = export.snapshot_path(history=True, after=7, gzip=True)
+    assert path == tmp_path / "iscc-registry-history-after-7.ndjson.gz"
+    assert export.partial_path(path).name == "iscc-registry-history-after-7.ndjson.gz.part"
+
+
+def test_write(db, dclr_a, settings, tmp_path):
+    settings.EXPORT_ROOT = str(tmp_path / "exports")
+    register(dclr_a)
+    path = export.snapshot_path(gzip=True)
+    assert not export.is_fresh(path)
+    size = export.write(path, gzip=True)
+    assert size == path.stat().st_size
+    assert len(gzip.decompress(path.read_bytes()).splitlines()) == 1
+    assert not export.partial_path(path).exists()
+    assert export.is_fresh(path)
+
+
+def test_prune(settings, tmp_path):
+    settings.EXPORT_ROOT = str(tmp_path)
+    fresh, outdated = export.snapshot_path(), export.snapshot_path(history=True)
+    stalled = export.partial_path(export.snapshot_path(gzip=True))
+    for path in (fresh, outdated, stalled):
+        path.write_bytes(b"")
+    for path, seconds in ((outdated, settings.EXPORT_MAX_AGE), (stalled, export.STALLED)):
+        os.utime(path, (time() - seconds, time() - seconds))
+    assert export.is_building(export.snapshot_path(gzip=True)) is False
+    assert export.prune(tmp_path) == 2
+    assert list(tmp_path.iterdir()) == [fresh]
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from dev.fake import Fake
+from iscc_registry import fetcher
+from hashlib import sha256
+import iscc_core as ic
+from iscc_registry.models import IsccId, MetadataBlob
+from iscc_registry.transactions import register
+from iscc_registry.utils import CID_RAW_SHA256, metadata_key, verify_cid
+
+
+class MetadataHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        if self.path.startswith("/missing"):
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = json.dumps({"name": self.path.strip("/")}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    MetadataHandler.requests = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), MetadataHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def declarations(db, server):
+    f = Fake()
+    objs = []
+    for i in range(12):
+        d = f.declaration
+        d.message = None
+        d.meta_url = f"{server}/missing/{i}" if i % 4 == 0 else f"{server}/meta/{i}"
+        objs.append(register(d))
+    return objs
+
+
+def test_fetcher_fetch_many(server):
+    f = fetcher.MetadataFetcher(workers=4, per_host=2, timeout=5)
+    results = f.fetch_many({1: f"{server}/meta/a", 2: f"{server}/missing/b"})
+    assert results == {1: {"name": "meta/a"}, 2: None}
+
+
+def test_fetch_pending(declarations, django_assert_max_num_queries):
+    # Select pending, select known blobs, insert blobs and link per chunk (+ final empty select)
+    with django_assert_max_num_queries(3 * 4 + 1):
+        updated = fetcher.fetch_pending(chunk_size=5)
+    assert updated == 9
+    assert len(MetadataHandler.requests) == 12
+    assert IsccId.objects.filter(meta_blob__isnull=True).count() == 3
+    assert IsccId.objects.get(did=declarations[1].did).metadata == {"name": "meta/1"}
+
+
+def test_fetch_pending_limit(declarations):
+    assert fetcher.fetch_pending(chunk_size=5, limit=4) == 3
+    assert len(MetadataHandler.requests) == 4
+
+
+def test_fetch_dids(declarations):
+    assert fetcher.fetch_dids([obj.did for obj in declarations[:2]]) == 1
+
+
+def test_fetch_deduplicates_shared_meta_url(db, server):
+    f = Fake()
+    objs = []
+    for i in range(3):
+        d = f.declaration
+        d.message = None
+        d.meta_url = f"{server}/meta/shared"
+        objs.append(register(d))
+    assert fetcher.fetch_dids([obj.did for obj in objs]) == 3
+    assert MetadataHandler.requests == ["/meta/shared"]
+    assert MetadataBlob.objects.count() == 1
+    assert IsccId.objects.get(did=objs[2].did).metadata == {"name": "meta/shared"}
+    # Known content is not fetched again
+    IsccId.objects.update(meta_blob=None)
+    assert fetcher.fetch_pending() == 3
+    assert len(MetadataHandler.requests) == 1
+
+
+def test_fetch_refresh_mutable(declarations):
+    did = declarations[1].did
+    assert fetcher.fetch_dids([did]) == 1
+    assert fetcher.fetch_dids([did]) == 1
+    assert len(MetadataHandler.requests) == 1
+    assert fetcher.fetch_dids([did], refresh=True) == 1
+    assert len(MetadataHandler.requests) == 2
+
+
+def test_metadata_key():
+    cid = "bafkreigh2akiscaildcqabsyg3dfr6chu3fgpregiymsck7e7aqa4s52zy"
+    assert metadata_key(f"ipfs://{cid}") == cid
+    assert metadata_key("https://example.com/meta.json").startswith("sha256:")
+
+
+def test_verify_cid():
+    content = b'{"name": "The Title"}'
+    cid = "b" + ic.encode_base32(CID_RAW_SHA256 + sha256(content).digest()).lower()
+    assert verify_cid(cid, content) is True
+    assert verify_cid(cid, b'{"name": "Other"}') is False
+    assert verify_cid("QmYwAPJzv5CZsnA625s3Xf2nemtYgPpHdWEz79ojWnPbdG", content) is None
+    assert verify_cid(f"{cid}/meta.json", content) is None
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+from dev.fake import Fake
+from iscc_registry import ingest
+from iscc_registry.models import IsccId
+
+H = {"Authorization": "Bearer observer-token"}
+
+
+def declarations(n: int):
+    f = Fake()
+    decls = []
+    for _ in range(n):
+        d = f.declaration
+        d.meta_url = None
+        decls.append(d)
+    return decls
+
+
+def test_register_queued(db, api_client, queue):
+    d = declarations(1)[0]
+    resp = api_client.post("/register", json=d, headers=H)
+    assert resp.status_code == 202
+    ticket = resp.json()
+    assert ticket["status"] == "queued"
+    # The consumer runs immediately in tests
+    resp = api_client.get(f"/ingest/{ticket['ticket']}", headers=H)
+    assert resp.status_code == 200
+    assert resp.json() == {
+        "ticket": ticket["ticket"],
+        "status": "registered",
+        "did": d.did,
+        "iscc_id": f"ISCC:{IsccId.objects.get(did=d.did).iscc_id}",
+    }
+    assert queue.depth(d.chain_id) == 0
+
+
+def test_register_queued_duplicate(db, api_client, queue):
+    d = declarations(1)[0]
+    api_client.post("/register", json=d, headers=H)
+    # Re-applied (identical) declarations are reported as registered
+    ticket = api_client.post("/register", json=d, headers=H).json()["ticket"]
+    result = api_client.get(f"/ingest/{ticket}", headers=H).json()
+    assert result["status"] == "registered"
+    assert result["iscc_id"] == f"ISCC:{IsccId.objects.get(did=d.did).iscc_id}"
+    # A different declaration with the same did is rejected
+    other = d.copy(update=dict(tx_hash="0xother"))
+    ticket = api_client.post("/register", json=other, headers=H).json()["ticket"]
+    result = api_client.get(f"/ingest/{ticket}", headers=H).json()
+    assert result["status"] == "failed"
+    assert result["error"] == f"Declaration {d.did} already registered"
+
+
+def test_apply_dead_letter(db, queue):
+    decls = declarations(20)
+    chain_id = decls[0].chain_id
+    good, bad = [d for d in decls if d.chain_id == chain_id][:2]
+    # Violates the block height check constraint while inserting
+    bad.block_height = -1
+    tickets = ingest.enqueue([good, bad])
+    tickets += queue.append(chain_id, ["{invalid"])
+    assert ingest.apply(chain_id, batch_size=100) == []
+    assert ingest.apply(chain_id, batch_size=100) is None
+    results = [ingest.status(t) for t in tickets]
+    assert [r["status"] for r in results] == ["registered", "failed", "failed"]
+    assert results[1]["error"].startswith(f"Unprocessable declaration {bad.did}")
+    assert results[2]["error"].startswith("Invalid declaration")
+    assert IsccId.objects.filter(did=good.did).exists()
+
+
+def test_apply_in_did_order(db, queue):
+    decls = declarations(20)
+    chain_id = decls[0].chain_id
+    batch = [d for d in decls if d.chain_id == chain_id]
+    tickets = ingest.enqueue(list(reversed(batch)))
+    assert ingest.depth(chain_id) == len(batch)
+    assert ingest.status(tickets[0]) == {"ticket": tickets[0], "status": "queued"}
+    assert ingest.apply(chain_id, batch_size=100) == []
+    assert ingest.apply(chain_id, batch_size=100) is None
+    assert all(ingest.status(t)["status"] == "registered" for t in tickets)
+    assert IsccId.objects.count() == len(batch)
+
+
+def test_register_batch_queued(db, api_client, queue):
+    decls = declarations(20)
+    batch = [d for d in decls if d.chain_id == decls[0].chain_id][:3]
+    resp = api_client.post("/register/batch", json=batch, headers=H)
+    assert resp.status_code == 202
+    tickets = [t["ticket"] for t in resp.json()]
+    assert [ingest.status(t)["did"] for t in tickets] == [d.did for d in batch]
+
+
+def test_backpressure(db, api_client, queue, settings):
+    settings.INGEST_MAX_DEPTH = 0
+    d = declarations(1)[0]
+    resp = api_client.post("/register", json=d, headers=H)
+    assert resp.status_code == 503
+    assert resp["Retry-After"] == str(settings.INGEST_RETRY_AFTER)
+    resp = api_client.get("/ingest", headers=H)
+    assert resp.status_code == 200
+    assert resp.json()["backpressure"] is True
+    assert resp["Retry-After"] == str(settings.INGEST_RETRY_AFTER)
+    assert IsccId.objects.count() == 0
+
+
+def test_ingest_status(db, api_client, queue):
+    resp = api_client.get("/ingest", headers=H)
+    assert resp.status_code == 200
+    assert resp.json()["backpressure"] is False
+    assert {q["depth"] for q in resp.json()["queues"]} == {0}
+    assert api_client.get("/ingest/2-999", headers=H).status_code == 404
+    assert api_client.get("/ingest/invalid", headers=H).status_code == 404
+
+
+def test_ingest_disabled(db, api_client):
+    assert api_client.get("/ingest", headers=H).status_code == 404
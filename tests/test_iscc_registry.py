@@ -1,5 +1,17 @@
+import pytest
 from iscc_registry import __version__
+from iscc_registry.utils import decode_cursor, encode_cursor
 
 
 def test_version():
     assert __version__ == "0.1.3"
+
+
+def test_cursor_roundtrip():
+    assert decode_cursor(encode_cursor(330445058337719994)) == 330445058337719994
+
+
+@pytest.mark.parametrize("cursor", ["invalid", "", "ZGlkOng", "!!"])
+def test_cursor_invalid(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
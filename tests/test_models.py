@@ -1,10 +1,18 @@
 # -*- coding: utf-8 -*-
+from datetime import timedelta
 import pytest
 from django.db import IntegrityError
 import iscc_core as ic
-from iscc_registry.exceptions import RegistrationError
+from iscc_registry.exceptions import ForkError, RegistrationError
 from iscc_registry import models
-from iscc_registry.transactions import register, rollback
+from dev.fake import Fake
+from iscc_registry.transactions import (
+    rebuild_live,
+    register,
+    register_batch,
+    rollback,
+    sync_live,
+)
 
 
 wallet_a = "0x1ad91ee08f21be3de0ba2ba6918e714da6b45836"
@@ -20,6 +28,28 @@ def test_user_get_or_create(db):
     assert user == user2
 
 
+def test_user_resolve(db, django_assert_num_queries, django_capture_on_commit_callbacks):
+    wallet_b = "0x2ad91ee08f21be3de0ba2ba6918e714da6b45836"
+    models.User.get_or_create(wallet=wallet_a, group="registrar")
+    with django_capture_on_commit_callbacks(execute=True):
+        users = models.User.resolve({wallet_a: "declarer", wallet_b: "declarer"})
+    assert set(users) == {wallet_a, wallet_b}
+    user_b = models.User.objects.get(pk=users[wallet_b])
+    assert user_b.username == wallet_b
+    assert not user_b.has_usable_password()
+    assert user_b.groups.filter(name="declarer").exists()
+    # Existing users keep their groups
+    assert not models.User.objects.get(pk=users[wallet_a]).groups.filter(name="declarer").exists()
+    # Served from the user cache after commit
+    with django_assert_num_queries(0):
+        assert models.User.resolve({wallet_a: "declarer", wallet_b: "registrar"}) == users
+
+
+def test_user_resolve_invalid_group(db):
+    with pytest.raises(ValueError):
+        models.User.resolve({wallet_a: "admin"})
+
+
 def test_register(db, dclr_a):
     iscc_id_obj = register(dclr_a)
     assert iscc_id_obj.iscc_id == "MIACOH2VOZBWZRHU"
@@ -41,6 +71,56 @@ def test_register_update(db, dclr_a, dclr_a_update):
     assert iid_query.latest().meta_url.startswith("ipfs://")
 
 
+def test_register_query_budget(db, dclr_a, dclr_a_update, django_assert_num_queries):
+    models.User.get_or_create(wallet=dclr_a.declarer, group="declarer")
+    # savepoint, monotonic check, blocks, candidate state, users, insert, block insert, head ring,
+    # live upsert, release savepoint (the ring of a new chain is built from the event log)
+    with django_assert_num_queries(12):
+        register(dclr_a)
+    # ... plus deactivation of the previous version and a ring update
+    with django_assert_num_queries(12):
+        iid_b = register(dclr_a_update)
+    assert iid_b.revision == 2
+
+
+def test_register_batch_query_budget(db, dclr_a, dclr_a_update, django_assert_num_queries):
+    models.User.get_or_create(wallet=dclr_a.declarer, group="declarer")
+    register(dclr_a)
+    dclr_b = dclr_a_update.copy(update=dict(tx_idx=2, timestamp=dclr_a_update.timestamp))
+    dclr_b.message = "frz:"
+    with django_assert_num_queries(12):
+        results = register_batch([dclr_a_update, dclr_b])
+    assert [r.revision for r in results] == [2, 3]
+
+
+def test_register_batch(db, dclr_a, dclr_a_update):
+    results = register_batch([dclr_a, dclr_a_update])
+    iid_a, iid_b = results
+    assert iid_a.iscc_id == iid_b.iscc_id == "MIACOH2VOZBWZRHU"
+    assert (iid_a.revision, iid_b.revision) == (1, 2)
+    iid_a.refresh_from_db()
+    iid_b.refresh_from_db()
+    assert iid_a.active is False
+    assert iid_b.active is True
+
+
+def test_register_batch_errors_per_item(db, dclr_a, dclr_a_update):
+    register(dclr_a)
+    dclr_a_update.message = "frz:"
+    results = register_batch([dclr_a, dclr_a_update])
+    assert isinstance(results[0], RegistrationError)
+    assert str(results[0]) == f"Declaration {dclr_a.did} already registered"
+    assert results[1].frozen is True
+    assert results[1].revision == 2
+    assert models.IsccId.objects.filter(active=True).get().did == dclr_a_update.did
+
+
+def test_register_batch_after_update(db, dclr_a, dclr_a_update):
+    register(dclr_a_update)
+    results = register_batch([dclr_a])
+    assert str(results[0]) == f"Found later declaration {dclr_a_update.did} than {dclr_a.did}"
+
+
 def test_iscc_id_model_ancestor(db, dclr_a, dclr_a_update):
     iid_a = register(dclr_a)
     iid_b = register(dclr_a_update)
@@ -59,6 +139,121 @@ def test_rollback(db, dclr_a, dclr_a_update):
     assert iid_a.active is True
 
 
+def test_rollback_query_budget(db, dclr_a, dclr_a_update, django_assert_num_queries):
+    f = Fake()
+    f.TIME = int(dclr_a_update.timestamp.timestamp())
+    register(dclr_a)
+    register(dclr_a_update)
+    for _ in range(20):
+        d = f.declaration
+        d.message = None
+        register(d)
+    stale = models.IsccId.objects.filter(did__gte=dclr_a_update.did)
+    chains = stale.values("chain_id").distinct().count()
+    # savepoint, lookup, chains, deactivate, reactivate, live delete, restored, live insert,
+    # overlapping blocks, delete, block delete, (block recount), ring per chain, ring upsert,
+    # delete emptied rings, release savepoint
+    overlapping = int(
+        models.Block.objects.filter(first_did__lt=dclr_a_update.did)
+        .filter(block_hash__in=stale.values("block_hash"))
+        .exists()
+    )
+    with django_assert_num_queries(14 + overlapping + chains):
+        result = rollback(dclr_a_update.block_hash)
+    assert result.deleted == 21
+    assert result.reactivated == 1
+    assert models.IsccId.objects.get().active is True
+
+
+def live():
+    return dict(models.LiveIsccId.objects.values_list("iscc_id", "event_id"))
+
+
+def test_live_projection(db, dclr_a, dclr_a_update):
+    iid_a = register(dclr_a)
+    assert live() == {iid_a.iscc_id: iid_a.did}
+    iid_b = register(dclr_a_update)
+    assert live() == {iid_a.iscc_id: iid_b.did}
+    rollback(iid_b.block_hash)
+    assert live() == {iid_a.iscc_id: iid_a.did}
+    models.IsccId.objects.filter(did=iid_a.did).update(redacted=True)
+    sync_live([iid_a.iscc_id])
+    assert live() == {}
+    with pytest.raises(models.IsccId.DoesNotExist):
+        models.IsccId.get_safe(iid_a.iscc_id)
+
+
+def test_live_projection_delete(db, dclr_a, dclr_a_update):
+    iid_a = register(dclr_a)
+    dclr_a_update.message = "del:"
+    iid_b = register(dclr_a_update)
+    assert iid_b.deleted is True
+    assert live() == {}
+    rollback(iid_b.block_hash)
+    assert live() == {iid_a.iscc_id: iid_a.did}
+    assert models.IsccId.get_safe(iid_a.iscc_id).did == iid_a.did
+
+
+def test_rebuild_live(db, dclr_a, dclr_a_update):
+    register(dclr_a)
+    iid_b = register(dclr_a_update)
+    models.LiveIsccId.objects.all().delete()
+    assert rebuild_live(chunk_size=1) == 1
+    assert live() == {iid_b.iscc_id: iid_b.did}
+
+
+def blocks():
+    return list(
+        models.Block.objects.order_by("block_height").values_list(
+            "block_height", "parent_hash", "declarations"
+        )
+    )
+
+
+def test_block_ledger(db, dclr_a, dclr_a_update):
+    register(dclr_a)
+    register(dclr_a_update)
+    dclr_b = dclr_a_update.copy(update=dict(tx_idx=2, timestamp=dclr_a_update.timestamp))
+    register(dclr_b)
+    assert blocks() == [
+        (dclr_a.block_height, None, 1),
+        (dclr_a_update.block_height, dclr_a.block_hash, 2),
+    ]
+    rollback(dclr_a_update.block_hash)
+    assert blocks() == [(dclr_a.block_height, None, 1)]
+
+
+def test_block_ledger_interleaved_chains(db, dclr_a):
+    def at(seconds, **kwargs):
+        return dclr_a.copy(
+            update=dict(timestamp=dclr_a.timestamp + timedelta(seconds=seconds), **kwargs)
+        )
+
+    genesis = at(-1, chain_id=3, block_height=1, block_hash="0xp1")
+    polygon = at(1, chain_id=3, block_height=2, block_hash="0xp2", tx_idx=1)
+    late = at(2, tx_idx=1)
+    for d in (genesis, dclr_a, polygon, late):
+        register(d)
+    assert blocks() == [(1, None, 1), (2, None, 1), (dclr_a.block_height, None, 2)]
+    # The Ethereum block started before the Polygon fork but holds a stale declaration
+    rollback(polygon.block_hash)
+    assert blocks() == [(1, None, 1), (dclr_a.block_height, None, 1)]
+    assert models.IsccId.objects.filter(chain_id=2).get().did == dclr_a.did
+
+
+def test_register_fork(db, dclr_a, dclr_a_update):
+    register(dclr_a)
+    fork_point = dict(chain_id=2, block_height=dclr_a.block_height, block_hash=dclr_a.block_hash)
+    sibling = dclr_a_update.copy(update=dict(block_height=dclr_a.block_height))
+    orphan = dclr_a_update.copy(update=dict(parent_hash="0xother"))
+    for d in (sibling, orphan):
+        with pytest.raises(ForkError) as e:
+            register(d)
+        assert e.value.fork_point() == dict(message=str(e.value), **fork_point)
+    assert models.IsccId.objects.count() == 1
+    assert register(dclr_a_update).revision == 2
+
+
 def test_rollback_raises(db, dclr_a, dclr_a_update):
     with pytest.raises(IntegrityError):
         rollback(block_hash="a")
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Query plan regression tests for the registry's hot lookups (SQLite)."""
+import pytest
+from iscc_registry.simhash import candidates
+from iscc_registry.models import Block, IsccId
+
+
+def assert_no_scan(qs):
+    plan = qs.explain()
+    assert "SCAN" not in plan, plan
+
+
+def test_plan_mint_state(db):
+    qs = IsccId.objects.filter(iscc_id__in=["MIACOH2VOZBWZRHU"]).select_related("owner")
+    assert_no_scan(qs.order_by("did"))
+
+
+def test_plan_ancestor(db):
+    qs = IsccId.objects.filter(iscc_id="MIACOH2VOZBWZRHU").exclude(did=1).order_by("did")
+    assert_no_scan(qs)
+
+
+def test_plan_get_safe(db):
+    qs = IsccId.objects.filter(iscc_id="MIACOH2VOZBWZRHU", active=True, deleted=False)
+    assert_no_scan(qs)
+
+
+@pytest.mark.parametrize("ordering", ["did", "-did"])
+def test_plan_head(db, ordering):
+    assert_no_scan(IsccId.objects.filter(chain_id=1).order_by(ordering))
+
+
+def test_plan_monotonic_check(db):
+    qs = IsccId.objects.filter(chain_id=1, did__gte=1).order_by("did").values_list("did")
+    assert_no_scan(qs)
+
+
+def test_plan_rollback(db):
+    assert_no_scan(IsccId.objects.filter(block_hash="0xabc").order_by("did"))
+    assert_no_scan(IsccId.objects.filter(did__gte=1).order_by("-did"))
+    assert_no_scan(Block.objects.filter(block_hash="0xabc").order_by("first_did"))
+
+
+def test_plan_blocks(db):
+    assert_no_scan(Block.objects.filter(chain_id=1, block_height__gte=1, block_height__lte=2))
+
+
+def test_plan_similar(db):
+    assert_no_scan(candidates(0x0123456789ABCDEF, 7))
+
+
+@pytest.mark.parametrize("field", ["iscc_code", "instance_unit", "data_unit"])
+def test_plan_iscc_code_lookup(db, field):
+    qs = IsccId.objects.filter(active=True, deleted=False, redacted=False, **{field: 1})
+    assert_no_scan(qs.filter(did__gt=1).order_by("did")[:100])
+
+
+@pytest.mark.parametrize("field", ["declarer_id", "registrar_id", "owner_id"])
+def test_plan_declarations(db, field):
+    qs = IsccId.objects.filter(redacted=False, did__gt=1, **{field: 1}).order_by("did")
+    assert_no_scan(qs[:100])
@@ -21,6 +21,7 @@ def test_schema_declaration(dclr_a):
         "iscc_code": "KACT4EBWK27737D2AYCJRAL5Z36G76RFRMO4554RU26HZ4ORJGIVHDI",
         "message": None,
         "meta_url": None,
+        "parent_hash": None,
         "registrar": None,
         "timestamp": datetime.datetime(2022, 4, 3, 17, 48, 39, tzinfo=datetime.timezone.utc),
         "tx_hash": "0xcade12c2cba31fbbfeddd1df932388dcd1c43fa346e233e34915dc3694546f3a",
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import pytest
+import iscc_core as ic
+from iscc_registry import simhash
+from iscc_registry.models import IsccId
+from iscc_registry.transactions import register
+
+
+def test_to_int_roundtrip():
+    assert simhash.to_int("ffffffffffffffff") == -1
+    assert simhash.to_int("7fffffffffffffff") == 2**63 - 1
+    assert simhash.to_hex(-1) == "ffffffffffffffff"
+    assert simhash.to_hex(simhash.to_int("0123456789abcdef")) == "0123456789abcdef"
+
+
+def test_blocks():
+    assert simhash.blocks(simhash.to_int("0001000200030004")) == [1, 2, 3, 4]
+    assert simhash.blocks(-1) == [0xFFFF] * 4
+
+
+def test_neighbors():
+    assert simhash.neighbors(0, 0) == [0]
+    assert len(simhash.neighbors(0, 1)) == 17
+    assert len(set(simhash.neighbors(0xABCD, 2))) == 1 + 16 + 120
+
+
+def test_distance():
+    assert simhash.distance(0, -1) == 64
+    assert simhash.distance(simhash.to_int("8000000000000001"), 0) == 2
+
+
+def test_register_stores_simhash(db, dclr_a):
+    iid_obj = register(dclr_a)
+    obj = IsccId.objects.get(did=iid_obj.did)
+    expected = ic.alg_simhash_from_iscc_id(obj.iscc_id, dclr_a.declarer)
+    assert simhash.to_hex(obj.simhash) == expected
+    assert [obj.simhash_0, obj.simhash_1, obj.simhash_2, obj.simhash_3] == simhash.blocks(
+        obj.simhash
+    )
+
+
+def test_similar(db, dclr_a):
+    iid_obj = register(dclr_a)
+    value = iid_obj.simhash ^ simhash.to_int("0000000100010001")
+    assert simhash.similar(value, 2) == []
+    assert simhash.similar(value, 3) == [(iid_obj.iscc_id, iid_obj.iscc_code, 3)]
+    # Spread over all blocks (only found with a block neighbourhood radius of 1)
+    value = iid_obj.simhash ^ simhash.to_int("0003000100010001")
+    assert simhash.similar(value, 5) == [(iid_obj.iscc_id, iid_obj.iscc_code, 5)]
+    with pytest.raises(ValueError):
+        simhash.similar(value, simhash.MAX_DISTANCE + 1)
+
+
+def test_max_distance_radius():
+    # Queries stay within a block neighbourhood radius of 1 (17 values per block)
+    radius = simhash.MAX_DISTANCE // simhash.BLOCKS
+    assert radius == 1
+    assert len(simhash.neighbors(0, radius)) == 17
+    assert simhash.DEFAULT_DISTANCE <= simhash.MAX_DISTANCE
+
+
+def test_rebuild(db, dclr_a, dclr_a_update):
+    register(dclr_a)
+    register(dclr_a_update)
+    expected = list(IsccId.objects.order_by("did").values_list("simhash", "simhash_3"))
+    IsccId.objects.update(simhash=0, simhash_3=0)
+    assert simhash.rebuild(chunk_size=1) == 2
+    assert list(IsccId.objects.order_by("did").values_list("simhash", "simhash_3")) == expected
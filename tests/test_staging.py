@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+import pytest
+from dev.fake import Fake
+from iscc_registry import ingest, staging
+from iscc_registry.models import ChainModel, IsccId, StagedDeclaration
+from iscc_registry.transactions import register
+
+H = {"Authorization": "Bearer observer-token"}
+CONFIRMATIONS = 30000
+
+
+@pytest.fixture
+def decls(db):
+    """Declarations of a single chain in did order (with increasing block heights)"""
+    f = Fake()
+    result = []
+    for _ in range(40):
+        d = f.declaration
+        d.meta_url = None
+        d.message = None
+        result.append(d)
+    chain_id = result[0].chain_id
+    ChainModel.objects.filter(chain=chain_id).update(confirmations=CONFIRMATIONS)
+    return [d for d in result if d.chain_id == chain_id]
+
+
+def test_submit_stages(decls):
+    d = decls[0]
+    result = staging.submit([d])[0]
+    assert isinstance(result, StagedDeclaration)
+    assert IsccId.objects.count() == 0
+    assert str(staging.submit([d])[0]) == f"Declaration {d.did} already staged"
+    promoted = staging.promote(d.chain_id, d.block_height + CONFIRMATIONS)
+    assert [(d.did, obj.iscc_id) for d, obj in promoted] == [(d.did, result.iscc_id)]
+    assert StagedDeclaration.objects.count() == 0
+    assert IsccId.get_safe(result.iscc_id).did == d.did
+
+
+def test_submit_promotes_confirmed(decls):
+    tip = decls[-1].block_height
+    depth = (tip - decls[0].block_height) // 2
+    ChainModel.objects.filter(chain=decls[0].chain_id).update(confirmations=depth)
+    staging.submit(decls)
+    confirmed = [d.did for d in decls if d.block_height <= tip - depth]
+    assert confirmed
+    assert list(IsccId.objects.order_by("did").values_list("did", flat=True)) == confirmed
+    assert StagedDeclaration.objects.count() == len(decls) - len(confirmed)
+
+
+def test_discard(decls):
+    staging.submit(decls[:5])
+    assert staging.discard(decls[2].block_hash) == 3
+    assert list(StagedDeclaration.objects.order_by("did").values_list("did", flat=True)) == [
+        d.did for d in decls[:2]
+    ]
+    assert staging.discard("0xunknown") == 0
+
+
+def test_register_provisional(decls, api_client):
+    d = decls[0]
+    resp = api_client.post("/register", json=d, headers=H)
+    assert resp.status_code == 201
+    result = resp.json()
+    assert result["provisional"] is True
+    resp = api_client.get(f"/declaration/{result['iscc_id']}?provisional=true")
+    assert resp.status_code == 200
+    assert resp.json()["did"] == d.did
+    assert resp["Cache-Control"] == "no-store"
+
+
+def test_resolve_provisional(decls, api_client, client):
+    d = decls[0]
+    iscc_id = staging.submit([d])[0].iscc_id
+    declaration = f"/api/v1/declaration/ISCC:{iscc_id}?provisional=true"
+    assert api_client.get(f"/resolve/ISCC:{iscc_id}").status_code == 404
+    resp = api_client.get(f"/resolve/ISCC:{iscc_id}?provisional=true")
+    assert resp.status_code == 200
+    assert resp.json() == {"url": declaration}
+    assert resp["Cache-Control"] == "no-store"
+    assert client.get(f"/ISCC:{iscc_id}/").status_code == 404
+    resp = client.get(f"/ISCC:{iscc_id}/?provisional=true")
+    assert resp.status_code == 302
+    assert resp.url == declaration
+    assert resp["Cache-Control"] == "no-store"
+
+
+def test_metadata_provisional(decls, api_client):
+    d = decls[0]
+    iscc_id = staging.submit([d])[0].iscc_id
+    resp = api_client.get(f"/metadata/ISCC:{iscc_id}?provisional=true")
+    assert resp.status_code == 200
+    assert resp.json() == {
+        "iscc": f"ISCC:{d.iscc_code}",
+        "iscc_id": f"ISCC:{iscc_id}",
+        "wallet": d.declarer,
+    }
+    assert resp["Cache-Control"] == "no-store"
+
+
+def test_rollback_staged_only(decls, api_client):
+    d = decls[0]
+    ChainModel.objects.filter(chain=d.chain_id).update(confirmations=0)
+    staging.submit([d])
+    ChainModel.objects.filter(chain=d.chain_id).update(confirmations=CONFIRMATIONS)
+    staging.submit(decls[1:3])
+    resp = api_client.post(f"/rollback/{decls[1].block_hash}", headers=H)
+    assert resp.status_code == 200
+    assert resp.json()["discarded"] == 2
+    assert resp.json()["block_hash"] == d.block_hash
+    assert IsccId.objects.count() == 1
+
+
+def test_promote_rejected(decls, api_client, queue, django_capture_on_commit_callbacks):
+    d = decls[0]
+    ticket = api_client.post("/register", json=d, headers=H).json()["ticket"]
+    assert ingest.status(ticket)["status"] == "staged"
+    # A sibling block at the same height gets registered directly (e.g. by another observer)
+    sibling = d.copy(update=dict(block_hash="0xsibling", tx_idx=d.tx_idx + 1))
+    ChainModel.objects.filter(chain=d.chain_id).update(confirmations=0)
+    register(sibling)
+    ChainModel.objects.filter(chain=d.chain_id).update(confirmations=CONFIRMATIONS)
+    with django_capture_on_commit_callbacks(execute=True):
+        resp = api_client.post(
+            f"/promote/{d.chain_id}?block_height={d.block_height + CONFIRMATIONS}", headers=H
+        )
+    assert resp.status_code == 200
+    fork = dict(chain_id=d.chain_id, block_height=d.block_height, block_hash="0xsibling")
+    (result,) = resp.json()
+    assert result["did"] == d.did
+    assert result["fork"] == dict(message=result["error"], **fork)
+    assert StagedDeclaration.objects.count() == 0
+    status = ingest.status(ticket)
+    assert status["status"] == "failed"
+    assert status["fork"] == result["fork"]
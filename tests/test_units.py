@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+import pytest
+from django.core.management import call_command
+from iscc_registry import units
+from iscc_registry.models import IsccId
+from iscc_registry.transactions import register, rollback
+
+np = pytest.importorskip("numpy")
+
+CODE = "KACT4EBWK27737D2AYCJRAL5Z36G76RFRMO4554RU26HZ4ORJGIVHDI"
+
+
+@pytest.fixture(autouse=True)
+def reset_index(settings):
+    settings.UNIT_INDEX_PATH = ""
+    units.reset()
+    yield
+    units.reset()
+
+
+def test_decompose():
+    assert units.decompose(CODE) == {
+        "meta": int.from_bytes(bytes.fromhex("3e103656bffdfc7a"), "big", signed=True),
+        "content": int.from_bytes(bytes.fromhex("060498817dcefc6f"), "big", signed=True),
+        "data": int.from_bytes(bytes.fromhex("fa258b1dcef791a6"), "big", signed=True),
+        "instance": int.from_bytes(bytes.fromhex("bc7cf1d14991538d"), "big", signed=True),
+    }
+    assert units.fields(CODE)["semantic_unit"] is None
+
+
+def test_register_stores_units(db, dclr_a):
+    iid_obj = register(dclr_a)
+    obj = IsccId.objects.get(did=iid_obj.did)
+    assert obj.data_unit == units.decompose(CODE)["data"]
+    assert obj.semantic_unit is None
+
+
+def test_popcount():
+    values = np.array([0, 1, 0xFFFFFFFFFFFFFFFF, 0x8000000000000001], dtype=np.uint64)
+    assert units.popcount(values).tolist() == [0, 1, 64, 2]
+
+
+def test_index_search():
+    rows = [(1, 0, None, 0b1, 7, 7), (2, 0, None, 0b11, 7, 7), (3, None, None, 0b111, 7, 0)]
+    index = units.UnitIndex.from_rows(rows)
+    assert len(index) == 3
+    assert index.watermarks() == {0: 3}
+    result = index.search({"content": 0, "meta": 0, "semantic": 0}, max_distance=2, k=10)
+    assert result["content"] == [(1, 1), (2, 2)]
+    assert result["meta"] == [(1, 0), (2, 0)]
+    assert result["semantic"] == []
+    assert index.search({"content": 0}, max_distance=3, k=1)["content"] == [(1, 1)]
+    # Negative (signed) unit values
+    assert index.search({"data": -1}, max_distance=64, k=1)["data"] == [(1, 61)]
+
+
+def test_index_snapshot(tmp_path):
+    index = units.UnitIndex.from_rows([(1, 0, None, 1, 2, -3)])
+    path = str(tmp_path / "units.npy")
+    index.save(path)
+    loaded = units.UnitIndex.load(path)
+    assert isinstance(loaded.data, np.memmap)
+    assert loaded.search({"instance": -3}, 0, 1) == {"instance": [(1, 0)]}
+
+
+def test_similar_snapshot_and_delta(db, dclr_a, tmp_path, settings):
+    other = dclr_a.copy(
+        update=dict(tx_idx=2, declarer="0x2ad91ee08f21be3de0ba2ba6918e714da6b45836")
+    )
+    iid_a = register(dclr_a)
+    settings.UNIT_INDEX_PATH = str(tmp_path / "units.npy")
+    call_command("build_unit_index")
+    # Registered after the snapshot
+    iid_b = register(other)
+    result = units.similar(CODE, max_distance=0, k=10)
+    assert set(result) == {"meta", "content", "data", "instance"}
+    assert result["instance"] == [
+        (iid_a.iscc_id, CODE, 0),
+        (iid_b.iscc_id, CODE, 0),
+    ]
+    # Stale snapshot rows are dropped
+    IsccId.objects.filter(did=iid_a.did).update(redacted=True)
+    assert units.similar(CODE, max_distance=0, k=10)["instance"] == [(iid_b.iscc_id, CODE, 0)]
+
+
+def test_index_watermarks():
+    rows = [
+        (3 << 14 | 1, 0, None, 0, 0, 0),
+        (2 << 14 | 5, 0, None, 0, 0, 0),
+        (2 << 14, 0, None, 0, 0, 0),
+    ]
+    assert units.UnitIndex.from_rows(rows).watermarks() == {2: 2 << 14 | 5, 3: 3 << 14 | 1}
+    assert units.UnitIndex.from_rows([]).watermarks() == {}
+
+
+def instance_hits(k=10):
+    return [iscc_id for iscc_id, _, _ in units.similar(CODE, max_distance=0, k=k)["instance"]]
+
+
+def test_similar_merges_delta(db, dclr_a):
+    later = dclr_a.copy(update=dict(timestamp=dclr_a.timestamp + timedelta(seconds=10)))
+    iid_a = register(later)
+    assert instance_hits() == [iid_a.iscc_id]
+    # A lagging chain registers a lower did than the latest indexed one
+    polygon = dclr_a.copy(update=dict(chain_id=3))
+    iid_b = register(polygon)
+    assert instance_hits() == [iid_b.iscc_id, iid_a.iscc_id]
+    base, delta = units.get_index()
+    assert (len(base), len(delta)) == (1, 1)
+
+
+def test_similar_after_rollback(db, dclr_a, dclr_a_update):
+    def declare(tx_idx, wallet):
+        return dclr_a_update.copy(update=dict(tx_idx=tx_idx, declarer="0x" + wallet * 40))
+
+    iid_a, iid_b = register(dclr_a), register(declare(2, "2"))
+    assert instance_hits() == [iid_a.iscc_id, iid_b.iscc_id]
+    rollback(dclr_a_update.block_hash)
+    assert instance_hits() == [iid_a.iscc_id]
+    # Re-registered below the (removed) latest indexed did of the chain
+    iid_c = register(declare(1, "3"))
+    assert instance_hits() == [iid_a.iscc_id, iid_c.iscc_id]
+
+
+def test_similar_skips_stale_hits_before_top_k(db, dclr_a):
+    other = dclr_a.copy(
+        update=dict(tx_idx=2, declarer="0x2ad91ee08f21be3de0ba2ba6918e714da6b45836")
+    )
+    iid_a, iid_b = register(dclr_a), register(other)
+    assert instance_hits(k=1) == [iid_a.iscc_id]
+    IsccId.objects.filter(did=iid_a.did).update(redacted=True)
+    assert instance_hits(k=1) == [iid_b.iscc_id]
+
+
+def test_similar_api(db, api_client, dclr_a):
+    iid_obj = register(dclr_a)
+    resp = api_client.get(f"/iscc_code/ISCC:{CODE}/similar?max_distance=4&k=5")
+    assert resp.status_code == 200
+    match = {"iscc_id": f"ISCC:{iid_obj.iscc_id}", "iscc_code": f"ISCC:{CODE}", "distance": 0}
+    assert resp.json()["data"] == [match]
+    resp = api_client.get("/iscc_code/ISCC:INVALID/similar")
+    assert resp.status_code == 400